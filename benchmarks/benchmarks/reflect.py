@@ -1,14 +1,22 @@
 import os.path
 import numpy as np
 import pickle
+import time
 
 from .common import Benchmark
 
 from refnx.analysis import CurveFitter, Objective, Parameter
 import refnx.reflect
 from refnx.reflect._creflect import abeles as c_abeles
+from refnx.reflect._creflect import abeles_grad as c_abeles_grad
+from refnx.reflect._creflect import parratt as c_parratt
 from refnx.reflect._reflect import abeles
 from refnx.reflect import SLD, Slab, Structure, ReflectModel, reflectivity
+from refnx.reflect.reflect_model import (
+    _vectorised_kernel,
+    available_backends,
+    get_reflect_backend,
+)
 from refnx.dataset import ReflectDataset as RD
 
 
@@ -30,6 +38,9 @@ class Abeles(Benchmark):
     def time_cabeles(self):
         c_abeles(self.q, self.layers)
 
+    def time_cabeles_grad(self):
+        c_abeles_grad(self.q, self.layers)
+
     def time_abeles(self):
         abeles(self.q, self.layers)
 
@@ -40,6 +51,113 @@ class Abeles(Benchmark):
         reflectivity(self.q, self.layers, dq=0.05 * self.q)
 
 
+class Smearing(Benchmark):
+    # pointwise resolution smearing of a multilayer with Bragg peaks
+    params = [13, 17, 51, "auto", "ultimate"]
+    param_names = ["quad_order"]
+
+    def setup(self, quad_order):
+        self.q = np.linspace(0.005, 0.3, 1000)
+        self.dq = 0.05 * self.q
+        unit_cell = np.array([[50, 6.36, 0, 3], [50, -0.56, 0, 3]])
+        self.layers = np.vstack(
+            [[0, 0, 0, 0], *([unit_cell] * 20), [0, 2.07, 0, 3]]
+        )
+
+    def time_reflectivity_pointwise_dq(self, quad_order):
+        reflectivity(self.q, self.layers, dq=self.dq, quad_order=quad_order)
+
+
+class ConstantSmearing(Benchmark):
+    # constant dQ/Q smearing of a multilayer with Bragg peaks. The
+    # tracked error is relative to an adaptive quadrature calculation.
+    params = ["spline", "fft"]
+    param_names = ["dq_engine"]
+
+    def setup(self, dq_engine):
+        self.q = np.linspace(0.005, 0.3, 1000)
+        unit_cell = np.array([[50, 6.36, 0, 3], [50, -0.56, 0, 3]])
+        self.layers = np.vstack(
+            [[0, 0, 0, 0], *([unit_cell] * 20), [0, 2.07, 0, 3]]
+        )
+
+    def time_reflectivity_constant_dq(self, dq_engine):
+        reflectivity(self.q, self.layers, dq=5.0, dq_engine=dq_engine)
+
+    def track_max_relative_error(self, dq_engine):
+        expected = reflectivity(
+            self.q, self.layers, dq=0.05 * self.q, quad_order="ultimate"
+        )
+        calc = reflectivity(self.q, self.layers, dq=5.0, dq_engine=dq_engine)
+        return np.max(np.abs(calc / expected - 1))
+
+
+class AbelesLatency(Benchmark):
+    # per-call latency of the C kernel for the small Q arrays that are
+    # typical of fitting/sampling. For threads > 1 this is dominated by the
+    # cost of dispatching work to the worker pool.
+    params = ([50, 200, 1000], [1, 2, 4])
+    param_names = ["npoints", "threads"]
+
+    def setup(self, npoints, threads):
+        self.q = np.linspace(0.005, 0.5, npoints)
+        self.layers = np.array(
+            [
+                [0, 2.07, 0, 3],
+                [50, 3.47, 0.0001, 4],
+                [200, -0.5, 1e-5, 5],
+                [50, 1, 0, 3],
+                [0, 6.36, 0, 3],
+            ]
+        )
+        # warm up the worker pool
+        c_abeles(self.q, self.layers, threads=threads)
+
+    def time_cabeles(self, npoints, threads):
+        c_abeles(self.q, self.layers, threads=threads)
+
+    def time_cparratt(self, npoints, threads):
+        c_parratt(self.q, self.layers, threads=threads)
+
+
+class ParallelBackends(Benchmark):
+    # the numba backends are compiled with parallel=True, compare against
+    # the C backend for a single structure and for a stack of structures.
+    params = (["c", "numba", "numba_parratt"], [1, 4])
+    param_names = ["backend", "threads"]
+
+    def setup(self, backend, threads):
+        if backend not in available_backends():
+            raise NotImplementedError(f"{backend} is not available")
+
+        self.q = np.linspace(0.005, 0.5, 5000)
+        self.layers = np.array(
+            [
+                [0, 2.07, 0, 3],
+                [50, 3.47, 0.0001, 4],
+                [200, -0.5, 1e-5, 5],
+                [50, 1, 0, 3],
+                [0, 6.36, 0, 3],
+            ]
+        )
+        rng = np.random.default_rng(0)
+        self.stack = self.layers * (
+            1 + 0.02 * rng.standard_normal((64,) + self.layers.shape)
+        )
+        self.kernel = get_reflect_backend(backend)
+        self.vectorised = _vectorised_kernel(self.kernel)
+
+        # compile/warm up the worker pools
+        self.kernel(self.q, self.layers, threads=threads)
+        self.vectorised(self.q, self.stack, threads=threads)
+
+    def time_kernel(self, backend, threads):
+        self.kernel(self.q, self.layers, threads=threads)
+
+    def time_vectorised(self, backend, threads):
+        self.vectorised(self.q, self.stack, threads=threads)
+
+
 class Reflect(Benchmark):
     timeout = 120.0
     # repeat = 2
@@ -111,3 +229,107 @@ class Reflect(Benchmark):
 
     def time_structure_slabs(self):
         self.structure361.slabs()
+
+    def time_covar(self):
+        # uses the derivatives from the C kernel
+        self.objective.covar()
+
+
+class WalkerEvaluation(Benchmark):
+    # log-likelihood of an ensemble of MCMC walkers, evaluated one walker at
+    # a time with the C backend, with Objective.logl_batch, or in a single
+    # XLA call with the JAX compiled objective.
+    params = ["c", "batch", "jax"]
+    param_names = ["path"]
+    nwalkers = 64
+
+    def setup(self, path):
+        pth = os.path.dirname(os.path.abspath(refnx.reflect.__file__))
+        e361 = RD(os.path.join(pth, "tests", "e361r.txt"))
+
+        si = SLD(2.07, name="Si")
+        sio2 = SLD(3.47, name="SiO2")
+        d2o = SLD(6.36, name="D2O")
+        polymer = SLD(1, name="polymer")
+
+        structure = si | sio2(10, 4) | polymer(200, 3) | d2o(0, 3)
+        structure[1].thick.setp(vary=True, bounds=(5, 20))
+        structure[2].thick.setp(vary=True, bounds=(100, 220))
+        structure[2].sld.real.setp(vary=True, bounds=(0.2, 1.5))
+        model = ReflectModel(structure, bkg=2e-5)
+        model.bkg.setp(vary=True, bounds=(0, 5e-5))
+
+        self.objective = Objective(model, e361)
+        rng = np.random.default_rng(0)
+        p0 = np.array(self.objective.varying_parameters())
+        self.pvals = p0 * (
+            1 + 0.01 * rng.standard_normal((self.nwalkers, p0.size))
+        )
+
+        if path == "c":
+            self.logl = lambda pvals: [self.objective.logl(p) for p in pvals]
+        elif path == "batch":
+            self.logl = self.objective.logl_batch
+        else:
+            try:
+                from jax import config
+
+                config.update("jax_enable_x64", True)
+                from refnx.reflect.extra import compile_objective
+            except ImportError:
+                raise NotImplementedError("jax is not available")
+
+            compiled = compile_objective(self.objective)
+            self.logl = compiled.logl_batch
+        # compile/warm up
+        self.logl(self.pvals)
+
+    def time_logl_walkers(self, path):
+        self.logl(self.pvals)
+
+    def track_walkers_per_second(self, path):
+        start = time.perf_counter()
+        for i in range(5):
+            self.logl(self.pvals)
+        return 5 * self.nwalkers / (time.perf_counter() - start)
+
+
+class DifferentialEvolution(Benchmark):
+    # a few generations of differential_evolution, evaluating the population
+    # one member at a time or all at once with Objective.logl_batch
+    params = [False, True]
+    param_names = ["vectorized"]
+    timeout = 120.0
+
+    def setup(self, vectorized):
+        pth = os.path.dirname(os.path.abspath(refnx.reflect.__file__))
+        e361 = RD(os.path.join(pth, "tests", "e361r.txt"))
+
+        si = SLD(2.07, name="Si")
+        sio2 = SLD(3.47, name="SiO2")
+        d2o = SLD(6.36, name="D2O")
+        polymer = SLD(1, name="polymer")
+
+        structure = si | sio2(10, 4) | polymer(200, 3) | d2o(0, 3)
+        structure[1].thick.setp(vary=True, bounds=(5, 20))
+        structure[2].thick.setp(vary=True, bounds=(100, 220))
+        structure[2].sld.real.setp(vary=True, bounds=(0.2, 1.5))
+        model = ReflectModel(structure, bkg=2e-5)
+        model.bkg.setp(vary=True, bounds=(0, 5e-5))
+
+        self.objective = Objective(model, e361)
+        self.fitter = CurveFitter(self.objective)
+        self.p0 = np.array(self.objective.varying_parameters())
+
+    def time_differential_evolution(self, vectorized):
+        self.objective.setp(self.p0)
+        self.fitter.fit(
+            "differential_evolution",
+            seed=1,
+            maxiter=10,
+            tol=0,
+            polish=False,
+            updating="deferred",
+            vectorized=vectorized,
+            verbose=False,
+        )
@@ -16,6 +16,7 @@ class EnsembleConfiguration(object):
     adaptation_time = attr.ib()
     scale_factor = attr.ib()
     evaluator = attr.ib()
+    vectorize = attr.ib(default=False)
 
 
 @attr.s(slots=True)
@@ -157,6 +158,11 @@ class Ensemble(object):
         shape = x.shape[:-1]
         values = x.reshape((-1, self.ndim))
         length = len(values)
+
+        if self._config.vectorize:
+            logl, logp = self._config.evaluator.batch(values)
+            return logl.reshape(shape), logp.reshape(shape)
+
         results = itertools.chain.from_iterable(
             self._mapper(self._config.evaluator, values)
         )
@@ -234,6 +234,30 @@ class LikePriorEvaluator(object):
 
         return ll, lp
 
+    def batch(self, x):
+        """
+        Evaluate many positions at once, `logl` and `logp` accept an array of
+        shape `(N, ndim)` and return arrays of shape `(N,)`.
+
+        """
+        lp = np.asarray(
+            self.logp(x, *self.logp_args, **self.logp_kwargs), dtype=float
+        )
+        if np.isnan(lp).any():
+            raise ValueError("Prior function returned NaN.")
+
+        # Can't return -inf, since this messes with beta=0 behaviour.
+        ll = np.zeros_like(lp)
+        finite = lp != float("-inf")
+        if finite.any():
+            ll[finite] = self.logl(
+                x[finite], *self.logl_args, **self.logl_kwargs
+            )
+            if np.isnan(ll).any():
+                raise ValueError("Log likelihood function returned NaN.")
+
+        return ll, lp
+
 
 @attr.s(slots=True, frozen=True)
 class Sampler(object):
@@ -256,6 +280,9 @@ class Sampler(object):
     adaptation_time = attr.ib(converter=int, default=100)
     scale_factor = attr.ib(converter=float, default=2)
 
+    # logl and logp evaluate all walkers (and temperatures) in one call.
+    vectorize = attr.ib(converter=bool, default=False)
+
     _mapper = attr.ib(default=map)
     _evaluator = attr.ib(type=LikePriorEvaluator, init=False, default=None)
     _data = attr.ib(type=np.ndarray, init=False, default=None)
@@ -327,6 +354,7 @@ class Sampler(object):
             adaptation_time=self.adaptation_time,
             scale_factor=self.scale_factor,
             evaluator=self._evaluator,
+            vectorize=self.vectorize,
         )
         return ensemble.Ensemble(
             x=x,
@@ -1,5 +1,7 @@
 from multiprocessing import Pool
-from multiprocessing.pool import Pool as PWL
+from multiprocessing.pool import Pool as PWL, ThreadPool
+import threading
+import time
 from importlib import resources
 
 
@@ -42,6 +44,32 @@ class TestUtil:
             assert hasattr(f, "read")
 
 
+class _CountPickles:
+    # counts how many times instances are pickled in this process
+    npickled = 0
+
+    def __call__(self, x):
+        return np.sin(x)
+
+    def __getstate__(self):
+        type(self).npickled += 1
+        return self.__dict__
+
+
+class _Stateful:
+    # sets state and then reads it back, like Objective.setp followed by
+    # a calculation
+    def __init__(self):
+        self.x = None
+        self.threads = set()
+
+    def __call__(self, x):
+        self.x = x
+        self.threads.add(threading.get_ident())
+        time.sleep(0.001)
+        return np.sin(self.x)
+
+
 class TestMapWrapper:
     def setup_method(self):
         self.input = np.arange(10.0)
@@ -87,3 +115,54 @@ class TestMapWrapper:
             assert_equal(out, self.output)
         finally:
             p.close()
+
+    def test_resident(self):
+        f = _CountPickles()
+        with MapWrapper(2, resident=True) as p:
+            # the pool is started once the callable is known
+            assert p.pool is None
+            assert_equal(p(f, self.input), self.output)
+            pool = p.pool
+            assert isinstance(pool, PWL)
+
+            # the callable is only sent to the workers when they start
+            npickled = _CountPickles.npickled
+            for i in range(3):
+                assert_equal(p.map(f, self.input), self.output)
+            assert _CountPickles.npickled == npickled
+            assert p.pool is pool
+
+            # a different callable restarts the pool
+            g = _CountPickles()
+            assert_equal(p(g, self.input), self.output)
+            assert p.pool is not pool
+
+        with assert_raises(ValueError):
+            p(g, self.input)
+
+    def test_threads(self):
+        f = _Stateful()
+        input = np.arange(200.0)
+        with MapWrapper("threads:4") as p:
+            assert isinstance(p.pool, ThreadPool)
+            assert p._own_pool is True
+
+            # each thread uses its own copy of the callable, so setting
+            # state on it doesn't race
+            assert_equal(p(f, input), np.sin(input))
+            assert f.x is None
+            assert not f.threads
+            clones = p._mapfunc.args[0]
+            for i in range(2):
+                assert_equal(p(f, input), np.sin(input))
+            assert p._mapfunc.args[0] is clones
+
+        with assert_raises(ValueError):
+            p(f, input)
+
+        with assert_raises(ValueError):
+            MapWrapper("processes:2")
+
+        # all the CPUs
+        with MapWrapper("threads") as p:
+            assert_equal(p(np.sin, self.input), self.output)
@@ -1,8 +1,12 @@
 from multiprocessing import Pool, get_context
+from multiprocessing.pool import ThreadPool
 import warnings as _warnings
 import os as _os
 import sys as _sys
 import functools
+import itertools
+import pickle
+import threading
 from tempfile import mkdtemp
 from contextlib import contextmanager
 from inspect import getfullargspec as _getargspecf
@@ -202,6 +206,54 @@ def possibly_open_file(f, mode="r"):
             g.close()
 
 
+# callables installed in the worker processes of a MapWrapper(resident=True)
+# pool, keyed by _ResidentFunc.key
+_resident_funcs = {}
+_resident_keys = itertools.count()
+
+
+def _install_resident(key, func):
+    """
+    Pool initializer for MapWrapper(resident=True).
+    """
+    _resident_funcs.clear()
+    _resident_funcs[key] = func
+
+
+class _ResidentFunc:
+    """
+    Stands in for a callable that has been installed in each worker process
+    of a pool. Only the key is pickled when tasks are sent to the pool.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self, *args, **kwds):
+        return _resident_funcs[self.key](*args, **kwds)
+
+
+class _ThreadLocalFunc:
+    """
+    Calls a private copy of a callable in each thread of a thread pool, so
+    that a callable with state (e.g. the method of an `Objective`, which sets
+    parameter values on each call) can be evaluated concurrently. The
+    callable is pickled once, and each thread unpickles its own copy on first
+    use.
+    """
+
+    def __init__(self, func):
+        self._pickled = pickle.dumps(func)
+        self._local = threading.local()
+
+    def __call__(self, *args, **kwds):
+        try:
+            func = self._local.func
+        except AttributeError:
+            func = self._local.func = pickle.loads(self._pickled)
+        return func(*args, **kwds)
+
+
 class MapWrapper:
     """
     Parallelisation wrapper for working with map-like callables, such as
@@ -209,22 +261,51 @@ class MapWrapper:
 
     Parameters
     ----------
-    pool : int or map-like callable
-        If `pool` is an integer, then it specifies the number of threads to
+    pool : int, str or map-like callable
+        If `pool` is an integer, then it specifies the number of processes to
         use for parallelization. If ``int(pool) == 1``, then no parallel
         processing is used and the map builtin is used.
         If ``pool == -1``, then the pool will utilise all available CPUs.
+        If `pool` is a str of the form ``'threads:N'`` then a pool of `N`
+        threads is used instead of processes (``'threads'`` or
+        ``'threads:-1'`` uses all available CPUs). See Notes.
         If `pool` is a map-like callable that follows the same
         calling sequence as the built-in map function, then this callable is
         used for parallelisation.
     context : None, {'spawn', 'fork', 'forkserver'}
+    resident : bool, optional
+        Only used if `pool` is an integer and a process pool is created. If
+        `True`, the callable being mapped is pickled once and installed in
+        each worker process by the pool initializer, rather than being
+        pickled and sent to the workers with every call. Later calls that
+        map the same callable object only send the iterable. Mapping a
+        different callable restarts the pool. Use this when the same
+        expensive to pickle callable (e.g. a method of an `Objective`) is
+        mapped many times. Any changes made to the callable in this process
+        after it has been installed aren't seen by the workers.
+
+    Notes
+    -----
+    A thread pool avoids the start-up cost, pickling and separate memory of
+    worker processes, but only runs in parallel if the mapped callable
+    spends most of its time in code that releases the GIL, such as the C
+    reflectivity kernels. Each thread evaluates its own copy of the mapped
+    callable, made by pickling, so that concurrent calls can't race on
+    shared state (e.g. the values of `Parameter` objects set by
+    `Objective.setp`). As with `resident=True`, the copies are made when a
+    callable is first mapped and are reused while the same callable object
+    is mapped, so later changes to the original aren't seen by the threads.
 
     """
 
-    def __init__(self, pool=-1, context=None):
+    def __init__(self, pool=-1, context=None, resident=False):
         self.pool = None
         self._mapfunc = map
         self._own_pool = False
+        self._resident = False
+        self._threads = False
+        self._resident_func = None
+        self._closed = False
 
         # to align with cp314 which uses forkserver as a default
         if (
@@ -239,6 +320,19 @@ class MapWrapper:
         if callable(pool):
             self.pool = pool
             self._mapfunc = self.pool
+        elif isinstance(pool, str):
+            kind, _, num_threads = pool.partition(":")
+            if kind != "threads":
+                raise ValueError("A str pool must be of the form 'threads:N'")
+            num_threads = int(num_threads or -1)
+            if num_threads == -1:
+                num_threads = _os.getenv("NUM_PROCS")
+                if num_threads is not None:
+                    num_threads = int(num_threads)
+
+            self.pool = ThreadPool(processes=num_threads)
+            self._own_pool = True
+            self._threads = True
         else:
             # Always respect a user supplied number.
             if int(pool) == -1:
@@ -253,17 +347,24 @@ class MapWrapper:
                     num_procs = int(num_procs)
 
                 # use as many processors as possible
-                self.pool = ctx.Pool(num_procs)
-                self._mapfunc = self.pool.map
                 self._own_pool = True
             elif int(pool) in [0, 1]:
                 pass
             elif int(pool) > 1:
                 # use the number of processors requested
-                self.pool = ctx.Pool(processes=int(pool))
-                self._mapfunc = self.pool.map
+                num_procs = int(pool)
                 self._own_pool = True
 
+            if self._own_pool:
+                self._ctx = ctx
+                self._processes = num_procs
+                self._resident = bool(resident)
+                # a resident pool is started by the first call, once the
+                # callable is known.
+                if not self._resident:
+                    self.pool = ctx.Pool(processes=num_procs)
+                    self._mapfunc = self.pool.map
+
     def __enter__(self):
         return self
 
@@ -272,23 +373,55 @@ class MapWrapper:
         self.terminate()
 
     def terminate(self):
-        if self._own_pool:
+        if self._own_pool and self.pool is not None:
             self.pool.terminate()
 
     def join(self):
-        if self._own_pool:
+        if self._own_pool and self.pool is not None:
             self.pool.join()
 
     def close(self):
-        if self._own_pool:
+        if self._own_pool and self.pool is not None:
             self.pool.close()
+        self._closed = True
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self._own_pool:
-            self.pool.close()
-            self.pool.terminate()
+        self.close()
+        self.terminate()
+
+    def _start_resident(self, func):
+        """
+        (Re)starts the pool with `func` installed in each worker, or sets up
+        per-thread copies of `func` for a thread pool.
+        """
+        # a closed pool mustn't be restarted by the next call
+        if self._closed:
+            raise ValueError("Pool not running")
+
+        if self._threads:
+            # the threads are kept, each makes its own copy of func
+            self._resident_func = func
+            self._mapfunc = functools.partial(
+                self.pool.map, _ThreadLocalFunc(func)
+            )
+            return
+
+        self.terminate()
+        key = (_os.getpid(), next(_resident_keys))
+        self.pool = self._ctx.Pool(
+            processes=self._processes,
+            initializer=_install_resident,
+            initargs=(key, func),
+        )
+        self._resident_func = func
+        self._mapfunc = functools.partial(self.pool.map, _ResidentFunc(key))
 
     def __call__(self, func, iterable):
+        if self._resident or self._threads:
+            if func is not self._resident_func:
+                self._start_resident(func)
+            return self._mapfunc(iterable)
+
         # only accept one iterable because that's all Pool.map accepts
         try:
             return self._mapfunc(func, iterable)
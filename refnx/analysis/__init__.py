@@ -20,6 +20,7 @@ from refnx.analysis.curvefitter import (
     process_chain,
     load_chain,
     autocorrelation_chain,
+    integrated_time_chain,
 )
 from refnx._lib.emcee.autocorr import integrated_time
 from refnx.analysis.model import Model, fitfunc
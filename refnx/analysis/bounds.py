@@ -4,6 +4,17 @@ from scipy.stats._distn_infrastructure import rv_frozen
 from scipy._lib._util import check_random_state
 import numpy as np
 
+# A counter that is incremented whenever the `vary`, `bounds` or `constraint`
+# of a Parameter, or the limits of an Interval, are changed. Cached
+# descriptions of a parameter set (see `refnx.analysis.parameter`) compare
+# against this counter to know when they have to be rebuilt.
+_revision = 0
+
+
+def _bump_revision():
+    global _revision
+    _revision += 1
+
 
 class Bounds:
     """
@@ -257,6 +268,7 @@ class Interval(Bounds):
         self._set_bounds(self._lb, self._ub)
 
     def _set_bounds(self, lb, ub):
+        _bump_revision()
         self._lb = float(min(lb, ub))
         self._ub = float(max(lb, ub))
         self._closed_bounds = False
@@ -1,4 +1,7 @@
 from collections import namedtuple
+from contextlib import ExitStack
+import os
+import pickle
 import sys
 import re
 import warnings
@@ -11,7 +14,13 @@ from scipy.optimize import minimize, differential_evolution, least_squares
 import scipy.optimize as sciopt
 from scipy.stats.qmc import LatinHypercube
 
-from refnx.analysis import Objective, Interval, PDF, is_parameter
+from refnx.analysis import (
+    Objective,
+    GlobalObjective,
+    Interval,
+    PDF,
+    is_parameter,
+)
 from refnx._lib import (
     unique as f_unique,
     MapWrapper,
@@ -21,12 +30,17 @@ from refnx._lib import (
 from refnx._lib.util import getargspec
 from refnx._lib import emcee
 from refnx._lib.emcee.state import State
+from refnx._lib.emcee.autocorr import auto_window
 from refnx._lib.emcee.pbar import get_progress_bar
 
 MCMCResult = namedtuple(
     "MCMCResult", ["name", "param", "stderr", "chain", "median"]
 )
 
+# chains are processed in blocks of steps of about this many bytes, see
+# `process_chain` and `autocorrelation_chain`.
+_CHAIN_BLOCK_BYTES = 2**26
+
 
 class PTSampler:
     def __init__(self, ntemps, nwalkers, ndim, logl, logp, **kwargs):
@@ -161,13 +175,61 @@ class PTSampler:
     @property
     def random_state(self):
         if self._ptchain is not None:
-            self._ptchain.ensemble._rng.bit_generator.state
+            return self._ptchain.ensemble._rng.bit_generator.state
 
     @random_state.setter
     def random_state(self, state):
         if self._ptchain is not None:
             self._ptchain.ensemble._rng.bit_generator.state = state
 
+    def _ensemble_state(self):
+        """
+        Everything needed to restart the chain stepper, see `_restore`.
+        """
+        e = self._ptchain.ensemble
+        return {
+            "x": e.x,
+            "logP": e.logP,
+            "logl": e.logl,
+            "betas": e.betas,
+            "time": e.time,
+            "random_state": self.random_state,
+        }
+
+    def _restore(self, ensemble_state):
+        """
+        Restarts the chain stepper from the output of `_ensemble_state`. The
+        history of the chain is not restored.
+        """
+        self._ptchain = self.sampler.chain(ensemble_state["x"])
+        e = self._ptchain.ensemble
+        # the temperature ladder may have been adapted
+        e.betas = np.array(ensemble_state["betas"])
+        e.logP = np.array(ensemble_state["logP"])
+        e.logl = np.array(ensemble_state["logl"])
+        e.time = ensemble_state["time"]
+        self.random_state = ensemble_state["random_state"]
+        self._state = State(
+            e.x,
+            log_prob=e.logl + e.logP,
+            random_state=ensemble_state["random_state"],
+        )
+
+
+def _compile_objective(objective):
+    """
+    Compiles an Objective or GlobalObjective with JAX, see
+    :func:`refnx.reflect.extra.compile_objective`.
+    """
+    from refnx.reflect.extra import (
+        compile_objective,
+        compile_global_objective,
+    )
+
+    if isinstance(objective, GlobalObjective):
+        return compile_global_objective(objective)
+    return compile_objective(objective)
+
 
 class CurveFitter:
     """
@@ -189,7 +251,16 @@ class CurveFitter:
         `None`, in which case the `Tmax` keyword argument sets the maximum
         temperature. Parallel Tempering is useful if you expect your
         posterior distribution to be multi-modal.
-
+    vectorize : bool, optional
+        If `True` the positions of all the walkers (and temperatures) are
+        evaluated with a single call to the batched methods of the objective
+        (`Objective.logpost_batch`, or `Objective.logl_batch` and
+        `Objective.logp_batch` for parallel tempering), rather than one walker
+        at a time. This is faster if the objective has a batched
+        implementation, e.g. an `Objective` whose model has a
+        `model_batch` method, such as :class:`refnx.reflect.ReflectModel`.
+        The `pool` argument of the `sample` method is ignored if
+        `vectorize` is `True`.
     mcmc_kws : dict
         Keywords used to create the :class:`emcee.EnsembleSampler` or
         :class:`ptemcee.sampler.Sampler` objects.
@@ -203,7 +274,9 @@ class CurveFitter:
     `pool` argument in the `sample` method.
     """
 
-    def __init__(self, objective, nwalkers=200, ntemps=-1, **mcmc_kws):
+    def __init__(
+        self, objective, nwalkers=200, ntemps=-1, vectorize=False, **mcmc_kws
+    ):
         """
         Parameters
         ----------
@@ -221,6 +294,10 @@ class CurveFitter:
             temperatures. Can be `None`, in which case the `Tmax` keyword
             argument sets the maximum temperature. Parallel Tempering is
             useful if you expect your posterior distribution to be multi-modal.
+        vectorize : bool, optional
+            If `True` all the walkers are evaluated with a single call to the
+            batched methods of the objective (e.g.
+            `Objective.logpost_batch`).
         mcmc_kws : dict
             Keywords used to create the :class:`emcee.EnsembleSampler` or
             :class:`ptemcee.sampler.PTSampler` objects.
@@ -249,11 +326,15 @@ class CurveFitter:
 
         self._nwalkers = nwalkers
         self._ntemps = ntemps
+        self._vectorize = bool(vectorize)
         self.make_sampler()
         self._state = None
 
     def __setstate__(self, state):
         self.__dict__.update(state)
+        self.__dict__.setdefault("_vectorize", False)
+        self.__dict__.setdefault("_restored_random_state", False)
+        self.__dict__.setdefault("_chain_steps", None)
         self.__var_id = [
             id(obj) for obj in self.objective.varying_parameters()
         ]
@@ -270,6 +351,7 @@ class CurveFitter:
             f"CurveFitter({self.objective!r},"
             f" nwalkers={self._nwalkers},"
             f" ntemps={self._ntemps},"
+            f" vectorize={self._vectorize},"
             f" {self.mcmc_kws!r})"
         )
 
@@ -286,12 +368,21 @@ class CurveFitter:
             raise ValueError("No parameters are being fitted")
 
         if self._ntemps == -1:
-            self.sampler = emcee.EnsembleSampler(
-                self._nwalkers,
-                self.nvary,
-                self.objective.logpost,
-                **self.mcmc_kws,
-            )
+            if self._vectorize:
+                self.sampler = emcee.EnsembleSampler(
+                    self._nwalkers,
+                    self.nvary,
+                    self.objective.logpost_batch,
+                    vectorize=True,
+                    **self.mcmc_kws,
+                )
+            else:
+                self.sampler = emcee.EnsembleSampler(
+                    self._nwalkers,
+                    self.nvary,
+                    self.objective.logpost,
+                    **self.mcmc_kws,
+                )
         # Parallel Tempering was requested.
         else:
             sig = {
@@ -301,10 +392,16 @@ class CurveFitter:
                 "logl": self.objective.logl,
                 "logp": self.objective.logp,
             }
+            if self._vectorize:
+                sig["logl"] = self.objective.logl_batch
+                sig["logp"] = self.objective.logp_batch
+                sig["vectorize"] = True
             sig.update(self.mcmc_kws)
             self.sampler = PTSampler(**sig)
 
         self._state = None
+        self._restored_random_state = False
+        self._chain_steps = None
 
     def _check_vars_unchanged(self):
         """
@@ -459,6 +556,7 @@ class CurveFitter:
             rstate0 = rng.bit_generator.state
 
         self._state = State(init_walkers, random_state=rstate0)
+        self._restored_random_state = False
 
         # finally reset the sampler to reset the chain
         # you have to do this at the end, not at the start because resetting
@@ -472,10 +570,14 @@ class CurveFitter:
 
         Parameters
         ----------
-        chain : array
+        chain : {array, str, Path}
             Array of size `(steps, ntemps, nwalkers, ndim)` or
             `(steps, nwalkers, ndim)`, containing a chain from a previous
-            sampling run.
+            sampling run. Alternatively the name of a chain file saved by
+            :meth:`sample`. If it's a binary chain file the log-probabilities
+            and the state of the random number generator are also restored,
+            so that a subsequent call to :meth:`sample` (that doesn't specify
+            `random_state`) carries on from where the previous run finished.
         """
         # we should be left with (nwalkers, ndim) or (ntemp, nwalkers, ndim)
 
@@ -484,10 +586,21 @@ class CurveFitter:
         else:
             required_shape = (self._ntemps, self._nwalkers, self.nvary)
 
-        chain_shape = chain.shape[1:]
+        state = None
+        if _is_binary_chain(chain):
+            state = _load_chain_state(chain)
+            chain_shape = state.coords.shape
+        else:
+            if isinstance(chain, (str, os.PathLike)):
+                chain = load_chain(chain)
+            chain_shape = chain.shape[1:]
 
         # if the shapes are the same, then we can initialise
-        if required_shape == chain_shape:
+        if required_shape == chain_shape and state is not None:
+            self._state = state
+            self._restored_random_state = state.random_state is not None
+            self.sampler.reset()
+        elif required_shape == chain_shape:
             self.initialise(pos=chain[-1])
         else:
             raise ValueError(
@@ -495,6 +608,96 @@ class CurveFitter:
                 " the wrong shape"
             )
 
+    def _save_checkpoint(self, f, steps_remaining, h=None):
+        """
+        Atomically saves a snapshot of the sampler state, see `resume`. `h`
+        is the file the chain is being saved to.
+        """
+        snapshot = {
+            "sampler": type(self.sampler).__name__,
+            "nwalkers": self._nwalkers,
+            "nvary": self.nvary,
+            "state": self._state,
+            "ensemble": None,
+            "steps_remaining": steps_remaining,
+            "chain_steps": getattr(h, "nsteps", None),
+        }
+        if isinstance(self.sampler, PTSampler):
+            snapshot["ensemble"] = self.sampler._ensemble_state()
+
+        # write to a temporary file first so that an interruption can't
+        # leave a partially written checkpoint behind.
+        f = os.fspath(f)
+        tmp = f"{f}.tmp"
+        with open(tmp, "wb") as h:
+            pickle.dump(snapshot, h)
+            h.flush()
+            os.fsync(h.fileno())
+        os.replace(tmp, f)
+
+    def resume(self, checkpoint):
+        """
+        Restores the sampler state from a checkpoint saved by :meth:`sample`.
+
+        Parameters
+        ----------
+        checkpoint : {str, Path}
+            Checkpoint file.
+
+        Returns
+        -------
+        steps_remaining : int
+            How many steps the :meth:`sample` call that saved the checkpoint
+            still had to do.
+
+        Notes
+        -----
+        The `CurveFitter` has to be created for the same objective, with the
+        same number of walkers and the same kind of sampler, as the one that
+        saved the checkpoint. The chain collected before the checkpoint isn't
+        restored, save it with the `f` argument of :meth:`sample`. A
+        subsequent call to :meth:`sample` that doesn't specify
+        `random_state` carries on with the restored random number generator,
+        so the resumed run is the same as an uninterrupted one.
+        If the chain was saved to a binary chain file give the same file to
+        the next call of :meth:`sample`. The new steps are appended to it,
+        replacing any that were saved after the checkpoint, so the file
+        holds the same chain as an uninterrupted run.
+
+        >>> fitter = CurveFitter(objective)
+        >>> fitter.sample(100000, f="chain.npy", checkpoint="state.pkl")
+        >>> # ... the process dies, restart with:
+        >>> fitter = CurveFitter(objective)
+        >>> steps = fitter.resume("state.pkl")
+        >>> fitter.sample(steps, f="chain.npy", checkpoint="state.pkl")
+        """
+        self._check_vars_unchanged()
+
+        with possibly_open_file(checkpoint, "rb") as h:
+            snapshot = pickle.load(h)
+
+        if (
+            snapshot["sampler"] != type(self.sampler).__name__
+            or snapshot["nwalkers"] != self._nwalkers
+            or snapshot["nvary"] != self.nvary
+        ):
+            raise ValueError(
+                "The checkpoint was saved by a CurveFitter with a different"
+                " sampler, number of walkers, or number of varying"
+                " parameters."
+            )
+
+        if isinstance(self.sampler, PTSampler):
+            self.sampler._restore(snapshot["ensemble"])
+            self._state = self.sampler._state
+        else:
+            self.sampler.reset()
+            self._state = snapshot["state"]
+
+        self._restored_random_state = True
+        self._chain_steps = snapshot.get("chain_steps")
+        return snapshot["steps_remaining"]
+
     @property
     def chain(self):
         """
@@ -562,6 +765,8 @@ class CurveFitter:
         callback=None,
         verbose=True,
         pool=-1,
+        checkpoint=None,
+        checkpoint_interval=10,
     ):
         """
         Performs sampling from the objective.
@@ -591,18 +796,41 @@ class CurveFitter:
             File to incrementally save chain progress to. Each row in the file
             is a flattened array of size `(nwalkers, ndim)` or
             `(ntemps, nwalkers, ndim)`. There are `steps` rows in the
-            file.
+            file. If `f` is a str or Path ending in `'.npy'` the chain is
+            saved in a binary format instead, which is much faster to write
+            and smaller on disk. Binary files also store the log-probability
+            of each sample and the state of the random number generator, see
+            :func:`load_chain` and :meth:`initialise_with_chain`. If the
+            binary file already holds a chain with the same number of walkers
+            (and temperatures) and parameters, the steps are appended to it.
+            A `ValueError` is raised if the shape of the steps differs.
         callback : callable
             callback function to be called at each iteration step. Has the
             signature `callback(coords, logprob)`.
         verbose : bool, optional
             Gives updates on the sampling progress
-        pool : int or map-like object, optional
-            If `pool` is an `int` then it specifies the number of threads to
-            use for parallelization. If `pool == -1`, then all CPU's are used.
+        pool : int, str or map-like object, optional
+            If `pool` is an `int` then it specifies the number of processes
+            to use for parallelization. If `pool == -1`, then all CPU's are
+            used. If `pool` is a str such as ``'threads:4'`` then a pool of
+            threads is used instead, each evaluating its own copy of the
+            objective, see :class:`refnx._lib.MapWrapper`.
             If pool is a map-like callable that follows the same calling
             sequence as the built-in map function, then this pool is used for
-            parallelisation.
+            parallelisation. Ignored if the `CurveFitter` was created with
+            `vectorize=True`. If a process pool is created (`pool` is an
+            `int`) the objective is installed once in each worker process,
+            rather than being pickled for every step, see
+            :class:`refnx._lib.MapWrapper` (`resident=True`).
+        checkpoint : {str, Path}, optional
+            File to periodically save a snapshot of the sampler state to
+            (walker positions, log-probabilities, random number generator
+            state and, for parallel tempering, the temperature ladder). The
+            file is atomically replaced by each new snapshot, so it's always
+            usable by :meth:`resume` if the sampling is interrupted.
+        checkpoint_interval : int, optional
+            A snapshot is saved every `checkpoint_interval` steps, and at the
+            end of sampling.
 
         Notes
         -----
@@ -621,6 +849,11 @@ class CurveFitter:
         """
         self._check_vars_unchanged()
 
+        # all the walkers are evaluated by a single call, there's nothing for
+        # a pool to do.
+        if self._vectorize:
+            pool = 1
+
         # setup a random number generator
         # want Generator for ptemcee
         if self._ntemps == -1:
@@ -639,7 +872,11 @@ class CurveFitter:
             if callback is not None:
                 callback(state.coords, state.log_prob)
 
-            if h is not None:
+            if isinstance(h, _ChainFile):
+                h.append(
+                    state.coords, state.log_prob, self.sampler.random_state
+                )
+            elif h is not None:
                 h.write(" ".join(map(str, state.coords.ravel())))
                 h.write("\n")
 
@@ -653,7 +890,7 @@ class CurveFitter:
             param.chain = None
 
         # make sure the checkpoint file exists
-        if f is not None:
+        if f is not None and not _is_binary_chain(f):
             with possibly_open_file(f, "w") as h:
                 # write the shape of each step of the chain
                 h.write("# ")
@@ -664,7 +901,10 @@ class CurveFitter:
         # set the random state of the sampler
         # normally one could give this as an argument to the sample method
         # but PTSampler didn't historically accept that...
-        if self._ntemps == -1 and isinstance(rng, np.random.RandomState):
+        if random_state is None and self._restored_random_state:
+            # carry on with the random state restored from a chain file
+            pass
+        elif self._ntemps == -1 and isinstance(rng, np.random.RandomState):
             rstate0 = rng.get_state()
             self._state.random_state = rstate0
             self.sampler.random_state = rstate0
@@ -673,7 +913,16 @@ class CurveFitter:
 
         # using context manager means we kill off zombie pool objects
         # but does mean that the pool has to be specified each time.
-        with MapWrapper(pool) as g, possibly_open_file(f, "a") as h:
+        self._restored_random_state = False
+        chain_steps, self._chain_steps = self._chain_steps, None
+
+        with (
+            MapWrapper(pool, resident=True) as g,
+            _open_chain_file(
+                f, self._state.coords.shape, nsteps=chain_steps
+            ) as h,
+            self.objective.parameter_plan(),
+        ):
             # these kwargs are provided to the sampler.sample method
             kwargs = {"iterations": steps, "thin": nthin}
 
@@ -698,9 +947,16 @@ class CurveFitter:
                 kwargs.pop("thin", 0)
 
             # perform the sampling
-            for state in self.sampler.sample(self._state, **kwargs):
+            for i, state in enumerate(
+                self.sampler.sample(self._state, **kwargs), 1
+            ):
                 self._state = state
                 _callback_wrapper(state, h=h)
+                if checkpoint is not None and not i % checkpoint_interval:
+                    self._save_checkpoint(checkpoint, steps - i, h)
+
+            if checkpoint is not None:
+                self._save_checkpoint(checkpoint, 0, h)
 
         if isinstance(self.sampler, emcee.EnsembleSampler):
             self.sampler.pool = None
@@ -726,6 +982,11 @@ class CurveFitter:
             - `'dual_annealing'`:
               :func:`scipy.optimize.dual_annealing` (SciPy >= 1.2.0)
             - `'shgo'`: :func:`scipy.optimize.shgo` (SciPy >= 1.2.0)
+            - `'jax-lbfgs'`: L-BFGS-B, using the exact gradient of the
+              JAX compiled objective.
+            - `'jax-trust'`: the `'trust-constr'` method of
+              :func:`scipy.optimize.minimize`, using the exact gradient and
+              Hessian-vector products of the JAX compiled objective.
 
             You can also choose many of the minimizers from
             :func:`scipy.optimize.minimize`.
@@ -737,7 +998,8 @@ class CurveFitter:
             Maximising the likelihood is equivalent to minimising chi^2 in a
             least-squares fit.
             This option only applies to the `differential_evolution`, `shgo`,
-            `dual_annealing` or `L-BFGS-B` methods.
+            `dual_annealing` or `L-BFGS-B` methods. The `jax-lbfgs` and
+            `jax-trust` methods only minimize the negative log-likelihood.
             These optimisers require lower and upper (box) bounds for each
             parameter. If the `Bounds` on a parameter are not an `Interval`,
             but a `PDF` specifying a statistical distribution, then the lower
@@ -749,7 +1011,16 @@ class CurveFitter:
             installed.
         kws : dict
             Additional arguments are passed to the underlying minimization
-            method.
+            method. For `differential_evolution` and `shgo` the `workers`
+            keyword can also be a str such as ``'threads:4'``, which
+            evaluates the objective in a pool of threads, see
+            :class:`refnx._lib.MapWrapper`.
+            If ``vectorized=True`` is given to `differential_evolution`
+            each generation is evaluated with a single call to the batched
+            methods of the objective (`Objective.logl_batch` or
+            `Objective.logpost_batch`), which calculate the reflectivity of
+            the whole population with one kernel call for a
+            :class:`refnx.reflect.ReflectModel`.
 
         Returns
         -------
@@ -771,7 +1042,20 @@ class CurveFitter:
         The use of `dual annealing` and `shgo` requires that `scipy >= 1.2.0`
         be installed.
 
+        The `jax-lbfgs` and `jax-trust` methods require jax. The objective
+        is compiled with :func:`refnx.reflect.extra.compile_objective` (or
+        :func:`refnx.reflect.extra.compile_global_objective`) each time
+        `fit` is called, so changes to which parameters vary are picked up.
+        Enable 64-bit floats in jax before using them.
+
         """
+        jax_methods = {"jax-lbfgs": "L-BFGS-B", "jax-trust": "trust-constr"}
+        if method in jax_methods and target != "nll":
+            raise ValueError(
+                f"The {method} method can only minimize the negative"
+                " log-likelihood (target='nll')"
+            )
+
         _varying_parameters = self.objective.varying_parameters()
         init_pars = np.array(_varying_parameters)
 
@@ -805,45 +1089,91 @@ class CurveFitter:
 
             return callback
 
-        # least_squares Trust Region Reflective by default
-        if method == "least_squares":
-            b = np.array(_bounds)
-            _min_kws["bounds"] = (b[..., 0], b[..., 1])
+        # the parameter plan avoids walking the parameter tree for each
+        # evaluation of the cost function
+        with self.objective.parameter_plan():
+            # least_squares Trust Region Reflective by default
+            if method == "least_squares":
+                b = np.array(_bounds)
+                _min_kws["bounds"] = (b[..., 0], b[..., 1])
 
-            # least_squares doesn't have a callback
-            _min_kws.pop("callback", None)
+                # least_squares doesn't have a callback
+                _min_kws.pop("callback", None)
 
-            res = least_squares(
-                self.objective.residuals, init_pars, **_min_kws
-            )
-        # differential_evolution, dual_annealing, shgo require lower and upper
-        # bounds
-        elif method in ["differential_evolution", "dual_annealing", "shgo"]:
-            mini = getattr(sciopt, method)
-
-            if method == "shgo":
-                if "n" not in _min_kws:
-                    _min_kws["n"] = 100
-                if "iters" not in kws:
-                    _min_kws["iters"] = 5
-
-            with get_progress_bar(verbose, None) as pbar:
-                _min_kws["callback"] = _callback_wrapper(
-                    _min_kws["callback"], pbar
+                res = least_squares(
+                    self.objective.residuals, init_pars, **_min_kws
                 )
+            # differential_evolution, dual_annealing, shgo require lower and
+            # upper bounds
+            elif method in [
+                "differential_evolution",
+                "dual_annealing",
+                "shgo",
+            ]:
+                mini = getattr(sciopt, method)
+
+                if method == "shgo":
+                    if "n" not in _min_kws:
+                        _min_kws["n"] = 100
+                    if "iters" not in kws:
+                        _min_kws["iters"] = 5
+
+                func = cost
+                if method == "differential_evolution" and kws.get(
+                    "vectorized"
+                ):
+                    func = self._vectorized_cost(target)
+                    # scipy warns if it has to override the default
+                    _min_kws.setdefault("updating", "deferred")
 
-                res = mini(cost, **_min_kws)
-        else:
-            # otherwise stick it to minimizer. Default being L-BFGS-B
-            _min_kws["method"] = method
-            _min_kws["bounds"] = _bounds
+                with (
+                    get_progress_bar(verbose, None) as pbar,
+                    ExitStack() as stack,
+                ):
+                    _min_kws["callback"] = _callback_wrapper(
+                        _min_kws["callback"], pbar
+                    )
 
-            with get_progress_bar(verbose, None) as pbar:
-                _min_kws["callback"] = _callback_wrapper(
-                    _min_kws["callback"], pbar
+                    # scipy only understands an int or a map-like callable
+                    if isinstance(_min_kws.get("workers"), str):
+                        _min_kws["workers"] = stack.enter_context(
+                            MapWrapper(_min_kws["workers"])
+                        )
+                        if method == "differential_evolution":
+                            _min_kws.setdefault("updating", "deferred")
+
+                    res = mini(func, **_min_kws)
+            # gradient based minimizers using the JAX compiled objective
+            elif method in jax_methods:
+                from refnx.reflect.extra import make_scipy_objective
+
+                cost, jac, hessp = make_scipy_objective(
+                    _compile_objective(self.objective), hessp=True
                 )
+                _min_kws["method"] = jax_methods[method]
+                _min_kws["jac"] = jac
+                if method == "jax-trust":
+                    b = np.array(_bounds)
+                    _min_kws["bounds"] = sciopt.Bounds(b[..., 0], b[..., 1])
+                    _min_kws["hessp"] = hessp
+
+                with get_progress_bar(verbose, None) as pbar:
+                    _min_kws["callback"] = _callback_wrapper(
+                        _min_kws["callback"], pbar
+                    )
 
-                res = minimize(cost, init_pars, **_min_kws)
+                    res = minimize(cost, init_pars, **_min_kws)
+            else:
+                # otherwise stick it to minimizer. Default being L-BFGS-B
+                _min_kws["method"] = method
+                _min_kws["bounds"] = _bounds
+
+                with get_progress_bar(verbose, None) as pbar:
+                    _min_kws["callback"] = _callback_wrapper(
+                        _min_kws["callback"], pbar
+                    )
+
+                    res = minimize(cost, init_pars, **_min_kws)
 
         # OptimizeResult.success may not be present (dual annealing)
         if hasattr(res, "success") and res.success:
@@ -872,8 +1202,190 @@ class CurveFitter:
 
         return res
 
+    def _vectorized_cost(self, target):
+        """
+        Cost function that evaluates a whole population at once, for
+        ``differential_evolution(..., vectorized=True)``.
+        """
+        if target == "nlpost":
+            batch = self.objective.logpost_batch
+        else:
+            batch = self.objective.logl_batch
+
+        def cost(x):
+            # scipy supplies the population as columns, shape (nvary, S)
+            return -batch(np.transpose(x))
+
+        return cost
+
+
+def _is_binary_chain(f):
+    """
+    Whether `f` names a binary (`.npy`) chain file.
+    """
+    return isinstance(f, (str, os.PathLike)) and os.fspath(f).endswith(".npy")
+
+
+class _ChainFile:
+    """
+    Appendable binary storage for an MCMC chain.
+
+    The file is a valid `.npy` file holding a 1-D structured array with one
+    record per saved step. Each record has the fields `'coords'` (the walker
+    positions, `(nwalkers, ndim)` or `(ntemps, nwalkers, ndim)`) and
+    `'log_prob'`. numpy reserves space in the header for the length of a
+    growing array, so the header is rewritten in place after every step and
+    the file can be memory-mapped at any time. The state of the random number
+    generator after the last step is pickled after the records, these
+    trailing bytes are ignored by `np.load`.
+
+    Parameters
+    ----------
+    f : {str, Path}
+        Filename. If the file already holds a chain whose steps have the same
+        shape, new steps are appended to it.
+    shape : tuple
+        Shape of the walker positions for a single step.
+    nsteps : int, optional
+        How many steps of an existing chain to keep, any subsequent steps are
+        overwritten by the appended ones. By default all the steps are kept.
+
+    Raises
+    ------
+    ValueError
+        If the file exists, but doesn't hold a chain with steps of `shape`.
+    """
+
+    def __init__(self, f, shape, nsteps=None):
+        self.name = os.fspath(f)
+        shape = tuple(shape)
+        self.dtype = np.dtype(
+            [
+                ("coords", np.float64, shape),
+                ("log_prob", np.float64, shape[:-1]),
+            ]
+        )
+        self.nsteps = 0
+
+        if os.path.isfile(self.name) and os.path.getsize(self.name):
+            self._h = open(self.name, "r+b")
+            try:
+                stored = self._read_header()
+            except Exception:
+                self._h.close()
+                raise
+            self.nsteps = stored if nsteps is None else min(nsteps, stored)
+            # the random state pickled after the last step is overwritten by
+            # the next step to be appended.
+            self._offset = self._h.tell()
+        else:
+            self._h = open(self.name, "wb")
+            self._write_header()
+            self._offset = self._h.tell()
+
+    def _read_header(self):
+        # the number of steps held by an existing chain file
+        try:
+            version = np.lib.format.read_magic(self._h)
+            shape, _, dtype = np.lib.format.read_array_header_1_0(self._h)
+        except ValueError:
+            version = None
+        if version != (1, 0) or dtype != self.dtype or len(shape) != 1:
+            raise ValueError(
+                f"{self.name} exists, but doesn't hold a chain whose steps"
+                f" have the shape {self.dtype['coords'].shape}"
+            )
+        return shape[0]
+
+    def _write_header(self):
+        d = {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.nsteps,),
+        }
+        self._h.seek(0)
+        np.lib.format.write_array_header_1_0(self._h, d)
+
+    def append(self, coords, log_prob=None, random_state=None):
+        """
+        Appends a step to the file.
+
+        Parameters
+        ----------
+        coords : np.ndarray
+            Walker positions
+        log_prob : {np.ndarray, None}
+            Log-probability of each walker
+        random_state : object
+            State of the random number generator after the step
+        """
+        record = np.empty((), dtype=self.dtype)
+        record["coords"] = coords
+        record["log_prob"] = np.nan if log_prob is None else log_prob
+
+        self._h.seek(self._offset + self.nsteps * self.dtype.itemsize)
+        self._h.write(record.tobytes())
+        pickle.dump(random_state, self._h)
+        self._h.truncate()
+
+        # only advertise the step once it has been written
+        self.nsteps += 1
+        self._write_header()
+        self._h.flush()
+
+    def close(self):
+        self._h.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
-def load_chain(f):
+def _open_chain_file(f, shape, nsteps=None):
+    """
+    Context manager for saving chain progress, see `CurveFitter.sample`.
+    """
+    if _is_binary_chain(f):
+        return _ChainFile(f, shape, nsteps=nsteps)
+    return possibly_open_file(f, "a")
+
+
+def _load_chain_state(f):
+    """
+    The last step of a binary chain file.
+
+    Parameters
+    ----------
+    f : {str, Path}
+        Binary chain file written by `CurveFitter.sample`.
+
+    Returns
+    -------
+    state : emcee.state.State
+        The walker positions, their log-probabilities and the state of the
+        random number generator after the last step of the chain.
+    """
+    records = np.load(f, mmap_mode="r")
+    if not len(records):
+        raise ValueError(f"{f} doesn't contain any steps")
+
+    last = records[-1]
+    with open(f, "rb") as h:
+        h.seek(records.offset + records.nbytes)
+        random_state = pickle.load(h)
+
+    log_prob = np.array(last["log_prob"])
+    if np.isnan(log_prob).any():
+        log_prob = None
+
+    return State(
+        np.array(last["coords"]), log_prob=log_prob, random_state=random_state
+    )
+
+
+def load_chain(f, log_prob=False):
     """
     Loads a chain from disk. Does not change the state of a CurveFitter
     object.
@@ -881,14 +1393,32 @@ def load_chain(f):
     Parameters
     ----------
     f : str or file-like
-        File containing the chain.
+        File containing the chain. Binary chain files (those whose name ends
+        in `'.npy'`, see :meth:`CurveFitter.sample`) are memory-mapped,
+        rather than being read into memory.
+    log_prob : bool, optional
+        Also return the log-probability of each sample. Only available for
+        binary chain files.
 
     Returns
     -------
     chain : array
         The loaded chain - `(nsteps, nwalkers, ndim)` or
         `(nsteps, ntemps, nwalkers, ndim)`
+    log_prob : array
+        The log-probability of each sample - `(nsteps, nwalkers)` or
+        `(nsteps, ntemps, nwalkers)`. Only returned if `log_prob` is True.
     """
+    if _is_binary_chain(f):
+        records = np.load(f, mmap_mode="r")
+        if log_prob:
+            return records["coords"], records["log_prob"]
+        return records["coords"]
+    elif log_prob:
+        raise ValueError(
+            "log-probabilities are only stored in binary chain files"
+        )
+
     with possibly_open_file(f, "r") as g:
         # read header
         header = g.readline()
@@ -921,8 +1451,8 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
     ----------
     objective : refnx.analysis.Objective
         The Objective function that the Posterior was sampled for
-    chain : array
-        The MCMC chain
+    chain : {array, str, Path}
+        The MCMC chain, or a chain file saved by :meth:`CurveFitter.sample`
     nburn : int, optional
         discard this many steps from the start of the chain
     nthin : int, optional
@@ -956,7 +1486,19 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
     If `flatten is True` then the burned/thinned chain is reshaped and
     `arr.reshape(-1, nvary)` is returned.
     This function has the effect of setting the parameter stderr's.
+
+    If `chain` is memory-mapped (e.g. a binary chain file loaded by
+    :func:`load_chain`) it is read a contiguous block of steps at a time,
+    so very long chains can be processed without reading them into memory.
+    The percentiles are the same as those calculated in memory. The chain of
+    each parameter is then a view of the file rather than a copy (unless
+    `flatchain` is True).
     """
+    if isinstance(chain, (str, os.PathLike)):
+        chain = load_chain(chain)
+
+    # views of a memory-mapped chain are cheap, so don't copy them.
+    lazy = isinstance(chain, np.memmap)
     chain = chain[nburn::nthin]
     shape = chain.shape
     nvary = shape[-1]
@@ -971,9 +1513,19 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
         # PTSampler, we require the target distribution in the first row.
         chain = chain[:, 0]
 
-    _flatchain = chain.reshape((-1, nvary))
-    if flatchain:
-        chain = _flatchain
+    def _param_chain(i):
+        if flatchain:
+            return np.asarray(chain[..., i]).flatten()
+        elif lazy:
+            return chain[..., i]
+        return np.copy(chain[..., i])
+
+    if lazy:
+        quantiles = _chain_percentiles(chain, [15.87, 50, 84.13])
+    else:
+        quantiles = np.percentile(
+            chain.reshape(-1, nvary), [15.87, 50, 84.13], axis=0
+        )
 
     flat_params = list(f_unique(flatten(objective.parameters)))
     varying_parameters = objective.varying_parameters()
@@ -987,14 +1539,12 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
             param.chain = None
 
         # do the error calcn for the varying parameters and set the chain
-        quantiles = np.percentile(_flatchain, [15.87, 50, 84.13], axis=0)
         for i, param in enumerate(varying_parameters):
             std_l, median, std_u = quantiles[:, i]
             param.value = median
             param.stderr = 0.5 * (std_u - std_l)
 
-            # copy in the chain
-            param.chain = np.copy(chain[..., i])
+            param.chain = _param_chain(i)
             res = MCMCResult(
                 name=param.name,
                 param=param,
@@ -1011,19 +1561,33 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
             param for param in flat_params if param.constraint is not None
         ]
 
+        # the samples are iterated in the same order as the (flattened)
+        # chain of each varying parameter.
+        samples_shape = chain.shape[:-1]
+        if flatchain:
+            samples_shape = (np.prod(samples_shape, dtype=int),)
+
         for constrain_param in constrained_params:
-            constrain_param.chain = np.empty(chain.shape[:-1], float)
+            constrain_param.chain = np.empty(samples_shape, float)
 
         # now iterate through the varying parameters, set the values, thereby
         # setting the constraint value
         if len(constrained_params):
-            for index in np.ndindex(chain.shape[:-1]):
+            constrained_chains = [
+                constrain_param.chain.reshape(-1)
+                for constrain_param in constrained_params
+            ]
+            index = 0
+            for block in _chain_blocks(chain):
                 # iterate over parameter vectors
-                pvals = chain[index]
-                objective.setp(pvals)
+                for pvals in block.reshape(-1, nvary):
+                    objective.setp(pvals)
 
-                for constrain_param in constrained_params:
-                    constrain_param.chain[index] = constrain_param.value
+                    for constrain_param, constrained_chain in zip(
+                        constrained_params, constrained_chains
+                    ):
+                        constrained_chain[index] = constrain_param.value
+                    index += 1
 
             for constrain_param in constrained_params:
                 quantiles = np.percentile(
@@ -1042,8 +1606,9 @@ def process_chain(objective, chain, nburn=0, nthin=1, flatchain=False):
     # being used with BaseObjective.
     else:
         for i in range(nvary):
-            c = np.copy(chain[..., i])
-            median, stderr = uncertainty_from_chain(c)
+            c = _param_chain(i)
+            std_l, median, std_u = quantiles[:, i]
+            stderr = 0.5 * (std_u - std_l)
             res = MCMCResult(
                 name="", param=median, median=median, stderr=stderr, chain=c
             )
@@ -1077,35 +1642,188 @@ def autocorrelation_chain(chain, nburn=0, nthin=1):
 
     Parameters
     ----------
-    chain : np.ndarray
+    chain : {np.ndarray, str, Path}
         The MCMC chain - `(nsteps, nwalkers, ndim)` or
-        `(nsteps, ntemps, nwalkers, ndim)`
+        `(nsteps, ntemps, nwalkers, ndim)`, or a chain file saved by
+        :meth:`CurveFitter.sample`.
+    nburn : int, optional
+        discard this many steps from the start of the chain
+    nthin : int, optional
+        only accept every `nthin` samples from the chain
 
     Returns
     -------
     acfs : np.ndarray
         The autocorrelation function, acfs.shape=(lags, nvary)
+
+    Notes
+    -----
+    The series of a group of walkers/parameters is gathered from contiguous
+    blocks of steps, and their autocorrelation functions are calculated
+    together. The group is sized so that memory-mapped chains aren't read
+    into memory all at once.
     """
+    if isinstance(chain, (str, os.PathLike)):
+        chain = load_chain(chain)
+
     lchain = chain
     # parallel tempered chain
     if len(chain.shape) == 4:
         lchain = lchain[:, 0]
 
     lchain = lchain[nburn::nthin]
-    # (iterations, walkers, vary) -> (vary, walkers, iterations)
-    lchain = np.swapaxes(lchain, 0, 2)
-    shape = lchain.shape[:-1]
+    nsteps, nwalkers, nvary = lchain.shape
+    nseries = nwalkers * nvary
+
+    # the FFT of each series is zero padded to 2 * n points
+    n = _next_pow_two(nsteps)
+    group = max(1, _CHAIN_BLOCK_BYTES // (32 * n))
+
+    # average the autocorrelation function of each walker, for each parameter
+    acfs = np.zeros((nsteps, nvary))
+    for start in range(0, nseries, group):
+        stop = min(start + group, nseries)
+        x = np.empty((nsteps, stop - start))
+        step = 0
+        for block in _chain_blocks(lchain):
+            x[step : step + len(block)] = block.reshape(-1, nseries)[
+                :, start:stop
+            ]
+            step += len(block)
 
-    acfs = np.zeros_like(lchain)
+        acf = _function_1d(x)
+        # series are ordered (walker, parameter)
+        np.add.at(acfs.T, np.arange(start, stop) % nvary, acf.T)
 
-    # iterate over each parameter/walker
-    for index in np.ndindex(*shape):
-        s = _function_1d(lchain[index])
-        acfs[index] = s
+    return acfs / nwalkers
 
-    # now average over walkers
-    acfs = np.mean(acfs, axis=1)
-    return np.transpose(acfs)
+
+def integrated_time_chain(chain, nburn=0, nthin=1, c=5):
+    """
+    Estimate the integrated autocorrelation time of each parameter
+
+    Parameters
+    ----------
+    chain : {np.ndarray, str, Path}
+        The MCMC chain - `(nsteps, nwalkers, ndim)` or
+        `(nsteps, ntemps, nwalkers, ndim)`, or a chain file saved by
+        :meth:`CurveFitter.sample`.
+    nburn : int, optional
+        discard this many steps from the start of the chain
+    nthin : int, optional
+        only accept every `nthin` samples from the chain
+    c : float, optional
+        The step size for the window search.
+
+    Returns
+    -------
+    tau : np.ndarray
+        The integrated autocorrelation time of each parameter, in steps of
+        the (thinned) chain.
+
+    Notes
+    -----
+    The same estimate as :func:`refnx.analysis.integrated_time`, calculated
+    from :func:`autocorrelation_chain`, so the chain isn't read into memory
+    all at once. If parallel tempering was employed only the lowest
+    temperature is used. No check is made that the chain is long enough for
+    the estimate to be reliable.
+    """
+    acfs = autocorrelation_chain(chain, nburn=nburn, nthin=nthin)
+    taus = 2.0 * np.cumsum(acfs, axis=0) - 1.0
+    tau = np.empty(taus.shape[1])
+    for i in range(len(tau)):
+        tau[i] = taus[auto_window(taus[:, i], c), i]
+    return tau
+
+
+def _chain_blocks(chain):
+    """
+    Yields successive blocks of steps from `chain` as in-memory arrays, each
+    of about `_CHAIN_BLOCK_BYTES`. For a memory-mapped chain every block is
+    a contiguous read of the file.
+    """
+    nsteps = len(chain)
+    if not nsteps:
+        return
+    step = max(1, _CHAIN_BLOCK_BYTES // max(1, chain[0].nbytes))
+    for start in range(0, nsteps, step):
+        yield np.asarray(chain[start : start + step])
+
+
+def _chain_percentiles(chain, q, nbins=4096):
+    """
+    Percentiles of each parameter (the last axis) of `chain`, shape
+    `(len(q), nvary)`. The same as
+    ``np.percentile(chain.reshape(-1, nvary), q, axis=0)``, but only a block
+    of steps is held in memory at once.
+
+    The chain is read three times. The first pass finds the range of each
+    parameter, the second histograms the samples to find the bins that hold
+    the order statistics either side of each percentile, and the third
+    gathers the samples in those bins.
+    """
+    nvary = chain.shape[-1]
+    lo = np.full(nvary, np.inf)
+    hi = np.full(nvary, -np.inf)
+    nsamples = 0
+    for block in _chain_blocks(chain):
+        x = block.reshape(-1, nvary)
+        lo = np.minimum(lo, x.min(axis=0))
+        hi = np.maximum(hi, x.max(axis=0))
+        nsamples += len(x)
+    if not nsamples:
+        raise ValueError("The chain doesn't contain any samples")
+
+    # the order statistics used for linear interpolation, as np.percentile
+    h = (nsamples - 1) * np.true_divide(q, 100)
+    lower = np.floor(h).astype(int)
+    upper = np.minimum(lower + 1, nsamples - 1)
+    ranks = np.union1d(lower, upper)
+
+    width = hi - lo
+    scale = np.divide(nbins, width, out=np.zeros(nvary), where=width > 0)
+
+    def _bins(x):
+        return np.minimum(((x - lo) * scale).astype(int), nbins - 1)
+
+    counts = np.zeros((nvary, nbins), dtype=np.int64)
+    for block in _chain_blocks(chain):
+        bins = _bins(block.reshape(-1, nvary))
+        for i in range(nvary):
+            counts[i] += np.bincount(bins[:, i], minlength=nbins)
+
+    # the bin holding each rank, and how many samples are in the lower bins
+    cumulative = np.cumsum(counts, axis=1)
+    target = np.array(
+        [np.searchsorted(c, ranks, side="right") for c in cumulative]
+    )
+    below = np.take_along_axis(
+        np.pad(cumulative, ((0, 0), (1, 0))), target, axis=1
+    )
+
+    varies = np.flatnonzero(width > 0)
+    selected = {i: [] for i in varies}
+    for block in _chain_blocks(chain):
+        x = block.reshape(-1, nvary)
+        bins = _bins(x)
+        for i in varies:
+            keep = np.isin(bins[:, i], target[i])
+            selected[i].append((x[keep, i], bins[keep, i]))
+
+    values = np.repeat(lo[:, None], len(ranks), axis=1)
+    for i in varies:
+        x = np.concatenate([v for v, _ in selected[i]])
+        bins = np.concatenate([b for _, b in selected[i]])
+        for j, rank in enumerate(ranks):
+            in_bin = np.sort(x[bins == target[i, j]])
+            values[i, j] = in_bin[rank - below[i, j]]
+
+    a = values[:, np.searchsorted(ranks, lower)]
+    b = values[:, np.searchsorted(ranks, upper)]
+    t = h - lower
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t).T
 
 
 def bounds_list(parameters):
@@ -1159,19 +1877,20 @@ def _function_1d(x):
     """Estimate the normalized autocorrelation function of a 1-D series
 
     Args:
-        x: The series as a 1-D numpy array.
+        x: The series as a 1-D numpy array, or several series as the columns
+            of a 2-D array.
 
     Returns:
         array: The autocorrelation function of the time series.
 
     """
     x = np.atleast_1d(x)
-    if len(x.shape) != 1:
+    if len(x.shape) not in (1, 2):
         raise ValueError("invalid dimensions for 1D autocorrelation function")
     n = _next_pow_two(len(x))
 
     # Compute the FFT and then (from that) the auto-correlation function
-    f = np.fft.fft(x - np.mean(x), n=2 * n)
-    acf = np.fft.ifft(f * np.conjugate(f))[: len(x)].real
+    f = np.fft.fft(x - np.mean(x, axis=0), n=2 * n, axis=0)
+    acf = np.fft.ifft(f * np.conjugate(f), axis=0)[: len(x)].real
     acf /= acf[0]
     return acf
@@ -1,4 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+import os
 import warnings
+import weakref
 import numpy as np
 from numpy.linalg import LinAlgError
 from scipy.linalg import LinAlgWarning
@@ -6,7 +10,7 @@ from scipy.optimize._numdiff import approx_derivative
 import scipy.stats as stats
 
 from refnx.util import ErrorProp as EP
-from refnx._lib import flatten, approx_hess2
+from refnx._lib import flatten, approx_hess2, MapWrapper
 from refnx._lib import unique as f_unique
 from refnx.dataset import Data1D
 from refnx.analysis import (
@@ -18,6 +22,10 @@ from refnx.analysis import (
     Interval,
     PDF,
 )
+from refnx.analysis.parameter import (
+    _ParameterPlan,
+    _bump_value_revision,
+)
 
 
 class BaseObjective:
@@ -170,6 +178,70 @@ class BaseObjective:
         """
         return -self.logpost(pvals)
 
+    def logp_batch(self, pvals):
+        """
+        Log-prior probability for many parameter vectors
+
+        Parameters
+        ----------
+        pvals : np.ndarray
+            Array of shape `(N, nvary)`, each row contains values to be
+            tested.
+
+        Returns
+        -------
+        logp : np.ndarray
+            log-prior probability of each of the rows, shape `(N,)`.
+
+        """
+        return np.array([self.logp(p) for p in pvals], dtype=np.float64)
+
+    def logl_batch(self, pvals):
+        """
+        Log-likelihood probability for many parameter vectors
+
+        Parameters
+        ----------
+        pvals : np.ndarray
+            Array of shape `(N, nvary)`, each row contains values to be
+            tested.
+
+        Returns
+        -------
+        logl : np.ndarray
+            log-likelihood probability of each of the rows, shape `(N,)`.
+
+        """
+        return np.array([self.logl(p) for p in pvals], dtype=np.float64)
+
+    def logpost_batch(self, pvals):
+        """
+        Log-posterior probability for many parameter vectors
+
+        Parameters
+        ----------
+        pvals : np.ndarray
+            Array of shape `(N, nvary)`, each row contains values to be
+            tested.
+
+        Returns
+        -------
+        logpost : np.ndarray
+            log-probability of each of the rows, shape `(N,)`.
+
+        Notes
+        -----
+        The log-likelihood is only calculated for rows that have a finite
+        log-prior.
+        """
+        pvals = np.atleast_2d(pvals)
+        logpost = self.logp_batch(pvals)
+        finite = np.isfinite(logpost)
+        logpost[~finite] = -np.inf
+        if finite.any():
+            logpost[finite] += self.logl_batch(pvals[finite])
+        return logpost
+
     def varying_parameters(self):
         """
         Returns
@@ -180,6 +252,14 @@ class BaseObjective:
         """
         return self.parameters
 
+    @contextmanager
+    def parameter_plan(self):
+        """
+        Context manager for caching the layout of the parameters during a
+        fit. `BaseObjective` has no parameter tree, so this does nothing.
+        """
+        yield
+
     def covar(self, target="nll"):
         """
         Estimates a covariance matrix based on numerical differentiation
@@ -280,6 +360,10 @@ class Objective(BaseObjective):
     constraints in models.
     """
 
+    # see `Objective.parameter_plan`
+    _plan = None
+    _plan_depth = 0
+
     def __init__(
         self,
         model,
@@ -393,6 +477,48 @@ class Objective(BaseObjective):
         # should already be totally flattened by this point
         return Parameters(f_unique(lst))
 
+    @contextmanager
+    def parameter_plan(self):
+        """
+        Context manager that caches the layout of the parameters for
+        repeated evaluation, e.g. for the duration of a fit.
+
+        Inside the context `setp` and `logp` use a precompiled list of the
+        varying parameters and their bounds, instead of walking the
+        parameter tree on every call. After `setp` all the constrained
+        parameters are evaluated in a single pass, with their values
+        memoised until a parameter value changes. The cache is rebuilt
+        automatically if the `vary`, `bounds` or `constraint` of a
+        Parameter is changed, but the membership of the parameter tree
+        (e.g. the layers in a Structure) must not be modified inside the
+        context.
+
+        Examples
+        --------
+        >>> with objective.parameter_plan():
+        ...     logpost = [objective.logpost(pvals) for pvals in samples]
+        """
+        self._plan_depth += 1
+        try:
+            yield
+        finally:
+            self._plan_depth -= 1
+            if not self._plan_depth:
+                self._plan = None
+                # forget the constraint values memoised by the plan
+                _bump_value_revision()
+
+    def _parameter_plan(self):
+        # the cached parameter plan, or None if the objective is not inside
+        # `Objective.parameter_plan`.
+        if not self._plan_depth:
+            return None
+        plan = self._plan
+        if plan is None or plan.stale:
+            plan = _ParameterPlan(self.parameters, self.varying_parameters())
+            self._plan = plan
+        return plan
+
     def _data_transform(self, model=None):
         """
         Returns
@@ -438,6 +564,92 @@ class Objective(BaseObjective):
         self.setp(pvals)
         return self.model(self.data.x, x_err=self.data.x_err)
 
+    def generative_batch(self, pvals):
+        """
+        Calculate the generative function for many parameter vectors.
+
+        If the model supports it (e.g. :class:`refnx.reflect.ReflectModel`)
+        all the parameter vectors are calculated with a single call,
+        otherwise the model is calculated for each of the parameter vectors
+        in turn.
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)` (or `(N, nparams)`), each row
+            containing values for the varying (or entire set of) parameters.
+
+        Returns
+        -------
+        model : np.ndarray
+            Has shape `(N,) + data.y.shape`. The objective state is restored
+            afterwards.
+
+        """
+        snapshots = self._batch_snapshots(pvals)
+        return self._generative_snapshots(snapshots)[0]
+
+    def _batch_snapshots(self, pvals):
+        """
+        :meth:`_batch_snapshot` for each of the parameter vectors. The
+        objective state is restored afterwards.
+        """
+        pvals = np.atleast_2d(pvals)
+        saved_params = np.array(self.varying_parameters())
+        try:
+            snapshots = []
+            for pval in pvals:
+                self.setp(pval)
+                snapshots.append(self._batch_snapshot())
+        finally:
+            self.setp(saved_params)
+        return snapshots
+
+    def _batch_snapshot(self):
+        """
+        Everything needed to calculate the generative function and the
+        log-likelihood for the current parameter values: the model state (or
+        the model itself), the model/logp_extra log-probability terms and
+        the lnsigma value.
+
+        The snapshot has to be taken while the parameters are set, because
+        constrained parameters may depend on parameters that aren't part of
+        this objective (e.g. in a GlobalObjective).
+        """
+        if getattr(self.model, "_batch_states", False):
+            # the model is calculated later on, for all snapshots at once
+            state = self.model._model_state()
+        else:
+            state = self.model(self.data.x, x_err=self.data.x_err)
+
+        extra_potential = self.model.logp()
+        if self.logp_extra is not None:
+            extra_potential += self.logp_extra(self.model, self.data)
+
+        lnsigma = 0.0
+        if self.lnsigma is not None:
+            lnsigma = float(self.lnsigma)
+
+        return state, extra_potential, lnsigma
+
+    def _generative_snapshots(self, snapshots):
+        """
+        Generative function, model/logp_extra log-probability terms and
+        lnsigma values for a sequence of :meth:`_batch_snapshot`.
+        """
+        states = [snapshot[0] for snapshot in snapshots]
+        extra_potential = np.array([snapshot[1] for snapshot in snapshots])
+        lnsigma = np.array([snapshot[2] for snapshot in snapshots])
+
+        if getattr(self.model, "_batch_states", False):
+            models = self.model._model_from_states(
+                self.data.x, states, x_err=self.data.x_err
+            )
+        else:
+            models = np.asarray(states)
+
+        return models, extra_potential, lnsigma
+
     def residuals(self, pvals=None):
         """
         Calculates the residuals for a given fitting system.
@@ -519,6 +731,11 @@ class Objective(BaseObjective):
         if pvals is None:
             return
 
+        plan = self._parameter_plan()
+        if plan is not None:
+            plan.setp(pvals)
+            return
+
         # set here rather than delegating to a Parameters
         # object, because it may not necessarily be a
         # Parameters object
@@ -606,20 +823,48 @@ class Objective(BaseObjective):
         """
         self.setp(pvals)
 
-        logp = np.sum(
-            [
-                param.logp()
-                for param in f_unique(
-                    p for p in flatten(self.parameters) if p.vary
-                )
-            ]
-        )
+        plan = self._parameter_plan()
+        if plan is not None:
+            logp = plan.logp()
+        else:
+            logp = np.sum(
+                [
+                    param.logp()
+                    for param in f_unique(
+                        p for p in flatten(self.parameters) if p.vary
+                    )
+                ]
+            )
 
         if not np.isfinite(logp):
             return -np.inf
 
         return logp
 
+    def logp_batch(self, pvals):
+        """
+        Calculate the log-prior for many parameter vectors
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)`, each row containing values for the
+            varying parameters.
+
+        Returns
+        -------
+        logp : np.ndarray
+            log-prior probability for each of the rows, shape `(N,)`. The
+            objective state is restored afterwards.
+
+        """
+        pvals = np.atleast_2d(pvals)
+        saved_params = np.array(self.varying_parameters())
+        try:
+            return np.array([self.logp(p) for p in pvals], dtype=np.float64)
+        finally:
+            self.setp(saved_params)
+
     def logl(self, pvals=None):
         """
         Calculate the log-likelhood of the system
@@ -689,6 +934,64 @@ class Objective(BaseObjective):
 
         return -0.5 * np.sum(logl) + extra_potential
 
+    def logl_batch(self, pvals):
+        """
+        Calculate the log-likelihood for many parameter vectors at once
+
+        The generative model for all the parameter vectors is calculated with
+        :meth:`Objective.generative_batch`, the log-likelihood terms are then
+        evaluated as a single array calculation.
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)`, each row containing values for the
+            varying parameters.
+
+        Returns
+        -------
+        logl : np.ndarray
+            log-likelihood probability for each of the rows, shape `(N,)`.
+            See :meth:`Objective.logl` for details of the calculation. The
+            objective state is restored afterwards.
+
+        """
+        return self._logl_snapshots(self._batch_snapshots(pvals))
+
+    def _logl_snapshots(self, snapshots):
+        """
+        Log-likelihood for a sequence of :meth:`_batch_snapshot`.
+        """
+        models, extra_potential, lnsigma = self._generative_snapshots(
+            snapshots
+        )
+
+        models = models.reshape(len(snapshots), -1)
+        if self.transform is None:
+            y, y_err, _ = self._data_transform()
+        else:
+            y, y_err, _ = self._data_transform(models[0])
+            models = np.stack([self._data_transform(m)[2] for m in models])
+
+        y = np.ravel(y)
+        y_err = np.ravel(y_err)
+        if self.lnsigma is not None:
+            var_y = (
+                y_err * y_err
+                + np.exp(2 * lnsigma)[:, np.newaxis] * models * models
+            )
+        else:
+            var_y = np.broadcast_to(y_err**2, models.shape)
+
+        logl = (y - models) ** 2 / var_y
+        if self.weighted:
+            logl += np.log(2 * np.pi * var_y)
+
+        if np.isnan(logl).any():
+            raise RuntimeError("Objective.logl encountered a NaN.")
+
+        return -0.5 * np.sum(logl, axis=1) + extra_potential
+
     def nll(self, pvals=None):
         """
         Negative log-likelihood function
@@ -744,6 +1047,48 @@ class Objective(BaseObjective):
         logpost += self.logl()
         return logpost
 
+    def logpost_batch(self, pvals):
+        """
+        Calculate the log-probability for many parameter vectors at once
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)`, each row containing values for the
+            varying parameters.
+
+        Returns
+        -------
+        logpost : np.ndarray
+            log-probability for each of the rows, shape `(N,)`. The objective
+            state is restored afterwards.
+
+        Notes
+        -----
+        Suitable for use with a sampler that evaluates all its walkers at
+        once, e.g. ``emcee.EnsembleSampler(..., vectorize=True)``. The
+        log-likelihood is only calculated for rows that have a finite
+        log-prior.
+        """
+        pvals = np.atleast_2d(pvals)
+        saved_params = np.array(self.varying_parameters())
+        logpost = np.empty(len(pvals), dtype=np.float64)
+        try:
+            for i, pval in enumerate(pvals):
+                self.setp(pval)
+                alpha = 1.0
+                if is_parameter(self.alpha):
+                    alpha = self.alpha.value
+                logpost[i] = alpha * self.logp()
+        finally:
+            self.setp(saved_params)
+
+        finite = np.isfinite(logpost)
+        logpost[~finite] = -np.inf
+        if finite.any():
+            logpost[finite] += self.logl_batch(pvals[finite])
+        return logpost
+
     def covar(self, target="residuals"):
         """
         Estimates the covariance matrix of the Objective by numerical
@@ -775,6 +1120,11 @@ class Objective(BaseObjective):
         The default `'residuals'` setting is preferred as the other settings
         can sometimes experience instabilities during Hessian estimation with
         numerical differentiation.
+        If the model can calculate its own derivatives (it has a
+        ``jacobian(x, x_err=None)`` method, e.g.
+        :meth:`refnx.reflect.ReflectModel.jacobian`) then the `'residuals'`
+        approach uses the exact Jacobian, falling back to numerical
+        differentiation if the derivatives aren't available.
         """
         if target == "residuals":
             try:
@@ -802,6 +1152,75 @@ class Objective(BaseObjective):
 
         return covar
 
+    def _jacobian(self):
+        """
+        Exact Jacobian of :meth:`residuals` with respect to the varying
+        parameters, shape `(npoints, nvary)`. Returns None if it can't be
+        calculated.
+
+        The model provides the derivatives of its output with respect to its
+        own varying parameters through an optional ``jacobian(x, x_err=None)``
+        method, which raises `NotImplementedError` if they aren't available.
+        """
+        model_jacobian = getattr(self.model, "jacobian", None)
+        if model_jacobian is None:
+            return None
+        if self.transform is not None and not isinstance(
+            self.transform, Transform
+        ):
+            return None
+
+        var_params = self.varying_parameters()
+        var_ids = [id(p) for p in var_params]
+        model_params = self.model.parameters.varying_parameters()
+        model_ids = [id(p) for p in model_params]
+
+        # other varying parameters (e.g. auxiliary parameters) may affect the
+        # model through constraints.
+        lnsigma_id = id(self.lnsigma) if is_parameter(self.lnsigma) else None
+        if any(i not in model_ids and i != lnsigma_id for i in var_ids):
+            return None
+
+        x = self.data.x
+        try:
+            dmodel = model_jacobian(x, x_err=self.data.x_err)
+        except NotImplementedError:
+            return None
+        dmodel = np.reshape(dmodel, (-1, len(model_ids)))
+
+        model = self.model(x, x_err=self.data.x_err)
+        y, y_err, tmodel = self._data_transform(model)
+        if self.transform is not None:
+            dmodel = (
+                dmodel
+                * np.ravel(self.transform._derivative(x, model))[:, None]
+            )
+
+        # residuals = (y - model) / s_n
+        y = np.ravel(y)
+        tmodel = np.ravel(tmodel)
+        y_err = np.ravel(y_err) * np.ones_like(y)
+        jac = np.zeros((y.size, len(var_ids)))
+
+        if self.lnsigma is not None:
+            sigma2 = np.exp(2 * float(self.lnsigma))
+            s_n = np.sqrt(y_err * y_err + sigma2 * tmodel * tmodel)
+            ds_dmodel = sigma2 * tmodel / s_n
+            if lnsigma_id in var_ids:
+                ds_dlnsigma = sigma2 * tmodel * tmodel / s_n
+                jac[:, var_ids.index(lnsigma_id)] = (
+                    -(y - tmodel) / s_n**2 * ds_dlnsigma
+                )
+        else:
+            s_n = y_err
+            ds_dmodel = 0.0
+
+        dres_dmodel = -1.0 / s_n - (y - tmodel) / s_n**2 * ds_dmodel
+        for i, model_id in enumerate(model_ids):
+            jac[:, var_ids.index(model_id)] = dres_dmodel * dmodel[:, i]
+
+        return jac
+
     def _covar_from_residuals(self):
         _pvals = np.array(self.varying_parameters())
 
@@ -810,22 +1229,25 @@ class Objective(BaseObjective):
         def fn_scaler(vals):
             return np.squeeze(self.residuals(_pvals * vals))
 
-        try:
-            # we should be able to calculate a Jacobian for a parameter whose
-            # value is zero. However, the scaling approach won't work.
-            # This will force Jacobian calculation by unscaled parameters
-            if np.any(_pvals == 0):
-                raise FloatingPointError()
-
-            with np.errstate(invalid="raise"):
-                jac = approx_derivative(fn_scaler, np.ones_like(_pvals))
-            used_residuals_scaler = True
-        except FloatingPointError:
-            jac = approx_derivative(self.residuals, _pvals)
-        finally:
-            # using approx_derivative changes the state of the objective
-            # parameters have to make sure they're set at the end
-            self.setp(_pvals)
+        jac = self._jacobian()
+        if jac is None:
+            try:
+                # we should be able to calculate a Jacobian for a parameter
+                # whose value is zero. However, the scaling approach won't
+                # work. This will force Jacobian calculation by unscaled
+                # parameters
+                if np.any(_pvals == 0):
+                    raise FloatingPointError()
+
+                with np.errstate(invalid="raise"):
+                    jac = approx_derivative(fn_scaler, np.ones_like(_pvals))
+                used_residuals_scaler = True
+            except FloatingPointError:
+                jac = approx_derivative(self.residuals, _pvals)
+            finally:
+                # using approx_derivative changes the state of the objective
+                # parameters have to make sure they're set at the end
+                self.setp(_pvals)
 
         # need to create this because GlobalObjective may not have
         # access to all the datapoints being fitted.
@@ -917,7 +1339,7 @@ class Objective(BaseObjective):
         finally:
             self.setp(saved_params)
 
-    def confidence_interval(self, sigma=1):
+    def confidence_interval(self, sigma=1, pool=1):
         """
         Confidence intervals on the generative model.
 
@@ -926,6 +1348,10 @@ class Objective(BaseObjective):
         sigma : float, optional
             uncertainty band, corresponding to the number of standard
             deviations.
+        pool : int, str or map-like callable, optional
+            Used to calculate the generative model for each of the samples in
+            parallel, see :class:`refnx._lib.MapWrapper`. A thread pool,
+            e.g. ``pool='threads:4'``, is usually the cheapest option.
 
         Returns
         -------
@@ -944,11 +1370,13 @@ class Objective(BaseObjective):
 
         # Get a number of chains, chosen randomly, set the objective,
         # and get the generative
-        _model_gen = []
-        for curve in self._generate_generative_mcmc(ngen=samples):
-            _model_gen.append(curve)
-
-        _model_arr = np.array(_model_gen)
+        saved_params = np.array(self.varying_parameters())
+        pvecs = list(self.pgen(ngen=samples))
+        try:
+            with MapWrapper(pool) as g:
+                _model_arr = np.array(list(g(self.generative, pvecs)))
+        finally:
+            self.setp(saved_params)
 
         p0 = 100 * norm.cdf(-sigma)
         p1 = 100 * norm.cdf(sigma)
@@ -964,6 +1392,7 @@ class Objective(BaseObjective):
         sigma=1.0,
         v_offset=1.0,
         color=("blue", "red"),
+        pool=1,
     ):
         """
         Plot the data/model.
@@ -991,6 +1420,9 @@ class Objective(BaseObjective):
             plotting several datasets on the same graph.
         color: tuple, optional
             Two-tuple specifying colours for data and fit.
+        pool: int, str or map-like callable, optional
+            Used to calculate the confidence intervals in parallel, see
+            :meth:`confidence_interval`.
 
         Returns
         -------
@@ -1043,7 +1475,7 @@ class Objective(BaseObjective):
             )
 
         if bool(samples):
-            lb, ub = self.confidence_interval(sigma=sigma)
+            lb, ub = self.confidence_interval(sigma=sigma, pool=pool)
             lb, _ = transform(lb)
             ub, _ = transform(ub)
             ax.fill_between(self.data.x, lb, ub, color="black", alpha=0.4)
@@ -1113,9 +1545,24 @@ class GlobalObjective(Objective):
         Multiplies the overall log-prior term for the parameters. Used to
         balance log-prior and log-likelihood terms in the log-posterior.
 
+    workers : int, optional
+        Number of threads used to evaluate the objectives concurrently in
+        :meth:`logl`, :meth:`residuals`, :meth:`generative` and their batch
+        equivalents. `workers == 1` evaluates the objectives serially,
+        `workers == -1` uses all the available processors.
+
+    Notes
+    -----
+    Concurrent evaluation is worthwhile when there are many objectives whose
+    models spend most of their time in a calculation that releases the GIL
+    (such as the C reflectivity kernel). Objectives whose models share a
+    Structure (or the model itself) are evaluated one after the other by
+    the same thread, so the slabs of a shared Structure are only calculated
+    once per parameter vector. The results are identical to serial
+    evaluation.
     """
 
-    def __init__(self, objectives, lambdas=None, alpha=1.0):
+    def __init__(self, objectives, lambdas=None, alpha=1.0, workers=1):
         self.objectives = objectives
 
         nobj = len(objectives)
@@ -1138,6 +1585,23 @@ class GlobalObjective(Objective):
         if alpha is not None:
             self.alpha = possibly_create_parameter(alpha, name="alpha")
 
+        self._executor = None
+        self._finalizer = None
+        self.workers = workers
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_finalizer"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # GlobalObjectives pickled before concurrent evaluation was added
+        self.__dict__.setdefault("_workers", 1)
+        self._executor = None
+        self._finalizer = None
+
     def __str__(self):
         s = [f"{'':_>80}", "\n"]
         s.append("--Global Objective--")
@@ -1150,9 +1614,72 @@ class GlobalObjective(Objective):
         return (
             f"GlobalObjective({self.objectives!r},"
             f" lambdas={list(self.lambdas)!r},"
-            f" alpha={self.alpha!r})"
+            f" alpha={self.alpha!r}, workers={self.workers!r})"
         )
 
+    @property
+    def workers(self):
+        """
+        **int** number of threads used to evaluate the objectives
+        concurrently. `1` means serial evaluation, `-1` uses all the
+        available processors.
+
+        """
+        return self._workers
+
+    @workers.setter
+    def workers(self, value):
+        value = int(value)
+        if value == -1:
+            value = os.cpu_count() or 1
+        if value < 1:
+            raise ValueError("workers must be -1 or a positive integer")
+
+        self._workers = value
+        self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        # the threads of the pool exit once they've finished their work
+        if self._finalizer is not None:
+            self._finalizer()
+        self._executor = None
+        self._finalizer = None
+
+    def _evaluate(self, func, args=None):
+        """
+        Calls ``func(objective, arg)`` for each of the objectives (and the
+        corresponding entry of `args`), returning the results in the same
+        order as `self.objectives`.
+        """
+        if args is None:
+            args = [None] * len(self.objectives)
+        tasks = list(zip(self.objectives, args))
+
+        if self.workers == 1 or len(tasks) < 2:
+            return [func(objective, arg) for objective, arg in tasks]
+
+        def evaluate_group(group):
+            return [func(*tasks[i]) for i in group]
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="refnx-GlobalObjective",
+            )
+            # the pool is shut down when the GlobalObjective is collected
+            self._finalizer = weakref.finalize(
+                self, self._executor.shutdown, wait=False
+            )
+
+        results = [None] * len(tasks)
+        groups = _shared_model_groups(self.objectives)
+        for group, values in zip(
+            groups, self._executor.map(evaluate_group, groups)
+        ):
+            for i, value in zip(group, values):
+                results[i] = value
+        return results
+
     @property
     def weighted(self):
         """
@@ -1190,10 +1717,58 @@ class GlobalObjective(Objective):
         """
         self.setp(pvals)
 
-        generative = np.hstack([o.generative() for o in self.objectives])
+        generative = np.hstack(
+            self._evaluate(lambda objective, _: objective.generative())
+        )
 
         return generative
 
+    def generative_batch(self, pvals):
+        """
+        Concatenated generative curves for many parameter vectors.
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)`, each row containing values for the
+            varying parameters.
+
+        Returns
+        -------
+        generative : np.ndarray
+            Concatenated :meth:`refnx.analysis.Objective.generative_batch`,
+            shape `(N, npoints)`.
+        """
+        pvals = np.atleast_2d(pvals)
+        generative = self._evaluate(
+            lambda objective, snapshots: np.reshape(
+                objective._generative_snapshots(snapshots)[0],
+                (len(pvals), -1),
+            ),
+            args=self._member_snapshots(pvals),
+        )
+        return np.hstack(generative)
+
+    def _jacobian(self):
+        """
+        Exact Jacobian of :meth:`residuals`, or None if any of the objectives
+        can't calculate one.
+        """
+        jacs = self._evaluate(lambda objective, _: objective._jacobian())
+        if any(jac is None for jac in jacs):
+            return None
+
+        var_ids = [id(p) for p in self.varying_parameters()]
+        jac = []
+        for objective, _lambda, obj_jac in zip(
+            self.objectives, self.lambdas, jacs
+        ):
+            full = np.zeros((len(obj_jac), len(var_ids)))
+            for i, p in enumerate(objective.varying_parameters()):
+                full[:, var_ids.index(id(p))] += _lambda * obj_jac[:, i]
+            jac.append(full)
+        return np.concatenate(jac)
+
     def residuals(self, pvals=None):
         """
         Concatenated residuals for each of the
@@ -1218,10 +1793,10 @@ class GlobalObjective(Objective):
         """
         self.setp(pvals)
 
-        residuals = []
-        for objective, _lambda in zip(self.objectives, self.lambdas):
-            residual = _lambda * objective.residuals()
-            residuals.append(residual)
+        residuals = self._evaluate(
+            lambda objective, _lambda: _lambda * objective.residuals(),
+            args=self.lambdas,
+        )
 
         return np.concatenate(residuals)
 
@@ -1240,6 +1815,19 @@ class GlobalObjective(Objective):
 
         return p
 
+    @contextmanager
+    def parameter_plan(self):
+        """
+        Context manager that caches the layout of the parameters for
+        repeated evaluation, see :meth:`Objective.parameter_plan`. The
+        individual objectives also cache their parameters.
+        """
+        with ExitStack() as stack:
+            for objective in self.objectives:
+                stack.enter_context(objective.parameter_plan())
+            stack.enter_context(super().parameter_plan())
+            yield
+
     def logp(self, pvals=None):
         """
         Calculate the log-prior of the system
@@ -1290,11 +1878,64 @@ class GlobalObjective(Objective):
         self.setp(pvals)
         logl = 0.0
 
-        for objective, _lambda in zip(self.objectives, self.lambdas):
-            logl += _lambda * objective.logl()
+        # summed in order, so that the result doesn't depend on `workers`
+        for value in self._evaluate(
+            lambda objective, _lambda: _lambda * objective.logl(),
+            args=self.lambdas,
+        ):
+            logl += value
 
         return logl
 
+    def logl_batch(self, pvals):
+        """
+        Calculate the combined log-likelihood for many parameter vectors.
+
+        Parameters
+        ----------
+        pvals : array-like
+            Array of shape `(N, nvary)`, each row containing values for the
+            varying parameters.
+
+        Returns
+        -------
+        logl : np.ndarray
+            log-likelihood probability for each of the rows, shape `(N,)`.
+            See :meth:`GlobalObjective.logl`.
+        """
+        pvals = np.atleast_2d(pvals)
+        logl = np.zeros(len(pvals), dtype=np.float64)
+
+        for value in self._evaluate(
+            lambda objective, arg: arg[1] * objective._logl_snapshots(arg[0]),
+            args=list(zip(self._member_snapshots(pvals), self.lambdas)),
+        ):
+            logl += value
+
+        return logl
+
+    def _member_snapshots(self, pvals):
+        """
+        :meth:`Objective._batch_snapshot` of each of the objectives, for each
+        of the parameter vectors.
+
+        The parameters of all the objectives are set together, so that
+        constraints between objectives are evaluated correctly. The expensive
+        part, calculating the models, is done later. The objective state is
+        restored afterwards.
+        """
+        pvals = np.atleast_2d(pvals)
+        saved_params = np.array(self.varying_parameters())
+        snapshots = [[] for _ in self.objectives]
+        try:
+            for pval in pvals:
+                self.setp(pval)
+                for objective, snapshot in zip(self.objectives, snapshots):
+                    snapshot.append(objective._batch_snapshot())
+        finally:
+            self.setp(saved_params)
+        return snapshots
+
     def plot(
         self,
         pvals=None,
@@ -1303,6 +1944,7 @@ class GlobalObjective(Objective):
         fig=None,
         sigma=1.0,
         v_offsets=None,
+        pool=1,
     ):
         """
         Plot the data/model for all the objectives in the GlobalObjective.
@@ -1327,6 +1969,9 @@ class GlobalObjective(Objective):
         v_offset: float, optional
             A multiplicative vertical offset for the plot. Useful if you're
             plotting several datasets on the same graph.
+        pool: int, str or map-like callable, optional
+            Used to calculate the confidence intervals in parallel, see
+            :meth:`Objective.confidence_interval`.
 
         Returns
         -------
@@ -1362,7 +2007,7 @@ class GlobalObjective(Objective):
             v_offsets = [1.0] * len(self.objectives)
 
         if bool(samples):
-            lb, ub = self.confidence_interval(sigma=sigma)
+            lb, ub = self.confidence_interval(sigma=sigma, pool=pool)
 
             start = 0
             for i, objective in enumerate(self.objectives):
@@ -1446,6 +2091,53 @@ class GlobalObjective(Objective):
         return fig, ax, ipywidgets.interact(f, val=float(parameter))
 
 
+def _shared_model_groups(objectives):
+    """
+    Partitions the objectives into groups that don't share a model, or a
+    Structure used by a model, with any of the other groups.
+
+    Parameters
+    ----------
+    objectives : sequence of Objective
+
+    Returns
+    -------
+    groups : list of list
+        Each group is a list of indices into `objectives`, in ascending
+        order.
+    """
+
+    # objects whose state may be modified during a calculation
+    def shared_objects(objective):
+        model = objective.model
+        yield id(model)
+        structure = getattr(model, "structure", None)
+        if structure is not None:
+            yield id(structure)
+        for structure in getattr(model, "structures", None) or []:
+            yield id(structure)
+
+    # union-find over the objectives
+    parent = list(range(len(objectives)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, objective in enumerate(objectives):
+        for key in shared_objects(objective):
+            j = owner.setdefault(key, i)
+            parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(objectives)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
 class Transform:
     r"""
     Mathematical transforms of numeric data.
@@ -1577,6 +2269,19 @@ class Transform:
         else:
             return yt, et
 
+    def _derivative(self, x, y):
+        """
+        Derivative of the transformed `y` with respect to `y`.
+        """
+        if self.form in ["lin", None]:
+            return np.ones_like(y)
+        elif self.form == "logY":
+            return 1.0 / (y * np.log(10))
+        elif self.form == "YX4":
+            return np.power(x, 4)
+        elif self.form == "YX2":
+            return np.power(x, 2)
+
 
 def pymc_model(objective):
     """
@@ -5,6 +5,7 @@ from collections import UserList
 import numpy as np
 from refnx._lib import flatten, unique as f_unique
 from refnx.analysis import Interval, PDF, Bounds
+import refnx.analysis.bounds as _bounds
 
 
 # Functions for making Functors
@@ -24,6 +25,25 @@ def asMagicNumber(x):
     return x if isinstance(x, BaseParameter) else Constant(x)
 
 
+# Incremented whenever the value of any Parameter is set. Memoised values of
+# constrained Parameters are only valid whilst this counter (and the
+# `refnx.analysis.bounds._revision` counter) are unchanged.
+_value_revision = 0
+
+
+def _bump_value_revision():
+    global _value_revision
+    _value_revision += 1
+
+
+def _revision():
+    """
+    A key that changes whenever the value, `vary`, `bounds` or `constraint`
+    of any Parameter changes.
+    """
+    return _bounds._revision, _value_revision
+
+
 # a function that takes a function that returns a function
 # MAKE_BINARY = lambda opfn: lambda self, other: (
 #     _BinaryOp(self, asMagicNumber(other), opfn))
@@ -208,29 +228,30 @@ class Parameters(UserList):
 
     @pvals.setter
     def pvals(self, pvals):
+        for param, val in zip(self._pvals_targets(np.size(pvals)), pvals):
+            param.value = val
+
+    def _pvals_targets(self, n):
+        """
+        The :class:`Parameter` objects that are set by an array of `n` values
+        supplied to `pvals`, either the unique varying parameters, or all of
+        them. Useful for setting many arrays of values without walking the
+        parameter tree each time.
+        """
         varying = [
             param for param in f_unique(flatten(self.data)) if param.vary
         ]
-        if np.size(pvals) == len(varying):
-            [
-                setattr(param, "value", pvals[i])
-                for i, param in enumerate(varying)
-            ]
-            return
+        if n == len(varying):
+            return varying
 
         flattened_parameters = list(flatten(self.data))
+        if n == len(flattened_parameters):
+            return flattened_parameters
 
-        if np.size(pvals) == len(flattened_parameters):
-            [
-                setattr(param, "value", pvals[i])
-                for i, param in enumerate(flattened_parameters)
-            ]
-            return
-        else:
-            raise ValueError(
-                "You supplied the wrong number of values %d when "
-                "setting this Parameters.pvals attribute" % len(pvals)
-            )
+        raise ValueError(
+            "You supplied the wrong number of values %d when "
+            "setting this Parameters.pvals attribute" % n
+        )
 
     @property
     def parameters(self):
@@ -419,6 +440,8 @@ class BaseParameter:
         d = self.__dict__.copy()
         for k in ops:
             d.pop(k, None)
+        # memoised constraint values are only valid in this process
+        d.pop("_memo", None)
         return d
 
     def __setstate__(self, state):
@@ -466,6 +489,7 @@ class BaseParameter:
 
     @value.setter
     def value(self, v):
+        _bump_value_revision()
         self._value = v
 
     @property
@@ -617,6 +641,9 @@ class Parameter(BaseParameter):
         Python expression used to constrain the value during the fit.
     """
 
+    # (revision, value revision, value) set by `_ConstraintProgram`
+    _memo = None
+
     def __init__(
         self,
         value=0.0,
@@ -702,7 +729,14 @@ class Parameter(BaseParameter):
         The numeric value of the :class:`Parameter`
         """
         if self._constraint is not None:
-            if callable(self._constraint):
+            memo = self._memo
+            if (
+                memo is not None
+                and memo[0] == _bounds._revision
+                and memo[1] == _value_revision
+            ):
+                retval = memo[2]
+            elif callable(self._constraint):
                 retval = float(self._constraint(*self._constraint_args))
             else:
                 retval = self._constraint._eval()
@@ -714,14 +748,12 @@ class Parameter(BaseParameter):
     @value.setter
     def value(self, v):
         value = np.float64(v)
+        _bump_value_revision()
         self._value = value
 
     def _eval(self):
         if self._constraint is not None:
-            if isinstance(self._constraint, BaseParameter):
-                return self._constraint._eval()
-            elif callable(self._constraint):
-                return self.value
+            return self.value
         else:
             return self._value
 
@@ -734,6 +766,7 @@ class Parameter(BaseParameter):
 
     @bounds.setter
     def bounds(self, bounds):
+        _bounds._bump_revision()
         if isinstance(bounds, Bounds):
             self._bounds = bounds
         elif bounds is None:
@@ -791,6 +824,7 @@ class Parameter(BaseParameter):
         if self.constraint is not None:
             raise RuntimeError("cannot vary a Parameter which is constrained")
         else:
+            _bounds._bump_revision()
             self._vary = vary
 
     @property
@@ -799,6 +833,7 @@ class Parameter(BaseParameter):
 
     @constraint.setter
     def constraint(self, expr):
+        _bounds._bump_revision()
         self._deps = []
         if expr is None:
             value = self.value
@@ -851,6 +886,10 @@ class Parameter(BaseParameter):
             and those Parameters have constraints themselves, then those
             Parameters will likely have stale values, resulting in undefined
             behaviour.
+            During a fit (see :meth:`refnx.analysis.Objective.parameter_plan`)
+            the value of the constraint is memoised until the value of a
+            Parameter changes, so the callable should not depend on any other
+            mutable state.
 
         Examples
         --------
@@ -896,6 +935,7 @@ class Parameter(BaseParameter):
             float(constraint(*args))
 
             # at this point the constraint function should be ok.
+            _bounds._bump_revision()
             self._constraint = constraint
             self._constraint_args = args
             self._deps = deps
@@ -1043,8 +1083,8 @@ def build_constraint_from_tree(tree):
     for t in tree:
         if callable(t):
             if t in binary:
-                o1 = v.pop()
                 o2 = v.pop()
+                o1 = v.pop()
                 v.append(t(o1, o2))
             elif t in unary:
                 o1 = v.pop()
@@ -1053,3 +1093,249 @@ def build_constraint_from_tree(tree):
             v.append(t)
 
     return v[0]
+
+
+def _constraint_parameters(param):
+    """
+    The Parameter objects that a constrained Parameter directly depends on.
+    Unlike `BaseParameter.dependencies` intermediate constrained Parameters
+    are returned, rather than being resolved to their own dependencies.
+    """
+    constraint = param.constraint
+    if constraint is None:
+        return []
+
+    if isinstance(constraint, BaseParameter):
+        nodes = [constraint]
+    else:
+        nodes = [arg for arg in flatten(param._constraint_args)]
+
+    deps = []
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, Parameter):
+            deps.append(node)
+        elif isinstance(node, _BinaryOp):
+            nodes.extend([node.op1, node.op2])
+        elif isinstance(node, _UnaryOp):
+            nodes.append(node.op1)
+    return list(f_unique(deps))
+
+
+def _dependency_order(params):
+    """
+    Orders the constrained Parameters in `params` (and any constrained
+    Parameters that they depend on) such that each Parameter appears after
+    all of the constrained Parameters it depends on.
+    """
+    order = []
+    seen = set()
+
+    # depth first search, without recursion because chains of constraints
+    # can be long
+    for root in params:
+        stack = [(root, False)]
+        while stack:
+            param, visited = stack.pop()
+            if visited:
+                if param.constraint is not None:
+                    order.append(param)
+                continue
+            if id(param) in seen:
+                continue
+            seen.add(id(param))
+            stack.append((param, True))
+            stack.extend(
+                (dep, False) for dep in _constraint_parameters(param)[::-1]
+            )
+    return order
+
+
+# opcodes for _ConstraintProgram
+_LOAD = 0
+_UNARY = 1
+_BINARY = 2
+
+
+class _ConstraintProgram:
+    """
+    Compiles the constraints of a set of Parameters into a flat evaluation
+    program, evaluating all of them in a single pass.
+
+    Parameters
+    ----------
+    constrained : sequence of refnx.analysis.Parameter
+        Constrained Parameters, in dependency order (see
+        `_dependency_order`).
+
+    Notes
+    -----
+    Each expression constraint (the tree of `_BinaryOp`/`_UnaryOp` that is
+    also described by `constraint_tree`) is turned into a list of reverse
+    Polish instructions acting on a register file. The register file holds
+    the value of each constrained Parameter, followed by the values of the
+    unconstrained Parameters and Constants (the leaves) in the trees. Because
+    the Parameters are evaluated in dependency order a constrained Parameter
+    that appears in a later constraint is read from its register, rather than
+    being re-evaluated. Callable constraints are called with their `args`.
+
+    After evaluation each Parameter memoises its value, which is returned by
+    `Parameter.value` until any Parameter value, or a `vary`, `bounds` or
+    `constraint`, changes.
+    """
+
+    def __init__(self, constrained):
+        self.outputs = list(constrained)
+        self.leaves = []
+        self._slots = {id(p): i for i, p in enumerate(self.outputs)}
+
+        self._code = []
+        for param in self.outputs:
+            constraint = param.constraint
+            if isinstance(constraint, BaseParameter):
+                code = []
+                self._compile(constraint, code)
+                self._code.append(code)
+            else:
+                self._code.append((constraint, param._constraint_args))
+        del self._slots
+
+    def _compile(self, node, code):
+        if isinstance(node, _BinaryOp):
+            self._compile(node.op1, code)
+            self._compile(node.op2, code)
+            code.append((_BINARY, node.opn))
+        elif isinstance(node, _UnaryOp):
+            self._compile(node.op1, code)
+            code.append((_UNARY, node.opn))
+        else:
+            slot = self._slots.get(id(node))
+            if slot is None:
+                slot = len(self.outputs) + len(self.leaves)
+                self._slots[id(node)] = slot
+                self.leaves.append(node)
+            code.append((_LOAD, slot))
+
+    def evaluate(self):
+        """
+        Evaluates, and memoises, the values of all the constrained
+        Parameters.
+        """
+        regs = [None] * len(self.outputs)
+        regs.extend([leaf._eval() for leaf in self.leaves])
+        revision = _bounds._revision
+        value_revision = _value_revision
+
+        for i, (param, code) in enumerate(zip(self.outputs, self._code)):
+            if type(code) is tuple:
+                func, args = code
+                val = float(func(*args))
+            else:
+                stack = []
+                for opcode, arg in code:
+                    if opcode == _LOAD:
+                        stack.append(regs[arg])
+                    elif opcode == _UNARY:
+                        stack.append(arg(stack.pop()))
+                    else:
+                        o2 = stack.pop()
+                        stack.append(arg(stack.pop(), o2))
+                val = stack[0]
+            regs[i] = val
+            param._memo = (revision, value_revision, val)
+
+
+class _ParameterPlan:
+    """
+    A precompiled description of a set of parameters, used to avoid walking
+    the parameter tree on every evaluation during a fit.
+
+    Parameters
+    ----------
+    parameters : refnx.analysis.Parameters
+        All the parameters in the system.
+    varying : sequence of refnx.analysis.Parameter
+        The varying parameters, in the order they are supplied by a fitter.
+
+    Notes
+    -----
+    The plan records the global parameter revision at creation. It is stale
+    once the `vary`, `bounds` or `constraint` of any Parameter has been
+    changed, see :meth:`_ParameterPlan.stale`. Changes to the membership of
+    the parameter tree (e.g. adding a layer to a Structure) are *not*
+    detected, so a plan should only be kept for the duration of a fit.
+    """
+
+    def __init__(self, parameters, varying):
+        self.revision = _bounds._revision
+        self.flattened = list(flatten(parameters))
+        self.varying = list(varying)
+
+        # only the varying parameters in the tree contribute to the log-prior
+        prior = list(f_unique(p for p in self.flattened if p.vary))
+        interval = [p for p in prior if type(p.bounds) is Interval]
+        self._other = [p for p in prior if type(p.bounds) is not Interval]
+        self._interval = interval
+        self._lb = np.array([p.bounds.lb for p in interval], dtype=float)
+        self._ub = np.array([p.bounds.ub for p in interval], dtype=float)
+        self._logprob = float(np.sum([p.bounds._logprob for p in interval]))
+
+        self.constrained = _dependency_order(
+            f_unique(p for p in self.flattened if p.constraint is not None)
+        )
+        self.program = _ConstraintProgram(self.constrained)
+
+    def __setstate__(self, state):
+        # the revision counter is per process.
+        self.__dict__.update(state)
+        self.revision = _bounds._revision
+
+    @property
+    def stale(self):
+        """
+        Whether a Parameter has had its `vary`, `bounds` or `constraint`
+        changed since the plan was made.
+        """
+        return self.revision != _bounds._revision
+
+    def setp(self, pvals):
+        """
+        Set the values of either the varying, or all, of the parameters.
+        The constrained parameters are then updated.
+        """
+        if len(pvals) == len(self.varying):
+            for param, val in zip(self.varying, pvals):
+                param.value = val
+            self.program.evaluate()
+            return
+
+        if len(pvals) == len(self.flattened):
+            for param, val in zip(self.flattened, pvals):
+                param.value = val
+            self.program.evaluate()
+            return
+
+        raise ValueError(
+            f"Incorrect number of values supplied ({len(pvals)})"
+            f", supply either the full number of parameters"
+            f" ({len(self.flattened)}, or only the varying"
+            f" parameters ({len(self.varying)})."
+        )
+
+    def logp(self):
+        """
+        Log-prior of the varying parameters. The `Interval` bounds are
+        evaluated in a single vectorised step.
+        """
+        vals = np.fromiter(
+            (p.value for p in self._interval),
+            dtype=float,
+            count=len(self._interval),
+        )
+        if not np.all((self._lb <= vals) & (vals <= self._ub)):
+            return -np.inf
+
+        logp = self._logprob
+        for param in self._other:
+            logp += param.logp()
+        return logp
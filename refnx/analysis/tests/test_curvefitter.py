@@ -27,8 +27,10 @@ from refnx.analysis import (
     PDF,
     autocorrelation_chain,
     integrated_time,
+    integrated_time_chain,
 )
 import refnx.analysis.tests
+import refnx.analysis.curvefitter as curvefitter
 from refnx.analysis.curvefitter import bounds_list
 from refnx.dataset import Data1D
 from refnx._lib import emcee, flatten
@@ -241,6 +243,247 @@ class TestCurveFitter:
 
         assert_equal(chain1, chain2)
 
+    def test_thread_pool(self):
+        # sampling with a pool of threads gives the same chain as in serial
+        self.mcfitter.initialise("prior", random_state=1)
+        starting_pos = np.copy(self.mcfitter._state.coords)
+        self.mcfitter.sample(3, random_state=1, pool=1, verbose=False)
+        chain1 = np.copy(self.mcfitter.chain)
+
+        self.mcfitter.reset()
+        self.mcfitter.initialise(pos=starting_pos)
+        self.mcfitter.sample(
+            3, random_state=1, pool="threads:2", verbose=False
+        )
+        assert_equal(self.mcfitter.chain, chain1)
+
+        # as does differential_evolution
+        f = CurveFitter(self.objective)
+        pvals = np.array(self.objective.parameters)
+        res1 = f.fit(
+            "differential_evolution",
+            seed=1,
+            maxiter=5,
+            updating="deferred",
+            verbose=False,
+        )
+        self.objective.setp(pvals)
+        res2 = f.fit(
+            "differential_evolution",
+            seed=1,
+            maxiter=5,
+            workers="threads:2",
+            verbose=False,
+        )
+        assert_equal(res2.x, res1.x)
+
+    def test_de_vectorized(self):
+        # evaluating the whole population at once gives the same result as
+        # evaluating it one member at a time
+        f = CurveFitter(self.objective)
+        pvals = np.array(self.objective.parameters)
+        for target in ["nll", "nlpost"]:
+            self.objective.setp(pvals)
+            res1 = f.fit(
+                "differential_evolution",
+                target=target,
+                seed=1,
+                maxiter=5,
+                updating="deferred",
+                verbose=False,
+            )
+            self.objective.setp(pvals)
+            res3 = f.fit(
+                "differential_evolution",
+                target=target,
+                seed=1,
+                maxiter=5,
+                vectorized=True,
+                verbose=False,
+            )
+            assert_allclose(res3.x, res1.x)
+            assert_allclose(res3.fun, res1.fun)
+
+    def test_binary_chain(self, tmp_path):
+        # chains saved to .npy files are memory-mapped by load_chain
+        x = np.array(self.objective.parameters)
+        mcfitter = CurveFitter(self.objective, nwalkers=20)
+        mcfitter.initialise("jitter", random_state=1)
+        mcfitter.sample(
+            8, random_state=2, f=tmp_path / "a.npy", pool=1, verbose=False
+        )
+        chain, log_prob = load_chain(tmp_path / "a.npy", log_prob=True)
+        assert isinstance(chain, np.memmap)
+        assert_equal(chain, mcfitter.chain)
+        assert_allclose(log_prob, mcfitter.logpost)
+
+        # restoring from the file carries on with the same random numbers
+        self.objective.setp(x)
+        mcfitter2 = CurveFitter(self.objective, nwalkers=20)
+        mcfitter2.initialise("jitter", random_state=1)
+        mcfitter2.sample(
+            4, random_state=2, f=tmp_path / "b.npy", pool=1, verbose=False
+        )
+        mcfitter3 = CurveFitter(self.objective, nwalkers=20)
+        mcfitter3.initialise_with_chain(tmp_path / "b.npy")
+        mcfitter3.sample(4, pool=1, verbose=False)
+        assert_equal(mcfitter3.chain, mcfitter.chain[4:])
+
+        # parallel tempering
+        mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=3)
+        mcfitter.sample(
+            3, random_state=2, f=tmp_path / "c.npy", pool=1, verbose=False
+        )
+        chain, log_prob = load_chain(tmp_path / "c.npy", log_prob=True)
+        assert_equal(chain, mcfitter.chain)
+        assert_equal(log_prob.shape, (3, 3, 20))
+
+        mcfitter2 = CurveFitter(self.objective, nwalkers=20, ntemps=3)
+        mcfitter2.initialise_with_chain(tmp_path / "c.npy")
+        assert_equal(mcfitter2._state.coords, chain[-1])
+        assert_equal(
+            mcfitter2._state.random_state, mcfitter.sampler.random_state
+        )
+
+    def test_binary_chain_append(self, tmp_path):
+        # sampling to an existing chain file appends the steps
+        f = tmp_path / "a.npy"
+        mcfitter = CurveFitter(self.objective, nwalkers=20)
+        mcfitter.initialise("jitter", random_state=1)
+        mcfitter.sample(3, random_state=2, f=f, pool=1, verbose=False)
+        mcfitter.sample(4, f=f, pool=1, verbose=False)
+        chain, log_prob = load_chain(f, log_prob=True)
+        assert_equal(chain, mcfitter.chain)
+        assert_allclose(log_prob, mcfitter.logpost)
+
+        # carrying on from the end of the file
+        mcfitter2 = CurveFitter(self.objective, nwalkers=20)
+        mcfitter2.initialise_with_chain(f)
+        mcfitter2.sample(2, f=f, pool=1, verbose=False)
+        assert_equal(load_chain(f)[:7], chain)
+        assert_equal(load_chain(f)[7:], mcfitter2.chain)
+
+        # the steps in the file have to be the same shape
+        mcfitter = CurveFitter(self.objective, nwalkers=10)
+        with pytest.raises(ValueError):
+            mcfitter.sample(2, f=f, pool=1, verbose=False)
+        assert_equal(len(load_chain(f)), 9)
+        np.save(tmp_path / "b.npy", np.ones((2, 10, 2)))
+        with pytest.raises(ValueError):
+            mcfitter.sample(2, f=tmp_path / "b.npy", pool=1, verbose=False)
+
+    def test_process_chain_file(self, tmp_path):
+        # processing a chain file should give the same result as processing
+        # the chain in memory, without copying the chain.
+        self.p[1].vary = False
+        self.p[1].constraint = -0.2 * self.p[0]
+        for ntemps in [-1, 3]:
+            f = tmp_path / f"a{ntemps}.npy"
+            mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=ntemps)
+            mcfitter.sample(30, random_state=1, f=f, pool=1, verbose=False)
+
+            for flatchain in [False, True]:
+                kwds = {"nburn": 5, "nthin": 2, "flatchain": flatchain}
+                res = process_chain(self.objective, mcfitter.chain, **kwds)
+                constrained = np.copy(self.p[1].chain)
+                res2 = process_chain(self.objective, f, **kwds)
+                assert_equal(res2[0].median, res[0].median)
+                assert_equal(res2[0].stderr, res[0].stderr)
+                assert_equal(res2[0].chain, res[0].chain)
+                assert_equal(
+                    isinstance(res2[0].chain, np.memmap), not flatchain
+                )
+                assert_equal(self.p[1].chain, constrained)
+
+            assert_allclose(
+                autocorrelation_chain(f, nburn=5),
+                autocorrelation_chain(mcfitter.chain, nburn=5),
+            )
+
+    def test_process_chain_blocks(self, tmp_path, monkeypatch):
+        # a chain file is processed in blocks of steps, which gives the same
+        # statistics as processing the chain in memory.
+        self.p[1].vary = False
+        self.p[1].constraint = -0.2 * self.p[0]
+        mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=2)
+        mcfitter.sample(
+            40, random_state=1, f=tmp_path / "a.npy", pool=1, verbose=False
+        )
+        chain = mcfitter.chain
+
+        res = process_chain(self.objective, chain, nburn=3)
+        constrained = np.copy(self.p[1].chain)
+        acfs = autocorrelation_chain(chain, nburn=3)
+        tau = integrated_time(chain[3:, 0], tol=0)
+
+        # several blocks, and groups of series for the autocorrelation
+        nbytes = chain[0].nbytes
+        monkeypatch.setattr(curvefitter, "_CHAIN_BLOCK_BYTES", 3 * nbytes)
+        res2 = process_chain(self.objective, tmp_path / "a.npy", nburn=3)
+        assert_equal(res2[0].median, res[0].median)
+        assert_equal(res2[0].stderr, res[0].stderr)
+        assert_equal(self.p[1].chain, constrained)
+        assert_allclose(
+            autocorrelation_chain(tmp_path / "a.npy", nburn=3), acfs
+        )
+        assert_allclose(integrated_time_chain(tmp_path / "a.npy", 3), tau)
+        assert_allclose(integrated_time_chain(chain, 3), tau)
+
+    def test_checkpoint_resume(self, tmp_path):
+        # an interrupted run resumed from a checkpoint should be the same as
+        # an uninterrupted one.
+        x = np.array(self.objective.parameters)
+        checkpoint = tmp_path / "checkpoint.pkl"
+
+        def interrupt(coords, logprob):
+            interrupt.calls += 1
+            if interrupt.calls == 6:
+                raise KeyboardInterrupt()
+
+        for ntemps in [-1, 3]:
+            self.objective.setp(x)
+            mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=ntemps)
+            mcfitter.initialise("jitter", random_state=1)
+            mcfitter.sample(10, random_state=2, pool=1, verbose=False)
+            chain = np.copy(mcfitter.chain)
+
+            self.objective.setp(x)
+            mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=ntemps)
+            mcfitter.initialise("jitter", random_state=1)
+            interrupt.calls = 0
+            f = tmp_path / f"chain{ntemps}.npy"
+            with pytest.raises(KeyboardInterrupt):
+                mcfitter.sample(
+                    10,
+                    random_state=2,
+                    f=f,
+                    pool=1,
+                    verbose=False,
+                    callback=interrupt,
+                    checkpoint=checkpoint,
+                    checkpoint_interval=4,
+                )
+            assert not (tmp_path / "checkpoint.pkl.tmp").exists()
+            # steps were saved after the checkpoint
+            assert_equal(len(load_chain(f)), 5)
+
+            mcfitter = CurveFitter(self.objective, nwalkers=20, ntemps=ntemps)
+            steps = mcfitter.resume(checkpoint)
+            assert steps == 6
+            mcfitter.sample(
+                steps, f=f, pool=1, verbose=False, checkpoint=checkpoint
+            )
+            assert_equal(mcfitter.chain, chain[4:])
+            assert mcfitter.resume(checkpoint) == 0
+
+            # the chain file is the same as an uninterrupted run
+            assert_equal(load_chain(f), chain)
+
+        # checkpoint has to be resumed by the same kind of sampler
+        mcfitter = CurveFitter(self.objective, nwalkers=20)
+        with pytest.raises(ValueError):
+            mcfitter.resume(checkpoint)
+
     def test_mcmc_pt(self):
         # smoke test for parallel tempering
         x = np.array(self.objective.parameters)
@@ -292,6 +535,28 @@ class TestCurveFitter:
 
         assert_allclose(chain2, chain)
 
+    def test_mcmc_vectorize(self):
+        # vectorised sampling should reproduce the chain obtained by
+        # evaluating the walkers one at a time.
+        x = np.array(self.objective.parameters)
+        for ntemps in [-1, 3]:
+            chains = []
+            for vectorize in [False, True]:
+                self.objective.setp(x)
+                mcfitter = CurveFitter(
+                    self.objective,
+                    nwalkers=20,
+                    ntemps=ntemps,
+                    vectorize=vectorize,
+                )
+                mcfitter.initialise("jitter", random_state=1)
+                mcfitter.sample(steps=4, verbose=False, random_state=2, pool=1)
+                chains.append(np.copy(mcfitter.chain))
+            assert_allclose(chains[1], chains[0])
+
+        mcfitter = pickle.loads(pickle.dumps(mcfitter))
+        assert mcfitter._vectorize
+
     def test_mcmc_init(self):
         # smoke test for sampler initialisation
         # TODO check that the initialisation worked.
@@ -4,7 +4,11 @@ overall construction of the models can be done in a few different ways.
 """
 
 from importlib import resources
+import gc
+import pickle
+
 import numpy as np
+import pytest
 from numpy.testing import (
     assert_,
     assert_equal,
@@ -13,6 +17,7 @@ from numpy.testing import (
 )
 import refnx.analysis.tests
 from refnx.analysis import CurveFitter, Objective, GlobalObjective, Transform
+from refnx.analysis.objective import _shared_model_groups
 from refnx.dataset import ReflectDataset
 from refnx.reflect import Slab, SLD, ReflectModel
 
@@ -182,3 +187,111 @@ class TestGlobalFitting:
             + 3.3 * objective366.logl(),
         )
         global_objective.lambdas = np.ones(3)
+
+    def test_parallel_evaluation(self):
+        # concurrent evaluation of the objectives gives identical results
+        data361 = ReflectDataset(self.pth / "e361r.txt")
+        data365 = ReflectDataset(self.pth / "e365r.txt")
+        data366 = ReflectDataset(self.pth / "e366r.txt")
+
+        si = SLD(2.07, name="Si")
+        sio2 = SLD(3.47, name="SiO2")
+        polymer = SLD(1, name="polymer")
+
+        structure361 = si | sio2(10, 4) | polymer(200, 3) | self.d2o(0, 3)
+        structure365 = si | structure361[1] | structure361[2] | self.cm3(0, 3)
+        structure361[1].thick.setp(vary=True, bounds=(0, 20))
+        structure361[2].thick.setp(vary=True, bounds=(200.0, 250.0))
+        structure361[2].sld.real.setp(vary=True, bounds=(0, 2))
+
+        model361 = ReflectModel(structure361, bkg=2e-5)
+        model365 = ReflectModel(structure365, bkg=2e-5)
+        # shares a Structure with model361
+        model366 = ReflectModel(structure361, bkg=3e-5)
+        model366.bkg.setp(vary=True, bounds=(1e-6, 5e-5))
+
+        objectives = [
+            Objective(model361, data361),
+            Objective(model365, data365),
+            Objective(model366, data366),
+            Objective(model365, data366),
+        ]
+        assert_equal(_shared_model_groups(objectives), [[0, 2], [1, 3]])
+
+        serial = GlobalObjective(objectives, lambdas=[1, 2, 3, 4])
+        parallel = GlobalObjective(
+            objectives, lambdas=[1, 2, 3, 4], workers=-1
+        )
+        parallel.workers = 3
+        assert_equal(parallel.workers, 3)
+
+        rng = np.random.default_rng(SEED)
+        p0 = np.array(serial.varying_parameters())
+        pvals = p0 * (1 + 0.05 * rng.standard_normal((5, p0.size)))
+        for p in pvals:
+            assert_equal(parallel.logl(p), serial.logl(p))
+            assert_equal(parallel.residuals(p), serial.residuals(p))
+            assert_equal(parallel.generative(p), serial.generative(p))
+        assert_equal(parallel.logl_batch(pvals), serial.logl_batch(pvals))
+        assert_equal(
+            parallel.generative_batch(pvals), serial.generative_batch(pvals)
+        )
+
+        # the thread pool isn't pickled
+        parallel.logl()
+        unpickled = pickle.loads(pickle.dumps(parallel))
+        assert_equal(unpickled.workers, 3)
+        assert_equal(unpickled.logl(pvals[0]), serial.logl(pvals[0]))
+
+        with pytest.raises(ValueError):
+            parallel.workers = 0
+
+        # GlobalObjectives pickled before the workers attribute existed
+        state = serial.__getstate__()
+        del state["_workers"], state["_executor"], state["_finalizer"]
+        old = GlobalObjective.__new__(GlobalObjective)
+        old.__setstate__(state)
+        assert_equal(old.workers, 1)
+        assert_equal(old.logl(pvals[0]), serial.logl(pvals[0]))
+
+        # the thread pool is shut down with the GlobalObjective
+        executor = parallel._executor
+        assert executor is not None
+        parallel.workers = 2
+        assert parallel._executor is None
+        assert executor._shutdown
+        parallel.logl()
+        executor = parallel._executor
+        del parallel
+        gc.collect()
+        assert executor._shutdown
+
+    def test_batch_constraint_between_objectives(self):
+        # a constraint in one objective depends on a parameter that only
+        # varies in the other objective.
+        data361 = ReflectDataset(self.pth / "e361r.txt")
+        data365 = ReflectDataset(self.pth / "e365r.txt")
+
+        s1 = self.si | self.sio2(15, 3) | self.d2o(0, 3)
+        s2 = self.si | self.polymer(15, 3) | self.cm3(0, 3)
+        s1[1].thick.setp(vary=True, bounds=(5, 50))
+        s1[1].sld.real.setp(vary=True, bounds=(0, 5))
+        s2[1].thick.constraint = s1[1].thick * 1.5
+
+        global_objective = GlobalObjective(
+            [
+                Objective(ReflectModel(s1), data361),
+                Objective(ReflectModel(s2), data365),
+            ]
+        )
+        x0 = np.array(global_objective.varying_parameters())
+
+        pvals = np.array([[10, 2.0], [30, 3.0], [45, 1.0]])
+        logl = [global_objective.logl(p) for p in pvals]
+        generative = [global_objective.generative(p) for p in pvals]
+        global_objective.setp(x0)
+
+        assert_allclose(global_objective.logl_batch(pvals), logl)
+        assert_allclose(global_objective.generative_batch(pvals), generative)
+        assert_equal(np.array(global_objective.varying_parameters()), x0)
+        assert_equal(s2[1].thick.value, 1.5 * x0[0])
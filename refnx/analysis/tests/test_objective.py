@@ -25,6 +25,8 @@ from refnx.analysis import (
     Model,
     Objective,
     BaseObjective,
+    GlobalObjective,
+    CurveFitter,
     Transform,
     Parameters,
     PDF,
@@ -57,6 +59,28 @@ def line_ND(x, params):
     return np.c_[y0, y1]
 
 
+class GaussModel(Model):
+    # a model that calculates its own derivatives
+    def __init__(self, parameters):
+        super().__init__(parameters, fitfunc=gauss)
+        self.analytic = True
+
+    def jacobian(self, x, x_err=None):
+        if not self.analytic:
+            raise NotImplementedError
+        p = np.array(self.parameters)
+        u = (x - p[2]) / p[3]
+        e = np.exp(-(u**2))
+        jac = np.c_[
+            np.ones_like(x),
+            e,
+            2 * p[1] * u * e / p[3],
+            2 * p[1] * u**2 * e / p[3],
+        ]
+        vary = [param.vary for param in self.parameters]
+        return jac[:, vary]
+
+
 class TestObjective:
     def setup_method(self):
         self.pth = resources.files(refnx.analysis.tests)
@@ -222,6 +246,81 @@ class TestObjective:
         assert_allclose(self.objective.logl() + amend, -559.01078135444595)
         assert_allclose(self.objective.logpost() + amend, -559.01078135444595)
 
+    def test_batch(self):
+        # batched log-probabilities should be identical to evaluating each
+        # row individually, and should leave the objective unchanged.
+        self.p[0].bounds = (-10, 10)
+        self.p[1].bounds = (-5, 5)
+        x0 = np.array(self.objective.parameters)
+
+        rng = np.random.default_rng(1)
+        pvals = rng.uniform([-12, -6], [12, 6], size=(20, 2))
+        logp = [self.objective.logp(p) for p in pvals]
+        logl = [self.objective.logl(p) for p in pvals]
+        logpost = [self.objective.logpost(p) for p in pvals]
+        self.objective.setp(x0)
+
+        assert_allclose(self.objective.logp_batch(pvals), logp)
+        assert_allclose(self.objective.logl_batch(pvals), logl)
+        assert_allclose(self.objective.logpost_batch(pvals), logpost)
+        assert_equal(np.array(self.objective.parameters), x0)
+
+        generative = self.objective.generative_batch(pvals)
+        assert_equal(generative.shape, (20, self.data.y.size))
+        assert_allclose(generative[3], self.objective.generative(pvals[3]))
+        self.objective.setp(x0)
+
+        # transform and lnsigma are applied per row
+        objective = Objective(
+            self.model,
+            self.data,
+            lnsigma=Parameter(-1, vary=True, bounds=(-3, 3)),
+            transform=Transform("logY"),
+        )
+        pvals = np.column_stack([pvals, rng.uniform(-3, 3, size=20)])
+        data_y = np.abs(self.data.y)
+        self.data.data = (self.data.x, data_y, self.data.y_err)
+        pvals[:, 0] = np.abs(pvals[:, 0]) + 20
+        pvals[:, 1] = rng.uniform(-1, 1, size=20)
+        logl = [objective.logl(p) for p in pvals]
+        assert_allclose(objective.logl_batch(pvals), logl)
+
+        # GlobalObjective splits the columns between its objectives
+        global_objective = GlobalObjective([self.objective, objective])
+        pvals = pvals[:, :3]
+        logl = [global_objective.logl(p) for p in pvals]
+        assert_allclose(global_objective.logl_batch(pvals), logl)
+
+    def test_parameter_plan(self):
+        self.p[0].bounds = (-10, 10)
+        self.p[1].bounds = (-5, 5)
+        x0 = np.array(self.objective.parameters)
+        pvals = [[1, 2], [1, 6], [-9, -4.9]]
+        logp = [self.objective.logp(p) for p in pvals]
+        logpost = [self.objective.logpost(p) for p in pvals]
+
+        with self.objective.parameter_plan():
+            assert_allclose([self.objective.logp(p) for p in pvals], logp)
+            assert_allclose(
+                [self.objective.logpost(p) for p in pvals], logpost
+            )
+            # the plan is rebuilt when the bounds change
+            self.p[1].bounds.ub = 10
+            assert np.isfinite(self.objective.logp([1, 6]))
+
+            # setting all the values
+            self.objective.setp(x0)
+            assert_equal(np.array(self.objective.parameters), x0)
+            with pytest.raises(ValueError):
+                self.objective.setp([1, 2, 3])
+
+        assert self.objective._plan is None
+
+        # CurveFitter uses the plan during a fit
+        fitter = CurveFitter(self.objective)
+        fitter.fit("differential_evolution", maxiter=2, verbose=False)
+        assert self.objective._plan is None
+
     def test_prior_transform(self):
         self.p[0].bounds = PDF(stats.uniform(-10, 20))
         self.p[1].bounds = PDF(stats.norm(loc=5, scale=10))
@@ -517,6 +616,63 @@ class TestObjective:
         with warns(LinAlgWarning):
             objective.covar()
 
+    def test_covar_analytic_jacobian(self):
+        # covariance from the exact Jacobian supplied by the model
+        theoretical = np.loadtxt(self.pth / "gauss_data.txt")
+        data = Data1D(theoretical.T)
+
+        params = Parameters(name="gauss_params")
+        for val, bound in zip([0.1, 20.0, 0.1, 0.1], [1, 30, 5, 2]):
+            params.append(Parameter(val, bounds=(-bound, bound), vary=True))
+        model = GaussModel(params)
+
+        lnsigma = Parameter(-3, vary=True)
+        for kwds in [
+            {},
+            {"transform": Transform("YX2")},
+            {"lnsigma": lnsigma},
+            {"use_weights": False},
+        ]:
+            objective = Objective(model, data, **kwds)
+            pvals = np.array(objective.varying_parameters())
+            jac = objective._jacobian()
+            assert jac is not None
+            assert_allclose(
+                jac,
+                approx_derivative(objective.residuals, pvals),
+                rtol=1e-5,
+                atol=1e-8,
+            )
+            objective.setp(pvals)
+
+            covar = objective.covar()
+            model.analytic = False
+            assert objective._jacobian() is None
+            assert_allclose(covar, objective.covar(), rtol=1e-5)
+            model.analytic = True
+
+        # auxiliary parameters might feature in constraints
+        objective = Objective(model, data, auxiliary_params=[lnsigma])
+        assert objective._jacobian() is None
+
+        # global objectives put together the Jacobian of each objective
+        params[0].vary = False
+        data2 = Data1D((data.x, data.y[::-1], data.y_err[::-1]))
+        model2 = GaussModel(
+            Parameters([Parameter(0.2), params[1], params[2], params[3]])
+        )
+        global_objective = GlobalObjective(
+            [Objective(model, data), Objective(model2, data2)],
+            lambdas=[1.0, 0.5],
+        )
+        pvals = np.array(global_objective.varying_parameters())
+        assert_allclose(
+            global_objective._jacobian(),
+            approx_derivative(global_objective.residuals, pvals),
+            rtol=1e-5,
+            atol=1e-8,
+        )
+
     @pytest.mark.filterwarnings(
         "ignore:Numba will use object mode:UserWarning"
     )
@@ -1,3 +1,4 @@
+import operator
 import pickle
 
 import pytest
@@ -18,6 +19,9 @@ from refnx.analysis.parameter import (
     is_parameter,
     _BinaryOp,
     sequence_to_parameters,
+    _ParameterPlan,
+    _ConstraintProgram,
+    _dependency_order,
 )
 
 
@@ -274,6 +278,54 @@ class TestParameter:
         q = possibly_create_parameter(0.5 * p)
         assert isinstance(q, _BinaryOp)
 
+    def test_constraint_tree_operand_order(self):
+        a = Parameter(5)
+        b = Parameter(2)
+        for expr in [a - b, a / b, a**b, b - a * 3]:
+            tree = constraint_tree(expr)
+            assert_allclose(build_constraint_from_tree(tree).value, expr.value)
+
+    def test_constraint_program(self):
+        a = Parameter(1)
+        b = Parameter(2)
+        c = Parameter(0.5, constraint=a - 2 * b)
+        d = Parameter(0, constraint=np.sin(c) / b)
+        e = Parameter(0, constraint=abs(-d) + c)
+        f = Parameter(0)
+        f.set_constraint(operator.mul, args=(e, 3))
+
+        order = _dependency_order([f, e, d])
+        assert order == [c, d, e, f]
+        program = _ConstraintProgram(order)
+        # the leaves are a, b and the Constants
+        assert [id(p) for p in program.leaves if p in [a, b]] == [
+            id(a),
+            id(b),
+        ]
+
+        for val in [1, -3.0]:
+            a.value = val
+            expected = [p.value for p in order]
+            program.evaluate()
+            assert_equal([p._memo[2] for p in order], expected)
+            # values are memoised until a value changes
+            assert_equal([p.value for p in order], expected)
+            assert c._eval() == c._memo[2]
+
+        # memo is invalidated by a change in a value or constraint
+        b.value = 10
+        assert_allclose(c.value, -23)
+        program.evaluate()
+        c.constraint = a + b
+        assert_allclose(e.value, np.abs(np.sin(7) / 10) + 7)
+
+        # memo isn't pickled
+        program = _ConstraintProgram(_dependency_order([e]))
+        program.evaluate()
+        e2 = pickle.loads(pickle.dumps(e))
+        assert e2._memo is None
+        assert_allclose(e2.value, e.value)
+
     def test_dependencies(self):
         p1 = Parameter(1, "p1", vary=True)
         p2 = Parameter(2, "p2", vary=False)
@@ -399,3 +451,44 @@ class TestParameters:
         p = sequence_to_parameters([a, [1, 2, 3, [b]]])
         assert isinstance(p, Parameters)
         assert len(p) == 5
+
+    def test_parameter_plan(self):
+        a = Parameter(1, "a", vary=True, bounds=(0, 10))
+        b = Parameter(2, "b", vary=True, bounds=PDF(norm(2, 1)))
+        c = Parameter(3, "c")
+        d = Parameter(4, "d")
+        e = Parameter(5, "e")
+        d.constraint = 2 * c
+        e.set_constraint(operator.add, args=(d, a))
+        c.constraint = a + b
+        p = Parameters([a, [b, e], c, d, a])
+
+        plan = _ParameterPlan(p, p.varying_parameters())
+        assert not plan.stale
+        assert plan.varying == [a, b]
+        assert plan.flattened == [a, b, e, c, d, a]
+        # c has to be evaluated before d, and d before e
+        assert plan.constrained == [c, d, e]
+
+        plan.setp([2, 3])
+        assert_equal(np.array(p), [2, 3, 12, 5, 10, 2])
+        assert_allclose(plan.logp(), p.logp())
+        plan.setp([5, 2, 0, 0, 0, 5])
+        assert_allclose(plan.logp(), p.logp())
+        with pytest.raises(ValueError):
+            plan.setp([1, 2, 3])
+
+        # values outside an Interval
+        plan.setp([11, 2])
+        assert plan.logp() == -np.inf
+
+        # plan is invalidated by changes in vary/bounds/constraint
+        a.bounds.ub = 20
+        assert plan.stale
+        plan = _ParameterPlan(p, p.varying_parameters())
+        assert_allclose(plan.logp(), p.logp())
+        b.vary = False
+        assert plan.stale
+
+        plan = pickle.loads(pickle.dumps(plan))
+        assert not plan.stale
@@ -4,11 +4,15 @@ from refnx.reflect.reflect_model import (
     ReflectModel,
     ReflectModelTL,
     reflectivity,
+    reflectivity_batch,
+    pad_slabs,
     MixedReflectModel,
     FresnelTransform,
     choose_dq_type,
     use_reflect_backend,
     available_backends,
+    kernel_memo,
+    KernelMemo,
     abeles,
     SpinChannel,
     Footprint,
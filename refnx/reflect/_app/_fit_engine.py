@@ -0,0 +1,216 @@
+"""
+Runs fits and MCMC sampling away from the GUI thread
+"""
+
+import pickle
+import time
+
+import numpy as np
+from qtpy import QtCore
+
+from refnx.analysis import CurveFitter
+from refnx._lib import flatten, unique as f_unique, MapWrapper
+
+
+class FitWorker(QtCore.QObject):
+    """
+    Fits (or samples) a private copy of an objective. Intended to be run in
+    a `QThread` with :func:`run_worker`.
+
+    The GUI thread keeps ownership of the original objective, so it can be
+    redrawn while the fit is running. Intermediate results are streamed back
+    through the `progress` signal, at most once every `interval` seconds.
+
+    Parameters
+    ----------
+    objective : {Objective, GlobalObjective}
+        The objective to be fitted. It isn't modified by the worker, see
+        :meth:`apply`.
+    method : str
+        A method understood by :meth:`CurveFitter.fit`, or ``'MCMC'``.
+    kws : dict, optional
+        Keywords for :meth:`CurveFitter.fit`, or :meth:`CurveFitter.sample`
+        (which must include `steps`).
+    fitter_kws : dict, optional
+        Keywords used to create the :class:`CurveFitter`.
+    init : str, optional
+        How the MCMC walkers are initialised, see
+        :meth:`CurveFitter.initialise`.
+    interval : float, optional
+        Minimum time (s) between emissions of `progress`.
+
+    Notes
+    -----
+    The `progress` signal has the signature ``progress(pvals, chi2, count)``,
+    where `pvals` are the current best parameter values, and `count` is the
+    number of iterations (or MCMC steps) performed so far. For MCMC `pvals`
+    is the walker with the highest log-probability.
+    `finished` is emitted once the run is over, whether it completed, was
+    aborted or failed (see `aborted` and `error`).
+    """
+
+    progress = QtCore.Signal(object, float, int)
+    finished = QtCore.Signal()
+
+    def __init__(
+        self,
+        objective,
+        method,
+        kws=None,
+        fitter_kws=None,
+        init="jitter",
+        interval=0.25,
+    ):
+        super().__init__()
+        # the fit works on its own copy so that the GUI thread never sees
+        # parameters that are being changed by the optimiser.
+        self.objective = pickle.loads(pickle.dumps(objective))
+        self.fitter = CurveFitter(self.objective, **(fitter_kws or {}))
+        self.method = method
+        self.kws = dict(kws or {})
+        self.init = init
+        self.interval = interval
+
+        self.count = 0
+        self.aborted = False
+        self.error = None
+        self._abort = False
+        self._xk = None
+        self._last_emit = 0.0
+
+    def abort(self):
+        """
+        Requests that the run stops at the end of the current iteration.
+        Can be called from any thread.
+        """
+        self._abort = True
+
+    def abort_on(self, signal):
+        """
+        Aborts the run when `signal` is emitted, e.g. the `canceled` signal
+        of a `QProgressDialog`.
+
+        Parameters
+        ----------
+        signal : QtCore.SignalInstance
+
+        Notes
+        -----
+        The connection is direct. Whilst running the worker occupies the
+        thread it lives in, so a queued call to :meth:`abort` wouldn't be
+        delivered until the run was over.
+        """
+        signal.connect(self.abort, QtCore.Qt.ConnectionType.DirectConnection)
+
+    @QtCore.Slot()
+    def run(self):
+        try:
+            if self.method == "MCMC":
+                self._sample()
+            else:
+                self._fit()
+        except StopIteration:
+            self.aborted = True
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.aborted and self._xk is not None:
+                # leave the objective at the best values found so far
+                self.objective.setp(self._xk)
+            self.finished.emit()
+
+    def _fit(self):
+        kws = self.kws
+        if self.method == "least_squares":
+            # least_squares doesn't have a callback
+            return self.fitter.fit(method=self.method, **kws)
+
+        kws["callback"] = self._fit_callback
+        if self.method == "differential_evolution":
+            # uses a forkserver on Linux, forking a process that has GUI
+            # threads isn't safe.
+            with MapWrapper(-1) as workers:
+                kws["workers"] = workers
+                kws["updating"] = "deferred"
+                self.fitter.fit(method=self.method, **kws)
+        else:
+            self.fitter.fit(method=self.method, **kws)
+
+        # scipy can stop early by itself when a callback raises
+        # StopIteration, rather than propagating it.
+        self.aborted = self._abort
+
+    def _fit_callback(self, xk, *args, **kwds):
+        # depending on the minimizer this is an OptimizeResult
+        xk = np.array(getattr(xk, "x", xk))
+        self.count += 1
+        if self._abort:
+            self._xk = xk
+            raise StopIteration("WARNING: FIT WAS TERMINATED EARLY", xk)
+
+        if self._due():
+            self.progress.emit(xk, self.objective.chisqr(xk), self.count)
+        return False
+
+    def _sample(self):
+        self.fitter.initialise(pos=self.init)
+        self.fitter.sample(callback=self._sample_callback, **self.kws)
+
+    def _sample_callback(self, coords, logprob):
+        self.count += 1
+        if self._abort:
+            raise StopIteration("Sampling aborted")
+
+        if self._due():
+            if coords.ndim == 3:
+                # parallel tempering, only the T=1 walkers are of interest
+                coords, logprob = coords[0], logprob[0]
+            best = np.array(coords[np.argmax(logprob)])
+            self.progress.emit(best, self.objective.chisqr(best), self.count)
+
+    def _due(self):
+        # throttles the progress signal, redrawing the GUI for every
+        # iteration would slow the fit down.
+        now = time.monotonic()
+        if now - self._last_emit < self.interval:
+            return False
+        self._last_emit = now
+        return True
+
+    def apply(self, objective):
+        """
+        Copies the fitted parameter values and their uncertainties to
+        `objective`, the original of the objective that was fitted.
+        """
+        params = f_unique(flatten(objective.parameters))
+        fitted_params = f_unique(flatten(self.objective.parameters))
+        for param, fitted in zip(params, fitted_params):
+            if param.vary:
+                param.value = fitted.value
+            param.stderr = fitted.stderr
+
+
+def run_worker(worker):
+    """
+    Runs `worker` in a `QThread`, returning once it has finished.
+
+    A local event loop runs until then, so the GUI stays responsive and the
+    signals emitted by the worker are delivered.
+
+    Parameters
+    ----------
+    worker : FitWorker
+    """
+    thread = QtCore.QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+
+    loop = QtCore.QEventLoop()
+    # queued, so it's delivered even if the worker finishes before the loop
+    # has started.
+    worker.finished.connect(loop.quit)
+    thread.start()
+    loop.exec()
+
+    thread.quit()
+    thread.wait()
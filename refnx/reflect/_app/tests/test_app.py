@@ -4,10 +4,12 @@ import pickle
 from importlib import resources
 import warnings
 
+import numpy as np
 import pytest
 from qtpy import QtWidgets, QtCore, QtGui
 
 from refnx.reflect._app.view import MotofitMainWindow
+from refnx.reflect._app._fit_engine import FitWorker, run_worker
 import refnx.dataset as refd
 from refnx.reflect._app.treeview_gui_model import (
     ReflectModelNode,
@@ -147,3 +149,95 @@ def test_requirements(qtbot, tmp_path):
     # test if we can add a spline to a model and save an experiment
     myapp, model = mysetup(qtbot)
     assert len(myapp.requirements())
+
+
+@pytest.mark.skipif(QTBOT_MISSING, reason="pytest-qt not installed")
+def test_fit_worker(qtbot):
+    # fits run in a separate thread on a copy of the objective
+    pth = resources.files(refnx.analysis)
+    e361 = refd.ReflectDataset(pth / "tests" / "e361r.txt")
+
+    s = SLD(2.07) | SLD(3.47)(15, 3) | SLD(1.0)(210, 3) | SLD(6.36)(0, 3)
+    rmodel = ReflectModel(s, bkg=2e-6)
+    s[-2].thick.setp(vary=True, bounds=(200, 300))
+    s[-2].sld.real.setp(vary=True, bounds=(0.0, 2.0))
+    objective = refnx.analysis.Objective(rmodel, e361)
+    chi2 = objective.chisqr()
+
+    emitted = []
+    worker = FitWorker(objective, "L-BFGS-B", {"verbose": False}, interval=0)
+    worker.progress.connect(lambda *args: emitted.append(args))
+    run_worker(worker)
+    assert worker.error is None
+    assert not worker.aborted
+    assert len(emitted)
+
+    # the original objective isn't changed until the result is applied
+    assert objective.chisqr() == chi2
+    worker.apply(objective)
+    assert objective.chisqr() < chi2
+    assert s[-2].thick.stderr is not None
+
+    # cooperative cancellation, at the first iteration
+    objective.setp([210, 1.0])
+    worker = FitWorker(objective, "differential_evolution", {"verbose": False})
+    worker.abort()
+    run_worker(worker)
+    assert worker.aborted
+    assert worker.error is None
+
+
+@pytest.mark.skipif(QTBOT_MISSING, reason="pytest-qt not installed")
+def test_fit_worker_abort_signal(qtbot):
+    # a signal emitted by the GUI thread aborts a run that is in progress
+    pth = resources.files(refnx.analysis)
+    e361 = refd.ReflectDataset(pth / "tests" / "e361r.txt")
+
+    s = SLD(2.07) | SLD(3.47)(15, 3) | SLD(1.0)(210, 3) | SLD(6.36)(0, 3)
+    rmodel = ReflectModel(s, bkg=2e-6)
+    s[-2].thick.setp(vary=True, bounds=(200, 300))
+    objective = refnx.analysis.Objective(rmodel, e361)
+
+    steps = 100000
+    worker = FitWorker(
+        objective,
+        "MCMC",
+        kws={"steps": steps, "verbose": False},
+        fitter_kws={"nwalkers": 10},
+    )
+    progress = QtWidgets.QProgressDialog("MCMC progress", "Abort", 0, steps)
+    qtbot.add_widget(progress)
+    worker.abort_on(progress.canceled)
+    QtCore.QTimer.singleShot(200, progress.canceled.emit)
+    run_worker(worker)
+
+    assert worker.aborted
+    assert worker.error is None
+    assert 0 < worker.count < steps
+
+
+@pytest.mark.skipif(QTBOT_MISSING, reason="pytest-qt not installed")
+def test_schedule_update(qtbot):
+    # rapid parameter changes are coalesced into a single redraw
+    myapp, model = mysetup(qtbot)
+    theoretical = model.datastore["theoretical"]
+    rmodel = theoretical.model
+    line = theoretical.graph_properties.ax_fit
+    y = np.copy(line.get_ydata())
+
+    myapp.on_paramsSlider_sliderPressed()
+    assert myapp.reflectivitygraphs.interacting
+    assert myapp.sldgraphs.interacting
+
+    for bkg in [1e-6, 2e-6, 3e-6]:
+        rmodel.bkg.value = bkg
+        myapp.schedule_update(theoretical, rmodel.bkg)
+    assert len(myapp._pending_updates) == 1
+    np.testing.assert_equal(line.get_ydata(), y)
+
+    qtbot.waitUntil(lambda: not myapp._pending_updates)
+    assert not np.allclose(line.get_ydata(), y)
+
+    myapp.on_paramsSlider_sliderReleased()
+    assert not myapp.reflectivitygraphs.interacting
+    assert not myapp.sldgraphs.interacting
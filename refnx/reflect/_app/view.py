@@ -6,7 +6,6 @@ import os
 import sys
 import time
 import csv
-from multiprocessing import get_context
 
 import numpy as np
 import scipy
@@ -49,10 +48,10 @@ from ._lipid_leaflet import LipidLeafletDialog
 from ._optimisation_parameters import OptimisationParameterView
 from ._spline import SplineDialog
 from ._mcmc import ProcessMCMCDialog, SampleMCMCDialog, _plots, _process_chain
+from ._fit_engine import FitWorker, run_worker
 
 import refnx
 from refnx.analysis import (
-    CurveFitter,
     Objective,
     Transform,
     GlobalObjective,
@@ -69,11 +68,15 @@ from refnx.reflect import (
 import refnx.reflect._app
 from refnx.dataset import Data1D, OrsoDataset
 from refnx.reflect._code_fragment import code_fragment
-from refnx._lib import unique, flatten, MapWrapper
+from refnx._lib import unique, flatten
 
 # matplotlib.use('QtAgg')
 UI_LOCATION = resources.files(refnx.reflect._app) / "ui"
 
+# minimum time (ms) between redraws when parameters are being edited rapidly,
+# e.g. dragging the parameter slider.
+UPDATE_INTERVAL = 25
+
 
 class MotofitMainWindow(QtWidgets.QMainWindow):
     """
@@ -97,6 +100,14 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
         # object graphs in response to the treeModel being changed
         self._hold_updating = False
 
+        # parameter edits are coalesced, and the affected data objects are
+        # redrawn at most once every UPDATE_INTERVAL (see schedule_update).
+        self._pending_updates = {}
+        self._update_timer = QtCore.QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(UPDATE_INTERVAL)
+        self._update_timer.timeout.connect(self.flush_updates)
+
         # set up tree view
         self.treeModel = TreeModel(data_container)
 
@@ -1430,52 +1441,45 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
             kws = {}.update(opt_kws)
 
         if methods[alg] != "MCMC":
-            fitter = CurveFitter(objective)
-            progress = ProgressCallback(self, objective=objective)
-
             if alg == "L-BFGS-B":
                 maxiter = kws.pop("maxiter")
                 kws["options"] = {"maxiter": maxiter}
 
-            if alg != "LM":
-                progress.show()
-                kws["callback"] = progress.callback
-
             if sys.stderr is None:
                 # for pythonw, sys.stderr = None
                 kws["verbose"] = False
 
-            try:
-                # workers is added to differential evolution in scipy 1.2
-                if alg == "DE":
-                    with MapWrapper(-1) as workers:
-                        kws["workers"] = workers
-                        kws["updating"] = "deferred"
-                        fitter.fit(method=methods[alg], **kws)
-                else:
-                    fitter.fit(method=methods[alg], **kws)
+            # the fit runs in a separate thread, on a copy of the objective.
+            # The progress dialog shows intermediate results, and the graphs
+            # are redrawn with them.
+            worker = FitWorker(objective, methods[alg], kws)
+            progress = ProgressCallback(self, worker=worker)
+            if alg != "LM":
+                progress.show()
 
-                print(str(objective))
-            except StopIteration as e:
-                # user probably aborted the fit
-                # but it's still worth creating a fit curve, so don't return
-                # in this catch block
-                # xk should be the best fit so far.
-                text = e.args[0]
-                xk = e.args[1]
+            def show_progress(pvals, chi2, iterations):
+                objective.setp(pvals)
+                self.update_gui_model(data_objects)
 
-                msg(repr(text))
-                print(repr(text))
+            worker.progress.connect(show_progress)
+            run_worker(worker)
+            progress.close()
+            progress.deleteLater()
 
-                objective.setp(xk)
-                print(objective)
-            except Exception as e:
+            if worker.error is not None:
                 # Typically shown when sensible limits weren't provided
-                msg(repr(e))
-                progress.close()
+                msg(repr(worker.error))
                 return []
 
-            progress.close()
+            # if the user aborted the fit it's still worth creating a fit
+            # curve, the objective has the best fit so far.
+            worker.apply(objective)
+            if worker.aborted:
+                text = "WARNING: FIT WAS TERMINATED EARLY"
+                msg(repr(text))
+                print(repr(text))
+
+            print(str(objective))
         else:
             if mcmc_kws is None:
                 ok = self.sample_mcmc_dialog.exec()
@@ -1513,58 +1517,46 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
 
             verbose = verbose and sys.stderr is not None
 
-            fitter = CurveFitter(objective, ntemps=ntemps, nwalkers=nwalkers)
-
-            try:
-                fitter.initialise(pos=init)
-                progress = QtWidgets.QProgressDialog(
-                    "MCMC progress", "Abort", 0, nsteps, parent=self
+            progress = QtWidgets.QProgressDialog(
+                "MCMC progress", "Abort", 0, nsteps, parent=self
+            )
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.setAutoClose(True)
+            progress.setValue(0)
+
+            def show_progress(pvals, chi2, steps):
+                progress.setValue(steps)
+                # show the most probable walker
+                objective.setp(pvals)
+                self.update_gui_model(data_objects)
+
+            with open(Path(folder) / "steps.chain", "w") as f:
+                # the pool uses a forkserver on Linux, forking a process
+                # that has GUI threads isn't safe.
+                worker = FitWorker(
+                    objective,
+                    "MCMC",
+                    kws={
+                        "steps": nsteps,
+                        "f": f,
+                        "verbose": verbose,
+                        "nthin": nthin,
+                        "pool": -1,
+                    },
+                    fitter_kws={"ntemps": ntemps, "nwalkers": nwalkers},
+                    init=init,
                 )
-                progress.setWindowModality(Qt.WindowModality.WindowModal)
-                progress.setAutoClose(True)
-                progress.setValue(0)
+                worker.progress.connect(show_progress)
+                worker.abort_on(progress.canceled)
                 progress.show()
+                run_worker(worker)
+            progress.close()
 
-                # only want to update every few seconds - updating the progress
-                # bar can chew processor cycles.
-                completed = [0]
-                last_time = [time.time()]
-
-                def callback(coords, logprob):
-                    completed[0] += 1
-                    if (time.time() - last_time[0]) > 2:
-                        last_time[0] = time.time()
-                        val = completed[0]
-
-                        progress.setValue(val)
-                        if progress.wasCanceled():
-                            raise StopIteration("Sampling aborted")
-
-                _ctx = None
-                if sys.platform == "linux" and sys.version_info < (3, 14):
-                    _ctx = "forkserver"
-
-                with (
-                    open(folder / "steps.chain", "w") as f,
-                    get_context(_ctx).Pool() as workers,
-                ):
-                    fitter.sample(
-                        nsteps,
-                        f=f,
-                        verbose=verbose,
-                        nthin=nthin,
-                        callback=callback,
-                        pool=workers.map,
-                    )
-
-            except StopIteration:
-                pass
-            except Exception as e:
-                progress.close()
-                msg(repr(e))
-                print(repr(e))
+            if worker.error is not None:
+                msg(repr(worker.error))
+                print(repr(worker.error))
                 return []
-            progress.close()
+            fitter = worker.fitter
 
             # process the samples
             def close(dialog=None):
@@ -1727,8 +1719,25 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
             index, index, [Qt.ItemDataRole.EditRole]
         )
 
+    @QtCore.Slot()
+    def on_paramsSlider_sliderPressed(self):
+        # whilst the slider is being dragged only the model lines change, so
+        # they're blitted over a cached background rather than redrawing the
+        # whole figure.
+        data_objects = list(self.treeModel.datastore)
+        self.reflectivitygraphs.start_interaction(
+            [do.graph_properties.ax_fit for do in data_objects]
+        )
+        self.sldgraphs.start_interaction(
+            [do.graph_properties.ax_sld_profile for do in data_objects]
+        )
+
     @QtCore.Slot()
     def on_paramsSlider_sliderReleased(self):
+        self.flush_updates()
+        self.reflectivitygraphs.stop_interaction()
+        self.sldgraphs.stop_interaction()
+
         try:
             self.currentCell["readyToChange"] = False
             self.ui.paramsSlider.setValue(499)
@@ -2186,28 +2195,99 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
             and role[0] == QtCore.Qt.ItemDataRole.EditRole
             and isinstance(node, ParNode)
         ):
-            param = node.parameter
-            wipe_update = [find_data_object(top_left).data_object]
-
-            # find if there are dependent parameters on the original
-            # parameter. There's an argument for doing this in the treeModel,
-            # the model is normally responsible for manipulating data. However,
-            # if we do it here then we only need to redraw once.
-            ds = self.treeModel.datastore
-            for do in ds:
-                model = do.model
-                cpars = model.parameters.constrained_parameters()
-                for cpar in cpars:
-                    deps = cpar.dependencies()
-                    if param in deps:
-                        wipe_update.append(do)
-                        break
+            # parameter values can change many times a second (e.g. the
+            # slider), so the redraw is deferred.
+            self.schedule_update(
+                find_data_object(top_left).data_object, node.parameter
+            )
+            return
 
         if wipe_update:
             wipe_update = list(unique(wipe_update))
             self.clear_data_object_uncertainties(wipe_update)
             self.update_gui_model(wipe_update)
 
+    def schedule_update(self, data_object, param=None):
+        """
+        Requests that chi2, the generative model and the SLD profile of a
+        DataObject are recalculated, and its graphs redrawn.
+
+        Requests are coalesced, they're carried out by :meth:`flush_updates`
+        at most once every `UPDATE_INTERVAL` ms.
+
+        Parameters
+        ----------
+        data_object : DataObject
+        param : refnx.analysis.Parameter, optional
+            The parameter whose value changed. Data objects with constraints
+            depending on `param` are also updated.
+        """
+        if self._hold_updating:
+            return
+
+        _, params = self._pending_updates.setdefault(
+            data_object.name, (data_object, [])
+        )
+        if param is not None:
+            params.append(param)
+
+        # the timer isn't restarted by subsequent requests, so a continuous
+        # stream of edits still redraws at a steady rate.
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    @QtCore.Slot()
+    def flush_updates(self):
+        """
+        Carries out the updates requested by :meth:`schedule_update`.
+        """
+        self._update_timer.stop()
+        pending = self._pending_updates
+        self._pending_updates = {}
+
+        if not pending or self._hold_updating:
+            return
+
+        ds = self.treeModel.datastore
+        names = ds.names
+        params = list(
+            unique(p for _, changed in pending.values() for p in changed)
+        )
+
+        # data objects whose SLD profile has to be recalculated
+        profiles = {}
+        for name, (data_object, changed) in pending.items():
+            if name in names and _alters_structure(data_object.model, changed):
+                profiles[name] = data_object
+        pending = {name: do for name, (do, _) in pending.items()}
+
+        # find if there are dependent parameters on the changed parameters.
+        # There's an argument for doing this in the treeModel, the model is
+        # normally responsible for manipulating data. However, if we do it
+        # here then we only need to do it once per redraw.
+        for do in ds:
+            if do.name in pending:
+                continue
+            cpars = do.model.parameters.constrained_parameters()
+            for cpar in cpars:
+                deps = cpar.dependencies()
+                if any(param in deps for param in params):
+                    pending[do.name] = do
+                    profiles[do.name] = do
+                    break
+
+        data_objects = [do for name, do in pending.items() if name in names]
+        self.clear_data_object_uncertainties(data_objects)
+
+        # the data doesn't change, only the model
+        t = Transform(self.settings.transformdata)
+        self.reflectivitygraphs.redraw_data_objects(
+            data_objects, transform=t, data=False
+        )
+        if profiles:
+            self.sldgraphs.redraw_data_objects(list(profiles.values()))
+        self.calculate_chi2(data_objects)
+
     def calculate_chi2(self, data_objects):
         # calculate chi2 for all the data objects
         if not len(data_objects):
@@ -2279,52 +2359,50 @@ class MotofitMainWindow(QtWidgets.QMainWindow):
 
 
 class ProgressCallback(QtWidgets.QDialog):
-    def __init__(self, parent=None, objective=None):
+    """
+    Displays the progress of a fit being performed by a
+    :class:`refnx.reflect._app._fit_engine.FitWorker`, allowing the user to
+    abort it.
+    """
+
+    def __init__(self, parent=None, worker=None):
         self.start = time.time()
-        self.last_time = time.time()
-        self.abort_flag = False
         super().__init__(parent)
         self.parent = parent
         self.ui = uic.loadUi(UI_LOCATION / "progress.ui", self)
+        self.setWindowModality(Qt.WindowModality.WindowModal)
         self.elapsed = 0.0
         self.chi2 = 1.0e308
+        self.iterations = 0
         self.ui.timer.display(float(self.elapsed))
+
+        self.worker = worker
         self.ui.buttonBox.rejected.connect(self.abort)
-        self.objective = objective
-        self.iterations = 0
+        worker.progress.connect(self.update_progress)
+
+        # the elapsed time keeps ticking between progress updates
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.update_elapsed)
+        self._timer.start(500)
 
     def abort(self):
-        self.abort_flag = True
-
-    def callback(self, xk, *args, **kwds):
-        # a callback for scipy.optimize.minimize, which enters
-        # every iteration.
-        new_time = time.time()
-        self.iterations += 1
-
-        # update every 1.5 seconds
-        if new_time - self.last_time > 1.5:
-            # gp = self.dataset.graph_properties
-            # if gp.line2Dfit is not None:
-            #     self.parent.redraw_data_object_graphs([self.dataset])
-            # else:
-            #     self.parent.add_datasets_to_graphs([self.dataset])
-
-            self.elapsed = new_time - self.start
-            self.ui.timer.display(float(self.elapsed))
-            self.last_time = new_time
-
-            text = (
-                f"Chi2 : {self.objective.chisqr(xk)}\n"
-                f"Iterations : {self.iterations}"
-            )
+        self.worker.abort()
 
-            self.ui.values.setPlainText(text)
-            QtWidgets.QApplication.processEvents()
-            if self.abort_flag:
-                raise StopIteration("WARNING: FIT WAS TERMINATED EARLY", xk)
+    def update_elapsed(self):
+        self.elapsed = time.time() - self.start
+        self.ui.timer.display(float(self.elapsed))
 
-        return self.abort_flag
+    @QtCore.Slot(object, float, int)
+    def update_progress(self, xk, chi2, iterations):
+        self.chi2 = chi2
+        self.iterations = iterations
+        text = f"Chi2 : {chi2}\nIterations : {iterations}"
+        self.ui.values.setPlainText(text)
+
+    def hideEvent(self, event):
+        # closed, or rejected by the abort button
+        self._timer.stop()
+        super().hideEvent(event)
 
 
 class ProgramSettings:
@@ -2369,7 +2447,68 @@ class NavToolBar(NavigationToolbar):
         self.setIconSize(QtCore.QSize(20, 20))
 
 
-class MyReflectivityGraphs(FigureCanvas):
+class BlitCanvas(FigureCanvas):
+    """
+    A FigureCanvas that can redraw a few artists on their own.
+
+    Between :meth:`start_interaction` and :meth:`stop_interaction` the
+    artists are drawn over a cached copy of the rest of the figure (blitting),
+    which is much quicker than redrawing the whole figure.
+    """
+
+    def __init__(self, figure):
+        FigureCanvas.__init__(self, figure)
+        self._background = None
+        self._animated = []
+        self.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        # the figure has been completely redrawn (e.g. it was resized), so
+        # the cached background is out of date.
+        if self._animated:
+            self._background = self.copy_from_bbox(self.figure.bbox)
+            self._draw_animated()
+
+    def _draw_animated(self):
+        for a in self._animated:
+            self.figure.draw_artist(a)
+
+    @property
+    def interacting(self):
+        return bool(self._animated)
+
+    def start_interaction(self, artists):
+        """
+        Starts blitting `artists`, the only artists expected to change until
+        :meth:`stop_interaction` is called.
+        """
+        self._animated = [a for a in artists if a is not None]
+        for a in self._animated:
+            a.set_animated(True)
+        # draws everything else, the background is cached by _on_draw
+        self.draw()
+
+    def stop_interaction(self):
+        for a in self._animated:
+            a.set_animated(False)
+        self._animated = []
+        self._background = None
+        self.draw_idle()
+
+    def update_artists(self):
+        """
+        Shows the changes made to the figure, blitting if possible.
+        """
+        if self._background is None:
+            self.draw_idle()
+            return
+
+        self.restore_region(self._background)
+        self._draw_animated()
+        self.blit(self.figure.bbox)
+
+
+class MyReflectivityGraphs(BlitCanvas):
     """Ultimately, this is a QWidget (as well as a FigureCanvasAgg, etc.)."""
 
     def __init__(self, parent=None):
@@ -2394,7 +2533,7 @@ class MyReflectivityGraphs(FigureCanvas):
         #   self.axes[1].set_visible(True)
         #   self.axes[1].set_ylabel('residual')
 
-        FigureCanvas.__init__(self, self.figure)
+        BlitCanvas.__init__(self, self.figure)
         self.setParent(parent)
         self.figure.canvas.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
 
@@ -2500,7 +2639,15 @@ class MyReflectivityGraphs(FigureCanvas):
             graph_properties.save_graph_properties()
         self.draw()
 
-    def redraw_data_objects(self, data_objects, transform=None):
+    def redraw_data_objects(self, data_objects, transform=None, data=True):
+        """
+        Parameters
+        ----------
+        data_objects : list of DataObject
+        transform : callable, optional
+        data : bool, optional
+            Whether the datasets have changed, as well as the models.
+        """
         if not len(data_objects):
             return
 
@@ -2510,7 +2657,7 @@ class MyReflectivityGraphs(FigureCanvas):
 
             dataset = data_object.dataset
 
-            if data_object.name != "theoretical":
+            if data and data_object.name != "theoretical":
                 y = dataset.y
                 e = dataset.y_err
                 if transform is not None:
@@ -2525,7 +2672,7 @@ class MyReflectivityGraphs(FigureCanvas):
             graph_properties = data_object.graph_properties
             visible = graph_properties.visible
 
-            if graph_properties.ax_data is not None:
+            if data and graph_properties.ax_data is not None:
                 # ax_data is an ErrorbarContainer, so set everything
                 ebc = graph_properties.ax_data
                 errorbar_set_data(ebc, dataset.x, y, e)
@@ -2540,7 +2687,7 @@ class MyReflectivityGraphs(FigureCanvas):
         #                                          dataObject.residuals)
         #             dataObject.line2Dresiduals.set_visible(visible)
 
-        self.draw()
+        self.update_artists()
 
     def remove_trace(self, data_object):
         graph_properties = data_object.graph_properties
@@ -2558,7 +2705,7 @@ class MyReflectivityGraphs(FigureCanvas):
         self.draw()
 
 
-class MySLDGraphs(FigureCanvas):
+class MySLDGraphs(BlitCanvas):
     """Ultimately, this is a QWidget (as well as a FigureCanvasAgg, etc.)."""
 
     def __init__(self, parent=None):
@@ -2571,7 +2718,7 @@ class MySLDGraphs(FigureCanvas):
         self.axes[0].set_xlabel("z")
         self.axes[0].set_ylabel("SLD")
 
-        FigureCanvas.__init__(self, self.figure)
+        BlitCanvas.__init__(self, self.figure)
         self.setParent(parent)
         self.figure.subplots_adjust(left=0.1, right=0.95, top=0.98)
         self.mpl_toolbar = NavigationToolbar(self, parent)
@@ -2607,9 +2754,16 @@ class MySLDGraphs(FigureCanvas):
                     # have structure.sld_profile()
                     continue
 
+        # rescaling during an interaction would invalidate the background
+        if not self.interacting:
+            self.axes[0].relim()
+            self.axes[0].autoscale_view(None, True, True)
+        self.update_artists()
+
+    def stop_interaction(self):
         self.axes[0].relim()
         self.axes[0].autoscale_view(None, True, True)
-        self.draw()
+        super().stop_interaction()
 
     def add_data_objects(self, data_objects):
         for data_object in data_objects:
@@ -2703,6 +2857,20 @@ class OpenMenu(QtWidgets.QMenu):
             pass
 
 
+def _alters_structure(model, params):
+    """
+    Whether changing `params` alters the SLD profile of `model`. The
+    instrumental parameters (scale, background, resolution) don't.
+    """
+    if not params:
+        return True
+
+    instrumental = [
+        getattr(model, attr, None) for attr in ("scale", "bkg", "dq")
+    ]
+    return any(not any(param is p for p in instrumental) for param in params)
+
+
 def msg(text):
     # utility function for displaying a message
     msgBox = QtWidgets.QMessageBox()
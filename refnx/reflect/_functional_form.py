@@ -6,6 +6,7 @@ from refnx.analysis import (
     Parameters,
 )
 from refnx.reflect import Component, Structure, SLD
+from refnx.reflect.structure import _bracketed_slabs_key
 
 
 class FunctionalForm(Component):
@@ -90,6 +91,9 @@ class FunctionalForm(Component):
         p.extend(list(self.other_params.values()))
         return p
 
+    def _slabs_key(self, structure):
+        return _bracketed_slabs_key(self, structure)
+
     def slabs(self, structure=None):
         assert (
             structure is not None
@@ -21,6 +21,7 @@ DEALINGS IN THIS SOFTWARE.
 
 """
 
+import asyncio
 import time
 import datetime
 import pickle
@@ -59,6 +60,9 @@ class ReflectModelView(HasTraits):
     Observe the `view_redraw` traitlet to determine when a complete redraw
     of the view is required (because the number of widgets has changed for
     example).
+    The `structure_changed` attribute says whether the last change to a
+    widget value altered the structure, rather than an instrumental parameter
+    (scale, background, resolution) of the ReflectModel.
 
     """
 
@@ -81,6 +85,7 @@ class ReflectModelView(HasTraits):
         self.structure_view = StructureView(self.model.structure)
         self.last_selected_param = None
         self.param_widgets_link = {}
+        self.structure_changed = True
 
         slab_views = self.structure_view.slab_views
         slab_views[0].w_thick.disabled = True
@@ -228,6 +233,7 @@ class ReflectModelView(HasTraits):
                     # parameter
                     self._possibly_link_slider(change["owner"])
 
+                    self.structure_changed = False
                     self.view_changed = time.time()
                     break
                 elif loc == 1:
@@ -295,6 +301,7 @@ class ReflectModelView(HasTraits):
             self.view_redraw = time.time()
         else:
             self._possibly_link_slider(change["owner"].param_being_varied)
+            self.structure_changed = True
             self.view_changed = time.time()
 
     def _possibly_link_slider(self, change_owner):
@@ -798,6 +805,13 @@ class Motofit:
         self.qpnt = 1000
         self.fig = None
 
+        # parameter changes are coalesced, the plots are updated at most once
+        # every `update_interval` seconds.
+        self.update_interval = 0.025
+        self._update_handle = None
+        self._last_update = 0.0
+        self._sld_stale = True
+
         self.ax_data = None
         self.ax_residual = None
         self.ax_sld = None
@@ -970,7 +984,7 @@ class Motofit:
         self.model = model
 
         self.model_view = ReflectModelView(self.model)
-        self.model_view.observe(self.update_model, names=["view_changed"])
+        self.model_view.observe(self._schedule_update, names=["view_changed"])
         self.model_view.observe(self.redraw, names=["view_redraw"])
 
         # observe when the number of varying parameters changed. This
@@ -986,28 +1000,61 @@ class Motofit:
 
         self.redraw(None)
 
-    def update_model(self, change):
+    def _schedule_update(self, change):
+        """
+        Updates the plots when the parameters change. Rapid changes (e.g.
+        dragging the slider) are coalesced so that the plots are updated at
+        most once every `update_interval` seconds.
+        """
+        self._sld_stale |= self.model_view.structure_changed
+        if self._update_handle is not None:
+            # an update is already pending
+            return
+
+        wait = self._last_update + self.update_interval - time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # not running in a kernel with an event loop
+            loop = None
+
+        if wait > 0 and loop is not None:
+            self._update_handle = loop.call_later(wait, self._flush_update)
+        else:
+            self._flush_update()
+
+    def _flush_update(self):
+        self._update_handle = None
+        sld, self._sld_stale = self._sld_stale, False
+        self.update_model(None, sld=sld)
+
+    def update_model(self, change, sld=True):
         """
         Updates the plots when the parameters change
 
         Parameters
         ----------
         change
+        sld : bool, optional
+            Recalculate the SLD profile. It doesn't have to be recalculated
+            if only the instrumental parameters have changed.
 
         """
         if not self.fig:
             return
 
+        self._last_update = time.monotonic()
+
         q = np.linspace(self.qmin, self.qmax, self.qpnt)
         theoretical = self.model.model(q)
         yt, _ = self.transform(q, theoretical)
 
-        sld_profile = self.model.structure.sld_profile()
-        z, sld = sld_profile
         if self.theoretical_plot is not None:
             self.theoretical_plot.set_data(q, yt)
 
-            self.theoretical_plot_sld.set_data(z, sld)
+        if sld and self.theoretical_plot_sld is not None:
+            z, sld_profile = self.model.structure.sld_profile()
+            self.theoretical_plot_sld.set_data(z, sld_profile)
             self.ax_sld.relim()
             self.ax_sld.autoscale_view()
 
@@ -1021,7 +1068,9 @@ class Motofit:
             self.ax_residual.relim()
             self.ax_residual.autoscale_view()
 
-        self.fig.canvas.draw()
+        # only the line data has changed, let the backend coalesce the
+        # redraws.
+        self.fig.canvas.draw_idle()
 
     def _on_num_varying_changed(self, change):
         # observe when the number of varying parameters changed. This
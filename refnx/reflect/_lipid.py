@@ -11,6 +11,7 @@ from refnx.reflect.structure import (
     overall_sld,
     Scatterer,
     possibly_create_scatterer,
+    _slabs_key,
 )
 
 
@@ -232,6 +233,20 @@ class LipidLeaflet(Component):
         )
         return s
 
+    def _slabs_key(self, structure):
+        # the solvents (and guest) are held as attributes, their versions
+        # are tracked as well as those of the leaflet.
+        scatterers = [
+            sld
+            for sld in (
+                self.head_solvent,
+                self.tail_solvent,
+                getattr(self, "sld_guest", None),
+            )
+            if sld is not None
+        ]
+        return _slabs_key(structure, self, *scatterers)
+
     def slabs(self, structure=None):
         """
         Slab representation of monolayer, as an array
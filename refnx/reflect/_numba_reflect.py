@@ -1,7 +1,20 @@
+"""
+Reflectivity kernels compiled with numba.
+
+The kernels are compiled with ``parallel=True``, the loop over Q points (and
+for the vectorised kernels, the loop over slab representations as well) is
+spread across the numba thread pool. The number of threads is controlled by
+the `threads` argument of each function.
+"""
+
 import numba
 import numpy as np
 import cmath
 
+# addition of TINY is to ensure the correct branch cut
+# in the complex sqrt calculation of kn.
+TINY = 1e-30
+
 
 def numba_parratt(
     q,
@@ -10,73 +23,327 @@ def numba_parratt(
     bkg=0.0,
     threads=numba.config.NUMBA_DEFAULT_NUM_THREADS,
 ):
-    current_threads = numba.get_num_threads()
+    """
+    Parratt recursion for calculating reflectivity from a stratified medium.
+
+    Parameters
+    ----------
+    q : array_like
+        the q values required for the calculation.
+        Q = 4 * Pi / lambda * sin(omega).
+        Units = Angstrom**-1
+    slabs : np.ndarray
+        coefficients required for the calculation, has shape (2 + N, 4),
+        where N is the number of layers. See
+        :func:`refnx.reflect.reflectivity` for a description.
+    scale : float
+        Multiply all reflectivities by this value.
+    bkg : float
+        Linear background to be added to all reflectivities
+    threads : int, optional
+        How many threads you would like to use in the reflectivity
+        calculation. If `threads == -1` then the calculation is spread over
+        all the threads in the numba thread pool.
+
+    Returns
+    -------
+    Reflectivity : np.ndarray
+        Calculated reflectivity values for each q value.
+    """
+    return _calculate(_parratt_kernel, q, slabs, scale, bkg, threads)
+
+
+def numba_abeles(
+    q,
+    slabs,
+    scale=1.0,
+    bkg=0.0,
+    threads=numba.config.NUMBA_DEFAULT_NUM_THREADS,
+):
+    """
+    Abeles matrix formalism for calculating reflectivity from a stratified
+    medium.
+
+    Parameters
+    ----------
+    q : array_like
+        the q values required for the calculation.
+        Q = 4 * Pi / lambda * sin(omega).
+        Units = Angstrom**-1
+    slabs : np.ndarray
+        coefficients required for the calculation, has shape (2 + N, 4),
+        where N is the number of layers. See
+        :func:`refnx.reflect.reflectivity` for a description.
+    scale : float
+        Multiply all reflectivities by this value.
+    bkg : float
+        Linear background to be added to all reflectivities
+    threads : int, optional
+        How many threads you would like to use in the reflectivity
+        calculation. If `threads == -1` then the calculation is spread over
+        all the threads in the numba thread pool.
+
+    Returns
+    -------
+    Reflectivity : np.ndarray
+        Calculated reflectivity values for each q value.
+    """
+    return _calculate(_abeles_kernel, q, slabs, scale, bkg, threads)
+
+
+def numba_parratt_vectorised(q, slabs, scale=None, bkg=None, threads=-1):
+    """
+    Vectorised Parratt recursion for calculating reflectivity from a
+    stack of slab representations, see :func:`numba_abeles_vectorised`.
+    """
+    return _calculate_vectorised(
+        _parratt_kernel_2d, q, slabs, scale, bkg, threads
+    )
+
+
+def numba_abeles_vectorised(q, slabs, scale=None, bkg=None, threads=-1):
+    """
+    Vectorised Abeles matrix formalism for calculating reflectivity from a
+    stack of slab representations. Has the same signature as
+    :func:`refnx.reflect._creflect.abeles_vectorised`.
+
+    Parameters
+    ----------
+    q : array_like
+        the q values required for the calculation.
+        Q = 4 * Pi / lambda * sin(omega).
+        Units = Angstrom**-1
+    slabs : np.ndarray
+        coefficients required for the calculation, has shape (M, 2 + N, 4).
+        The calculation is vectorised over the M sets of film parameters, and
+        N is the number of layers in each film.
+    scale : array-like, optional
+        Multiply all reflectivities by this value, shape (M,).
+    bkg : array-like, optional
+        Linear background to be added to all reflectivities, shape (M,).
+    threads : int, optional
+        How many threads you would like to use in the reflectivity
+        calculation. If `threads == -1` then the calculation is spread over
+        all the threads in the numba thread pool.
+
+    Returns
+    -------
+    Reflectivity : np.ndarray
+        Calculated reflectivity values, shape `(M,) + q.shape`.
+    """
+    return _calculate_vectorised(
+        _abeles_kernel_2d, q, slabs, scale, bkg, threads
+    )
+
+
+def _num_threads(threads):
     if threads == -1:
         threads = numba.config.NUMBA_DEFAULT_NUM_THREADS
-    threads = np.clip(threads, 1, numba.config.NUMBA_DEFAULT_NUM_THREADS)
-    numba.set_num_threads(threads)
+    return int(np.clip(threads, 1, numba.config.NUMBA_DEFAULT_NUM_THREADS))
 
+
+def _calculate(fkernel, q, slabs, scale, bkg, threads):
     qvals = np.asarray(q).astype(float, copy=False)
-    flatq = np.ravel(qvals)
-    reflectivity = _numba_kernel(
-        flatq, slabs[:, 0], slabs[:, 1], slabs[:, 2], slabs[:, 3], scale, bkg
-    )
+    flatq = np.ascontiguousarray(np.ravel(qvals))
+    slabs = np.asarray(slabs, dtype=np.float64)
 
-    numba.set_num_threads(current_threads)
+    current_threads = numba.get_num_threads()
+    numba.set_num_threads(_num_threads(threads))
+    try:
+        reflectivity = fkernel(
+            flatq,
+            np.ascontiguousarray(slabs[:, 0]),
+            np.ascontiguousarray(slabs[:, 1]),
+            np.ascontiguousarray(slabs[:, 2]),
+            np.ascontiguousarray(slabs[:, 3]),
+            float(scale),
+            float(bkg),
+        )
+    finally:
+        numba.set_num_threads(current_threads)
 
     return np.reshape(reflectivity, qvals.shape)
 
 
-@numba.jit(
-    numba.float64[:](
-        numba.float64[:],
-        numba.float64[:],
-        numba.float64[:],
-        numba.float64[:],
-        numba.float64[:],
-        numba.float64,
-        numba.float64,
-    ),
-    nopython=True,
-    parallel=False,
-    cache=True,
-)
-def _numba_kernel(q, d, sldr, sldi, sigma, scale, bkg):
-    nlayers = d.shape[0] - 2
-    points = q.shape[0]
+def _calculate_vectorised(fkernel, q, slabs, scale, bkg, threads):
+    qvals = np.asarray(q).astype(float, copy=False)
+    flatq = np.ascontiguousarray(np.ravel(qvals))
+    slabs = np.ascontiguousarray(slabs, dtype=np.float64)
+    nbatch = slabs.shape[0]
+
+    if scale is None:
+        scale = np.ones(nbatch)
+    if bkg is None:
+        bkg = np.zeros(nbatch)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (nbatch,))
+    bkg = np.broadcast_to(np.asarray(bkg, dtype=np.float64), (nbatch,))
+
+    current_threads = numba.get_num_threads()
+    numba.set_num_threads(_num_threads(threads))
+    try:
+        reflectivity = fkernel(
+            flatq,
+            slabs,
+            np.ascontiguousarray(scale),
+            np.ascontiguousarray(bkg),
+        )
+    finally:
+        numba.set_num_threads(current_threads)
+
+    return np.reshape(reflectivity, (nbatch,) + qvals.shape)
 
-    R = np.empty_like(q)
 
-    sld = 1j * (np.abs(sldi) + 1e-30)
-    sld += sldr - sldr[0]
+@numba.njit(cache=True)
+def _sld(sldr, sldi):
+    # SLD of each layer relative to the fronting medium, * 4 * pi
+    sld = np.empty(sldr.shape[0], dtype=np.complex128)
+    for i in range(sldr.shape[0]):
+        sld[i] = (sldr[i] - sldr[0]) + 1j * (np.abs(sldi[i]) + TINY)
+        sld[i] *= np.pi * 4e-6
     sld[0] = 0.0
-    sld *= np.pi * 4e-6
+    return sld
 
-    for qi in numba.prange(points):
-        q2 = 0.25 * q[qi] ** 2
-        kn = cmath.sqrt(q2 - sld[-2])
-        kn_next = cmath.sqrt(q2 - sld[-1])
+
+@numba.njit(cache=True)
+def _parratt(q, d, sld, sigma, nlayers):
+    q2 = 0.25 * q**2
+    kn = cmath.sqrt(q2 - sld[nlayers])
+    kn_next = cmath.sqrt(q2 - sld[nlayers + 1])
+    # Fresnel reflectivity for the interfaces
+    RRJ = RRJ_1 = (
+        (kn - kn_next)
+        / (kn + kn_next)
+        * cmath.exp(-2.0 * kn * kn_next * sigma[nlayers + 1] ** 2)
+    )
+
+    kn_next = kn
+    for lj in range(nlayers - 1, -1, -1):
+        kn = cmath.sqrt(q2 - sld[lj])
         # Fresnel reflectivity for the interfaces
-        RRJ = RRJ_1 = (
+        rj = (
             (kn - kn_next)
             / (kn + kn_next)
-            * cmath.exp(-2.0 * kn * kn_next * sigma[-1] ** 2)
+            * cmath.exp(-2.0 * kn * kn_next * sigma[lj + 1] ** 2)
         )
+        beta = cmath.exp(-2.0j * kn_next * d[lj + 1])
 
+        RRJ = (rj + RRJ_1 * beta) / (1.0 + RRJ_1 * beta * rj)
+        RRJ_1 = RRJ
         kn_next = kn
-        for lj in range(nlayers - 1, -1, -1):
-            kn = cmath.sqrt(q2 - sld[lj])
-            # Fresnel reflectivity for the interfaces
-            rj = (
-                (kn - kn_next)
-                / (kn + kn_next)
-                * cmath.exp(-2.0 * kn * kn_next * sigma[lj + 1] ** 2)
-            )
-            beta = cmath.exp(-2.0j * kn_next * d[lj + 1])
-
-            RRJ = (rj + RRJ_1 * beta) / (1.0 + RRJ_1 * beta * rj)
-            RRJ_1 = RRJ
-            kn_next = kn
-
-        R[qi] = bkg + scale * np.abs(RRJ) ** 2
+
+    return RRJ.real**2 + RRJ.imag**2
+
+
+@numba.njit(cache=True)
+def _abeles(q, d, sld, sigma, nlayers):
+    q2 = 0.25 * q**2
+    kn = cmath.sqrt(q2 - sld[0])
+    kn_next = cmath.sqrt(q2 - sld[1])
+    rj = (
+        (kn - kn_next)
+        / (kn + kn_next)
+        * cmath.exp(-2.0 * kn * kn_next * sigma[1] ** 2)
+    )
+
+    # characteristic matrix of the fronting medium
+    mrtot00 = 1.0 + 0j
+    mrtot01 = rj
+    mrtot10 = rj
+    mrtot11 = 1.0 + 0j
+
+    kn = kn_next
+    for lj in range(1, nlayers + 1):
+        kn_next = cmath.sqrt(q2 - sld[lj + 1])
+        rj = (
+            (kn - kn_next)
+            / (kn + kn_next)
+            * cmath.exp(-2.0 * kn * kn_next * sigma[lj + 1] ** 2)
+        )
+        beta = cmath.exp(1j * kn * abs(d[lj]))
+
+        mi00 = beta
+        mi11 = 1.0 / beta
+        mi10 = rj * mi00
+        mi01 = rj * mi11
+
+        # matrix multiply mrtot by characteristic matrix
+        p0 = mrtot00 * mi00 + mrtot10 * mi01
+        p1 = mrtot00 * mi10 + mrtot10 * mi11
+        mrtot00 = p0
+        mrtot10 = p1
+
+        p0 = mrtot01 * mi00 + mrtot11 * mi01
+        p1 = mrtot01 * mi10 + mrtot11 * mi11
+        mrtot01 = p0
+        mrtot11 = p1
+
+        kn = kn_next
+
+    r = mrtot01 / mrtot00
+    return r.real**2 + r.imag**2
+
+
+@numba.njit(parallel=True, cache=True)
+def _parratt_kernel(q, d, sldr, sldi, sigma, scale, bkg):
+    nlayers = d.shape[0] - 2
+    sld = _sld(sldr, sldi)
+
+    R = np.empty_like(q)
+    for qi in numba.prange(q.shape[0]):
+        R[qi] = bkg + scale * _parratt(q[qi], d, sld, sigma, nlayers)
+    return R
+
+
+@numba.njit(parallel=True, cache=True)
+def _abeles_kernel(q, d, sldr, sldi, sigma, scale, bkg):
+    nlayers = d.shape[0] - 2
+    sld = _sld(sldr, sldi)
+
+    R = np.empty_like(q)
+    for qi in numba.prange(q.shape[0]):
+        R[qi] = bkg + scale * _abeles(q[qi], d, sld, sigma, nlayers)
+    return R
+
+
+@numba.njit(parallel=True, cache=True)
+def _parratt_kernel_2d(q, slabs, scale, bkg):
+    nbatch = slabs.shape[0]
+    nlayers = slabs.shape[1] - 2
+    points = q.shape[0]
+
+    sld = np.empty((nbatch, nlayers + 2), dtype=np.complex128)
+    for i in range(nbatch):
+        sld[i] = _sld(slabs[i, :, 1], slabs[i, :, 2])
+
+    # a single parallel loop over structures and Q points, so that the
+    # work is spread evenly no matter what the shape of the problem is.
+    R = np.empty((nbatch, points))
+    for idx in numba.prange(nbatch * points):
+        i = idx // points
+        qi = idx % points
+        R[i, qi] = bkg[i] + scale[i] * _parratt(
+            q[qi], slabs[i, :, 0], sld[i], slabs[i, :, 3], nlayers
+        )
+    return R
+
+
+@numba.njit(parallel=True, cache=True)
+def _abeles_kernel_2d(q, slabs, scale, bkg):
+    nbatch = slabs.shape[0]
+    nlayers = slabs.shape[1] - 2
+    points = q.shape[0]
+
+    sld = np.empty((nbatch, nlayers + 2), dtype=np.complex128)
+    for i in range(nbatch):
+        sld[i] = _sld(slabs[i, :, 1], slabs[i, :, 2])
+
+    # a single parallel loop over structures and Q points, so that the
+    # work is spread evenly no matter what the shape of the problem is.
+    R = np.empty((nbatch, points))
+    for idx in numba.prange(nbatch * points):
+        i = idx // points
+        qi = idx % points
+        R[i, qi] = bkg[i] + scale[i] * _abeles(
+            q[qi], slabs[i, :, 0], sld[i], slabs[i, :, 3], nlayers
+        )
     return R
@@ -725,6 +725,26 @@ class CompiledObjective:
         values back into the stateful object graph after optimisation.
     n_free : int
         Number of free parameters.
+    logl_batch : Callable[[jnp.ndarray], jnp.ndarray]
+        ``jax.vmap``-ed twin of ``logl``, ``free_2d -> logl`` where
+        ``free_2d`` has shape ``(M, n_free)`` and the result has shape
+        ``(M,)``. Evaluates e.g. all the walkers of an MCMC ensemble in a
+        single XLA call. JIT-compiled; a new ``M`` triggers a
+        re-compilation.
+    generative_batch : Callable[[jnp.ndarray], jnp.ndarray]
+        ``jax.vmap``-ed twin of ``generative``, ``free_2d -> R`` with shape
+        ``(M, N)``. JIT-compiled.
+    hvp_logl : Callable[[jnp.ndarray, jnp.ndarray], jnp.ndarray]
+        Hessian-vector product of ``logl``, ``(free, v) -> H(free) @ v``,
+        evaluated by forward-over-reverse differentiation without forming
+        the Hessian. JIT-compiled.
+
+    Notes
+    -----
+    ``abeles_jax_ffi`` does not support ``jax.vmap`` or forward-mode AD, so
+    the batched functions and ``hvp_logl`` are always built from the
+    pure-JAX ``jabeles`` kernel (the same forward model as
+    ``generative_fwd``).
     """
 
     logl: Callable
@@ -737,6 +757,9 @@ class CompiledObjective:
     param_names: List[str]
     setp: Callable
     n_free: int
+    logl_batch: Optional[Callable] = None
+    generative_batch: Optional[Callable] = None
+    hvp_logl: Optional[Callable] = None
 
 
 def _compile_single(
@@ -767,6 +790,9 @@ def _compile_single(
     -------
     logl_raw : Callable[[jnp.ndarray], jnp.ndarray]
         Pure JAX log-likelihood, not yet JIT-compiled.
+    logl_fwd_raw : Callable[[jnp.ndarray], jnp.ndarray]
+        Twin of ``logl_raw`` built on ``generative_fwd_raw``. Unlike
+        ``logl_raw`` it can be used with ``jax.vmap``. Not yet JIT-compiled.
     generative_raw : Callable[[jnp.ndarray], jnp.ndarray]
         Pure JAX forward model ``free -> R(q)``, not yet JIT-compiled.
     generative_fwd_raw : Callable[[jnp.ndarray], jnp.ndarray]
@@ -878,6 +904,14 @@ def _compile_single(
         lnsigma_node,
         use_weights=objective.weighted,
     )
+    # ... and the jabeles twin, used for the batched (vmapped) functions.
+    logl_fwd_raw = _make_logl(
+        generative_fwd_raw,
+        y,
+        y_err,
+        lnsigma_node,
+        use_weights=objective.weighted,
+    )
 
     # ------------------------------------------------------------------
     # model.logp() and logp_extra
@@ -896,6 +930,7 @@ def _compile_single(
     if _logp_is_trivial:
         return (
             logl_raw,
+            logl_fwd_raw,
             generative_raw,
             generative_fwd_raw,
             params_to_slabs_fn,
@@ -929,6 +964,7 @@ def _compile_single(
 
     return (
         logl_raw,
+        logl_fwd_raw,
         generative_raw,
         generative_fwd_raw,
         params_to_slabs_fn,
@@ -1006,6 +1042,7 @@ def compile_objective(
     # ------------------------------------------------------------------
     (
         logl_raw,
+        logl_fwd_raw,
         generative_raw,
         generative_fwd_raw,
         params_to_slabs_fn,
@@ -1016,6 +1053,11 @@ def compile_objective(
     grad_jit = jax.jit(jax.grad(logl_raw))
     val_and_grad_jit = jax.jit(jax.value_and_grad(logl_raw))
 
+    # batched variants, vmapped over the jabeles twins
+    logl_batch_jit = _batched_logl(
+        jax.jit(jax.vmap(logl_fwd_raw)), [(1.0, extra_potential)]
+    )
+
     if extra_potential is not None:
         # Compose the extra potential outside the JIT boundary.
         # Convert free to a concrete numpy array before any call so that
@@ -1051,6 +1093,9 @@ def compile_objective(
         param_names=param_names,
         setp=setp,
         n_free=len(var_params),
+        logl_batch=logl_batch_jit,
+        generative_batch=jax.jit(jax.vmap(generative_fwd_raw)),
+        hvp_logl=_make_hvp(logl_fwd_raw),
     )
 
 
@@ -1129,6 +1174,7 @@ def compile_global_objective(
     #     the XLA graph) because GlobalObjective.lambdas are plain floats.
     # ------------------------------------------------------------------
     weighted_logl_fns: List[tuple] = []  # (lam, logl_raw) — all pure JAX
+    weighted_logl_fwd_fns: List[tuple] = []  # (lam, logl_fwd_raw)
     extra_potential_fns: List[tuple] = (
         []
     )  # (lam, extra_potential) — Python only
@@ -1136,10 +1182,16 @@ def compile_global_objective(
     generative_fwd_fns: List[Callable] = []
 
     for obj, lam in zip(global_objective.objectives, global_objective.lambdas):
-        logl_i, generative_i, generative_fwd_i, _, extra_i = _compile_single(
-            obj, compiler, reflect_fn=reflect_fn
-        )
+        (
+            logl_i,
+            logl_fwd_i,
+            generative_i,
+            generative_fwd_i,
+            _,
+            extra_i,
+        ) = _compile_single(obj, compiler, reflect_fn=reflect_fn)
         weighted_logl_fns.append((float(lam), logl_i))
+        weighted_logl_fwd_fns.append((float(lam), logl_fwd_i))
         if extra_i is not None:
             extra_potential_fns.append((float(lam), extra_i))
         generative_fns.append(generative_i)
@@ -1157,6 +1209,16 @@ def compile_global_objective(
     grad_jit = jax.jit(jax.grad(logl_global))
     val_and_grad_jit = jax.jit(jax.value_and_grad(logl_global))
 
+    def logl_fwd_global(free: jnp.ndarray) -> jnp.ndarray:
+        total = jnp.zeros((), dtype=jnp.float64)
+        for lam, fn in weighted_logl_fwd_fns:
+            total = total + lam * fn(free)
+        return total
+
+    logl_batch_jit = _batched_logl(
+        jax.jit(jax.vmap(logl_fwd_global)), extra_potential_fns
+    )
+
     if extra_potential_fns:
         # Wrap the JIT-compiled functions to add the extra Python terms
         # outside the XLA boundary.  Gradient of extra terms is zero.
@@ -1208,15 +1270,61 @@ def compile_global_objective(
         param_names=param_names,
         setp=setp,
         n_free=len(var_params),
+        logl_batch=logl_batch_jit,
+        generative_batch=jax.jit(jax.vmap(generative_fwd_global)),
+        hvp_logl=_make_hvp(logl_fwd_global),
     )
 
 
+def _make_hvp(logl_fwd: Callable) -> Callable:
+    """
+    JIT-compiled Hessian-vector product, ``(free, v) -> H(free) @ v``, of a
+    forward-mode compatible log-likelihood. The extra potential terms are
+    treated as constants, as they are for ``grad_logl``.
+    """
+
+    def hvp(free: jnp.ndarray, v: jnp.ndarray) -> jnp.ndarray:
+        return jax.jvp(jax.grad(logl_fwd), (free,), (v,))[1]
+
+    return jax.jit(hvp)
+
+
+def _batched_logl(logl_batch_jit: Callable, extra_potential_fns) -> Callable:
+    """
+    Adds the Python-only extra potential terms (if any) to a vmapped,
+    JIT-compiled, log-likelihood. The extra terms are evaluated one row at a
+    time, outside the XLA boundary.
+
+    Parameters
+    ----------
+    logl_batch_jit : Callable
+        ``free_2d -> logl`` for the pure JAX terms.
+    extra_potential_fns : list of (float, Callable or None)
+        ``(lambda, extra_potential)`` pairs.
+    """
+    extra_potential_fns = [
+        (lam, fn) for lam, fn in extra_potential_fns if fn is not None
+    ]
+    if not extra_potential_fns:
+        return logl_batch_jit
+
+    def logl_batch(free_2d):
+        free_np = np.atleast_2d(np.asarray(free_2d, dtype=np.float64))
+        val = np.array(logl_batch_jit(free_np), dtype=np.float64)
+        for i, free in enumerate(free_np):
+            for lam, fn in extra_potential_fns:
+                val[i] += lam * fn(free)
+        return val
+
+    return logl_batch
+
+
 # ---------------------------------------------------------------------------
 # Convenience: scipy-compatible (nll, grad) wrapper for L-BFGS-B etc.
 # ---------------------------------------------------------------------------
 
 
-def make_scipy_objective(compiled: CompiledObjective):
+def make_scipy_objective(compiled: CompiledObjective, hessp: bool = False):
     """
     Build a scipy-compatible ``(nll_fn, grad_fn)`` pair suitable for::
 
@@ -1227,6 +1335,10 @@ def make_scipy_objective(compiled: CompiledObjective):
     compiled : CompiledObjective
         A compiled objective, as returned by ``compile_objective`` or
         ``compile_global_objective``.
+    hessp : bool, optional
+        Also return the Hessian-vector product of ``nll_fn``, for the
+        ``hessp`` argument of ``scipy.optimize.minimize`` (e.g. with
+        ``method='trust-constr'``).
 
     Returns
     -------
@@ -1234,8 +1346,11 @@ def make_scipy_objective(compiled: CompiledObjective):
         Negative log-likelihood as a function of the free-parameter vector.
     grad_fn : Callable[[np.ndarray], np.ndarray]
         Gradient of ``nll_fn`` with respect to the free-parameter vector.
+    hessp_fn : Callable[[np.ndarray, np.ndarray], np.ndarray]
+        Only returned if `hessp` is True. ``hessp_fn(x, p)`` is the product
+        of the Hessian of ``nll_fn`` at ``x`` with the vector ``p``.
 
-    Both functions accept and return plain ``np.ndarray`` (float64).
+    All functions accept and return plain ``np.ndarray`` (float64).
     """
     val_grad = compiled.value_and_grad
 
@@ -1247,4 +1362,15 @@ def make_scipy_objective(compiled: CompiledObjective):
         _, g = val_grad(jnp.array(x, dtype=jnp.float64))
         return np.array(-g, dtype=np.float64)
 
-    return nll, grad_nll
+    if not hessp:
+        return nll, grad_nll
+
+    hvp = compiled.hvp_logl
+
+    def hessp_nll(x: np.ndarray, p: np.ndarray) -> np.ndarray:
+        hv = hvp(
+            jnp.array(x, dtype=jnp.float64), jnp.array(p, dtype=jnp.float64)
+        )
+        return np.array(-hv, dtype=np.float64)
+
+    return nll, grad_nll, hessp_nll
@@ -24,16 +24,24 @@ DEALINGS IN THIS SOFTWARE.
 
 """
 
+from collections import OrderedDict
 from contextlib import contextmanager
 import time
 from functools import lru_cache
 import numbers
+import threading
 import warnings
+import weakref
 from enum import Enum
 
 import numpy as np
 import scipy
-from scipy.interpolate import splrep, splev
+import scipy.ndimage
+import scipy.fft
+import scipy.interpolate
+import scipy.sparse
+import scipy.sparse.linalg
+import scipy.special
 
 
 from refnx.analysis import (
@@ -42,6 +50,8 @@ from refnx.analysis import (
     possibly_create_parameter,
     Transform,
 )
+from refnx.analysis.parameter import _revision
+from refnx._lib import flatten, unique as f_unique
 from refnx.util import general
 
 try:
@@ -56,6 +66,65 @@ except ImportError:
 _FWHM = 2 * np.sqrt(2 * np.log(2.0))
 _INTLIMIT = 3.5
 
+# 7-point Gauss / 15-point Kronrod rule, used for adaptive smearing
+_GK15_NODES = np.array(
+    [
+        -0.991455371120812639206854697526329,
+        -0.949107912342758524526189684047851,
+        -0.864864423359769072789712788640926,
+        -0.741531185599394439863864773280788,
+        -0.586087235467691130294144845693013,
+        -0.405845151377397166906606412076961,
+        -0.207784955007898467600689403773245,
+        0.0,
+        0.207784955007898467600689403773245,
+        0.405845151377397166906606412076961,
+        0.586087235467691130294144845693013,
+        0.741531185599394439863864773280788,
+        0.864864423359769072789712788640926,
+        0.949107912342758524526189684047851,
+        0.991455371120812639206854697526329,
+    ]
+)
+_GK15_KRONROD_WEIGHTS = np.array(
+    [
+        0.022935322010529224963732008058970,
+        0.063092092629978553290700663189204,
+        0.104790010322250183839876322541518,
+        0.140653259715525918745189590510238,
+        0.169004726639267902826583426598550,
+        0.190350578064785409913256402421014,
+        0.204432940075298892414161999234649,
+        0.209482141084727828012999174891714,
+        0.204432940075298892414161999234649,
+        0.190350578064785409913256402421014,
+        0.169004726639267902826583426598550,
+        0.140653259715525918745189590510238,
+        0.104790010322250183839876322541518,
+        0.063092092629978553290700663189204,
+        0.022935322010529224963732008058970,
+    ]
+)
+_GK15_GAUSS_WEIGHTS = np.array(
+    [
+        0.0,
+        0.129484966168869693270611432679082,
+        0.0,
+        0.279705391489276667901467771423780,
+        0.0,
+        0.381830050505118944950369775488975,
+        0.0,
+        0.417959183673469387755102040816327,
+        0.0,
+        0.381830050505118944950369775488975,
+        0.0,
+        0.279705391489276667901467771423780,
+        0.0,
+        0.129484966168869693270611432679082,
+        0.0,
+    ]
+)
+
 
 """
 Implementation notes
@@ -128,6 +197,7 @@ def available_backends():
     try:
         from refnx.reflect import _numba_reflect as _nr
 
+        backends.append("numba")
         backends.append("numba_parratt")
     except ImportError:
         pass
@@ -168,7 +238,8 @@ def get_reflect_backend(backend="c"):
     Parameters
     ----------
     backend : {'python', 'cython', 'c', 'pyopencl', 'py_parratt', 'c_parratt',
-              'numba_parratt', 'abeles_vectorised', 'jax', 'torch'}
+              'numba', 'numba_parratt', 'abeles_vectorised',
+              'numba_vectorised', 'jax', 'torch'}
         The module that calculates the reflectivity. Speed should go in the
         order:
         numba_parratt > c_parratt > c > pyopencl / cython > py_parratt > python.
@@ -176,6 +247,7 @@ def get_reflect_backend(backend="c"):
         If a particular method is not available the function falls back:
         cython/pyopencl --> c --> --> python.
         c_parratt --> py_parratt.
+        numba --> c.
 
     Returns
     -------
@@ -193,6 +265,9 @@ def get_reflect_backend(backend="c"):
     calculated simultaneously. As such, it requires a 3-dimensional array for
     specification of the slabs. It is not a 1:1 replacement for the other
     kernels.
+    'numba' and 'numba_parratt' spread the calculation over the numba thread
+    pool. 'numba_vectorised' is the numba equivalent of 'abeles_vectorised',
+    and parallelises over both the slab sets and the Q points.
     """
     backend = backend.lower()
     match backend:
@@ -244,6 +319,30 @@ def get_reflect_backend(backend="c"):
                 warnings.warn("Can't use the C abeles backend")
                 return get_reflect_backend("python")
 
+        case "numba":
+            try:
+                from refnx.reflect._numba_reflect import numba_abeles
+
+                return numba_abeles
+            except ImportError:
+                warnings.warn(
+                    "Can't use the numba backend, requires numba be installed"
+                )
+                return get_reflect_backend("c")
+
+        case "numba_vectorised":
+            try:
+                from refnx.reflect._numba_reflect import (
+                    numba_abeles_vectorised,
+                )
+
+                return numba_abeles_vectorised
+            except ImportError:
+                raise ValueError(
+                    "Can't use the numba_vectorised backend, requires numba be"
+                    " installed"
+                )
+
         case "numba_parratt":
             try:
                 from refnx.reflect._numba_reflect import numba_parratt
@@ -318,7 +417,8 @@ def use_reflect_backend(backend="c"):
     Parameters
     ----------
     backend : {'python', 'cython', 'c', 'pyopencl', 'py_parratt', 'c_parratt',
-              'numba_parratt', 'abeles_vectorised'}, str
+              'numba', 'numba_parratt', 'abeles_vectorised',
+              'numba_vectorised'}, str
         The function that calculates the reflectivity. Speed should go in the
         order: numba_parratt > c_parratt > c > pyopencl / cython > python. If a
         particular method is not available the function falls back to another
@@ -349,6 +449,420 @@ def use_reflect_backend(backend="c"):
     kernel = f
 
 
+class KernelMemo:
+    """
+    Shares reflectivity calculations between models that use the same
+    Structure and Q values, see :func:`kernel_memo`.
+
+    Attributes
+    ----------
+    hits : int
+        Number of calculations that were shared.
+    misses : int
+        Number of calculations that had to be performed.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._revision = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"KernelMemo(hits={self.hits}, misses={self.misses})"
+
+    def clear(self):
+        """
+        Discards the memoised calculations and resets the counters.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._revision = None
+            self._entries.clear()
+
+    def _lookup(self, key, arrays, calculate):
+        """
+        Returns the memoised value for `key`, or stores the output of
+        `calculate()`. `arrays` are the arrays the calculation depends on,
+        these are checked for equality as well.
+        """
+        revision = _revision()
+        with self._lock:
+            if revision != self._revision:
+                # parameter values have changed, a new evaluation
+                self._entries.clear()
+                self._revision = revision
+            entry = self._entries.get(key)
+            if entry is not None and all(
+                np.array_equal(a, b) for a, b in zip(entry[0], arrays)
+            ):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = calculate()
+        with self._lock:
+            if revision == self._revision:
+                self._entries[key] = (
+                    tuple(np.array(a, copy=True) for a in arrays),
+                    value,
+                )
+        return value
+
+
+# the active KernelMemo of each thread, see `kernel_memo`
+_kernel_memo = threading.local()
+
+
+def _active_kernel_memo():
+    return getattr(_kernel_memo, "memo", None)
+
+
+@contextmanager
+def kernel_memo():
+    """
+    Context manager that shares reflectivity calculations within each
+    evaluation of a likelihood.
+
+    Models often share a Structure, e.g. several objectives in a
+    :class:`refnx.analysis.GlobalObjective` that wrap the same Structure
+    with a different scale/bkg, or the same Structure appearing in a
+    :class:`MixedReflectModel` and a :class:`ReflectModel`. Whilst the
+    context is active the (resolution smeared) reflectivity of a
+    Structure is memoised, keyed on the identity of the Structure and Q
+    values, the resolution settings, and the version of the Parameter
+    values. The memo is discarded whenever a Parameter value changes.
+    The Q values (and resolution) are compared by value, so objectives
+    that hold separate copies of the same dataset also share calculations.
+
+    The memo is only active in the thread that entered the context, so
+    each thread can use (and nest) its own. Objectives evaluated by the
+    threads of a :class:`refnx.analysis.GlobalObjective` with `workers > 1`
+    don't use the memo.
+
+    Yields
+    ------
+    memo : KernelMemo
+        Records the number of calculations that were shared (`hits`) and
+        performed (`misses`).
+
+    Examples
+    --------
+
+    >>> from refnx.reflect import kernel_memo
+    >>> # `global_objective` contains several objectives sharing a Structure
+    >>> with kernel_memo() as memo:
+    ...     global_objective.logl()
+    >>> print(memo.hits, memo.misses)
+    """
+    previous = _active_kernel_memo()
+    memo = KernelMemo()
+    _kernel_memo.memo = memo
+    try:
+        yield memo
+    finally:
+        _kernel_memo.memo = previous
+
+
+def _shared_reflectivity(
+    structure,
+    slabs,
+    q,
+    dq,
+    quad_order,
+    threads,
+    q_offset,
+    dq_engine="spline",
+):
+    """
+    Unscaled reflectivity of `structure`, shared through the active
+    `KernelMemo`.
+    """
+
+    def calculate():
+        return reflectivity(
+            q,
+            slabs,
+            dq=dq,
+            threads=threads,
+            quad_order=quad_order,
+            q_offset=q_offset,
+            dq_engine=dq_engine,
+        )
+
+    memo = _active_kernel_memo()
+    if memo is None:
+        return calculate()
+
+    # objectives make their own copies of a dataset, so Q/dQ arrays are
+    # identified by a fingerprint, and then compared in full.
+    def fingerprint(a):
+        a = np.asarray(a)
+        if not a.size:
+            return a.shape
+        return a.shape, a.flat[0], a.flat[-1]
+
+    q_offset = float(q_offset)
+    arrays = (slabs, q)
+    if isinstance(dq, numbers.Real):
+        dq_key = float(dq)
+    else:
+        dq_key = fingerprint(dq)
+        arrays += (dq,)
+    if isinstance(quad_order, (numbers.Integral, str)):
+        quad_key = quad_order
+    else:
+        # an _AutoQuadrature belonging to a model
+        quad_key = id(quad_order)
+
+    key = (
+        id(structure),
+        fingerprint(q),
+        dq_key,
+        quad_key,
+        q_offset,
+        dq_engine,
+        id(kernel),
+    )
+    return memo._lookup(key, arrays, calculate)
+
+
+# JAX compiled models used by `ReflectModel.jacobian`. Kept out of the
+# ReflectModel instances so that they remain picklable.
+_compiled_reflect_models = weakref.WeakKeyDictionary()
+
+
+def _compiled_reflect_model(model):
+    """
+    The :class:`refnx.reflect.extra.CompiledModel` for a ReflectModel. The
+    compilation is reused until the Structure, or which Parameters
+    vary/are constrained, changes.
+    """
+    try:
+        from jax import config
+        from refnx.reflect.extra import compile_model
+    except ImportError as e:
+        raise NotImplementedError("The analytic Jacobian requires jax") from e
+
+    if not config.jax_enable_x64:
+        raise NotImplementedError(
+            "The analytic Jacobian requires 64-bit floats to be enabled in jax"
+        )
+
+    structure = model.structure
+    key = (
+        tuple(
+            (id(p), p.vary, id(p.constraint))
+            for p in f_unique(flatten(model.parameters))
+        ),
+        tuple(id(c) for c in structure.components),
+        id(structure._solvent),
+        structure.reverse_structure,
+        model.quad_order,
+    )
+    cached = _compiled_reflect_models.get(model)
+    if cached is None or cached[0] != key:
+        try:
+            compiled = compile_model(model)
+        except Exception as e:
+            raise NotImplementedError(
+                f"{structure!r} can't be compiled with jax"
+            ) from e
+        cached = (key, compiled)
+        _compiled_reflect_models[model] = cached
+
+    return cached[1]
+
+
+def _accumulate(derivatives, parameter, derivative):
+    # a Parameter can appear in several places in a model
+    key = id(parameter)
+    if key in derivatives:
+        derivatives[key] = derivatives[key] + derivative
+    else:
+        derivatives[key] = derivative
+
+
+def _abeles_grad_kernel(q, w, threads=-1):
+    """
+    Kernel returning the reflectivity and its derivatives with respect to
+    the slab representation, calculated by `_creflect.abeles_grad`.
+    Resolution smearing is linear, so the smearing plans can be applied to
+    all of them at once.
+
+    Returns
+    -------
+    stack : np.ndarray
+        Shape ``(1 + w.size,) + q.shape``. ``stack[0]`` is the reflectivity
+        (unit scale factor, zero background) and ``stack[1:]`` are its
+        derivatives with respect to ``w.ravel()``.
+    """
+    from refnx.reflect._creflect import abeles_grad
+
+    q = np.ascontiguousarray(q, dtype=np.float64)
+    R, dR = abeles_grad(q, w, threads=threads)
+    dR = np.moveaxis(np.reshape(dR, q.shape + (-1,)), -1, 0)
+    return np.concatenate((R[np.newaxis], dR))
+
+
+def _slab_derivatives(structure, dslabs):
+    """
+    Chain rule from derivatives with respect to the slab representation of a
+    Structure to derivatives with respect to its Parameters.
+
+    Only Structures made from :class:`Slab` components, with :class:`SLD`
+    scatterers and default interfaces, are supported.
+
+    Parameters
+    ----------
+    structure : refnx.reflect.Structure
+        The Structure
+    dslabs : np.ndarray
+        Derivatives with respect to ``structure.slabs()[:, :4]``, has shape
+        ``(len(structure), 4, M)``.
+
+    Returns
+    -------
+    derivatives : dict
+        Maps ``id(parameter)`` to the derivative with respect to that
+        Parameter, shape ``(M,)``.
+
+    Raises
+    ------
+    NotImplementedError
+        If the Structure contains anything other than plain Slabs.
+    """
+    from refnx.reflect.structure import Slab, SLD
+
+    components = structure.components
+    solvent = structure._solvent
+    if (
+        any(type(c) is not Slab or type(c.sld) is not SLD for c in components)
+        or any(i is not None for i in flatten(structure.interfaces))
+        or structure.contract > 0
+        or (solvent is not None and type(solvent) is not SLD)
+    ):
+        raise NotImplementedError(
+            "Derivatives can only be calculated for Structures made from"
+            " Slabs"
+        )
+
+    # the slab row holding the thickness/SLD of each component, and the row
+    # holding its roughness. If the structure is reversed the roughness of
+    # the first component isn't used (row n).
+    n = len(components)
+    rows = np.arange(n)
+    rough_rows = np.arange(n)
+    if structure.reverse_structure:
+        rows = rows[::-1]
+        rough_rows = n - rough_rows
+
+    # the solvent defaults to the backing medium, which is the last row
+    if solvent is None:
+        solvent = components[int(np.argmax(rows))].sld
+    solv = complex(solvent)
+
+    zero = np.zeros(dslabs.shape[-1])
+    derivatives = {}
+    for c, row, rough_row in zip(components, rows, rough_rows):
+        d_thick, d_sld, d_isld = dslabs[row, :3]
+        _accumulate(derivatives, c.thick, d_thick)
+        _accumulate(
+            derivatives,
+            c.rough,
+            dslabs[rough_row, 3] if rough_row < n else zero,
+        )
+
+        if 0 < row < n - 1:
+            # overall SLD is a volume fraction weighted average of the
+            # material and the solvent
+            vf = c.vfsolv.value
+            sld = complex(c.sld)
+            _accumulate(derivatives, c.sld.real, (1 - vf) * d_sld)
+            _accumulate(derivatives, c.sld.imag, (1 - vf) * d_isld)
+            _accumulate(
+                derivatives,
+                c.vfsolv,
+                (solv.real - sld.real) * d_sld
+                + (solv.imag - sld.imag) * d_isld,
+            )
+            _accumulate(derivatives, solvent.real, vf * d_sld)
+            _accumulate(derivatives, solvent.imag, vf * d_isld)
+        else:
+            # fronting and backing media aren't solvated
+            _accumulate(derivatives, c.sld.real, d_sld)
+            _accumulate(derivatives, c.sld.imag, d_isld)
+            _accumulate(derivatives, c.vfsolv, zero)
+
+    return derivatives
+
+
+def _slab_model_jacobian(model, x, x_err=None):
+    """
+    Derivatives of a ReflectModel with respect to its varying parameters,
+    calculated with `_creflect.abeles_grad`. See `ReflectModel.jacobian`.
+    """
+    try:
+        from refnx.reflect import _creflect  # noqa: F401
+    except ImportError as e:
+        raise NotImplementedError(
+            "The analytic derivative kernel is not available"
+        ) from e
+
+    parameters = model.parameters
+    if any(p.constraint is not None for p in f_unique(flatten(parameters))):
+        raise NotImplementedError(
+            "Derivatives can't be calculated for constrained Parameters"
+        )
+
+    structure = model.structure
+    slabs = structure.slabs()[:, :4]
+
+    x = np.asarray(x, dtype=np.float64)
+    qvals = x.ravel() + float(model.q_offset)
+    if x_err is None or model.dq_type == "constant":
+        stack = _smeared_kernel_constant(
+            qvals,
+            slabs,
+            float(model.dq),
+            threads=model.threads,
+            fkernel=_abeles_grad_kernel,
+            dq_engine=model._dq_engine(),
+        )
+    elif np.size(x_err) == x.size and isinstance(
+        model.quad_order, numbers.Integral
+    ):
+        stack = _smeared_kernel_pointwise(
+            qvals,
+            slabs,
+            np.ravel(x_err).astype(np.float64),
+            quad_order=model.quad_order,
+            threads=model.threads,
+            fkernel=_abeles_grad_kernel,
+        )
+    else:
+        raise NotImplementedError(
+            "Derivatives can only be calculated for constant dQ/Q smearing,"
+            " or pointwise smearing with an integer quad_order"
+        )
+
+    dslabs = model.scale.value * np.reshape(stack[1:], slabs.shape + (-1,))
+    derivatives = _slab_derivatives(structure, dslabs)
+    _accumulate(derivatives, model.scale, stack[0])
+    _accumulate(derivatives, model.bkg, np.ones_like(stack[0]))
+
+    jac = np.empty((x.size, 0))
+    for p in parameters.varying_parameters():
+        if id(p) not in derivatives:
+            raise NotImplementedError(
+                f"Derivatives can't be calculated with respect to {p!r}"
+            )
+        jac = np.column_stack((jac, derivatives[id(p)]))
+    return jac
+
+
 class SpinChannel(Enum):
     """
     Describes the incident and scattered spin state of a polarised neutron beam.
@@ -397,16 +911,27 @@ class ReflectModel:
         option is only applicable if you are using the ``_creflect``
         module. The option is ignored if using the pure python calculator,
         ``_reflect``. If `threads == -1` then all available processors are
-        used.
+        used. The ``_creflect`` module executes parallel calculations on a
+        persistent pool of worker threads, see
+        :func:`refnx.reflect._creflect.resize_pool` and
+        :func:`refnx.reflect._creflect.shutdown_pool`.
     quad_order : int, optional
         the order of the Gaussian quadrature polynomial for doing pointwise
         resolution smearing. default = 17. Don't choose less than 13. If
         quad_order == 'ultimate' then adaptive quadrature is used. Adaptive
-        quadrature will always work, but takes a _long_ time (2 or 3 orders
-        of magnitude longer). Fixed quadrature will always take a lot less
-        time, BUT it won't necessarily work across all samples. For
-        example, 13 points may be fine for a thin layer, but will be
-        atrocious at describing a multilayer with bragg peaks.
+        quadrature will always work, but takes longer (it places extra
+        points where the reflectivity varies rapidly). Fixed quadrature
+        will always take less time, BUT it won't necessarily work
+        across all samples. For example, 13 points may be fine for a thin
+        layer, but will be atrocious at describing a multilayer with bragg
+        peaks.
+        If quad_order == 'auto' the smallest order that agrees with an
+        adaptive quadrature calculation (to a relative tolerance of 1e-4) is
+        chosen for each region of the dataset. Regions that none of the
+        orders can describe to this tolerance (e.g. around a sharp critical
+        edge) use 101 points. The choice is remembered and is only
+        revisited if the Q/dQ values change, or if the structure changes
+        substantially.
         If `dq_type='constant'` then this value is ignored.
     dq_type : {'pointwise', 'constant'}, optional
         Chooses whether pointwise or constant dQ/Q resolution smearing (see
@@ -419,6 +944,13 @@ class ReflectModel:
         where the measured q values (incident angle) may have been under/over
         estimated, and has the effect of shifting the calculated model to
         lower/higher effective q values.
+    dq_engine : {'spline', 'fft'}, optional
+        Method used for constant dQ/Q resolution smearing. 'spline'
+        interpolates a coarse reflectivity calculation with a B-spline and
+        convolves it with the resolution kernel. 'fft' calculates the
+        reflectivity on a fine, uniform, grid in ln(Q) and convolves with
+        FFTs; this is usually more accurate for the same cost, particularly
+        for samples with sharp features (e.g. Bragg peaks).
     spin : refnx.reflect.SpinChannel
         The polarisation channel that is being calculated.
     """
@@ -434,11 +966,13 @@ class ReflectModel:
         quad_order=17,
         dq_type="pointwise",
         q_offset=0,
+        dq_engine="spline",
     ):
         self.name = name
         self._parameters = None
         self.threads = threads
         self.quad_order = quad_order
+        self.dq_engine = dq_engine
 
         # to make it more like a refnx.analysis.Model
         self.fitfunc = None
@@ -494,7 +1028,7 @@ class ReflectModel:
             f" scale={self.scale!r}, bkg={self.bkg!r},"
             f" dq={self.dq!r}, threads={self.threads},"
             f" quad_order={self.quad_order!r}, dq_type={self.dq_type!r},"
-            f" q_offset={self.q_offset!r})"
+            f" q_offset={self.q_offset!r}, dq_engine={self.dq_engine!r})"
         )
 
     @property
@@ -591,6 +1125,19 @@ class ReflectModel:
 
         slabs = self.structure.slabs()[:, :4]
 
+        if _active_kernel_memo() is not None:
+            R = _shared_reflectivity(
+                self.structure,
+                slabs,
+                x,
+                x_err,
+                self._quadrature(),
+                self.threads,
+                self.q_offset.value,
+                dq_engine=self._dq_engine(),
+            )
+            return self.scale.value * R + self.bkg.value
+
         return reflectivity(
             x,
             slabs,
@@ -598,10 +1145,225 @@ class ReflectModel:
             bkg=self.bkg.value,
             dq=x_err,
             threads=self.threads,
-            quad_order=self.quad_order,
+            quad_order=self._quadrature(),
             q_offset=self.q_offset,
+            dq_engine=self._dq_engine(),
+        )
+
+    def _quadrature(self):
+        """
+        The `quad_order` to use for pointwise smearing. For
+        ``quad_order="auto"`` the object that remembers the selected orders.
+        """
+        if self.quad_order != "auto":
+            return self.quad_order
+        if getattr(self, "_auto_quadrature", None) is None:
+            self._auto_quadrature = _AutoQuadrature()
+        return self._auto_quadrature
+
+    def _dq_engine(self):
+        # models pickled before `dq_engine` existed don't have the attribute
+        return getattr(self, "dq_engine", "spline")
+
+    def model_batch(self, x, pvals, x_err=None):
+        r"""
+        Calculate the reflectivity of this model for many parameter vectors
+        at once.
+
+        The slab representations for each of the parameter vectors are
+        stacked and the reflectivity (including resolution smearing) is
+        calculated for all of them with a single kernel call.
+
+        Parameters
+        ----------
+        x : float or np.ndarray
+            q values for the calculation.
+            Units = Angstrom**-1
+        pvals : array-like
+            Has shape (M, P). Each of the M rows is a set of parameter values,
+            as would be supplied to the `p` argument of
+            :meth:`ReflectModel.model`.
+        x_err : {np.ndarray, float} optional
+            Specifies how the instrumental resolution smearing is carried out
+            for each of the points in `x`.
+            See :func:`refnx.reflect.reflectivity` for further details.
+
+        Returns
+        -------
+        reflectivity : np.ndarray
+            Calculated reflectivity, has shape `(M,) + x.shape`.
+
+        Notes
+        -----
+        The parameter values of the model are restored once the calculation
+        has finished. Subclasses that override :meth:`model` are calculated
+        for each of the parameter vectors in turn.
+        """
+        pvals = np.atleast_2d(pvals)
+        parameters = self.parameters
+        saved_pvals = np.array(parameters)
+        # only walk the parameter tree once
+        targets = parameters._pvals_targets(pvals.shape[1])
+
+        states = []
+        try:
+            for p in pvals:
+                for param, val in zip(targets, p):
+                    param.value = val
+                if self._batch_states:
+                    states.append(self._model_state())
+                else:
+                    states.append(self.model(x, x_err=x_err))
+        finally:
+            parameters.pvals = saved_pvals
+
+        if not self._batch_states:
+            return np.array(states, ndmin=2)
+        return self._model_from_states(x, states, x_err=x_err)
+
+    @property
+    def _batch_states(self):
+        """
+        Whether the model can be calculated for many parameter vectors from
+        `_model_state` snapshots. Subclasses that override `model` calculate
+        something else, so they have to opt in explicitly (by setting this
+        attribute to True).
+        """
+        return type(self).model is ReflectModel.model
+
+    def _model_state(self):
+        """
+        Snapshot of everything needed to calculate the model for the current
+        parameter values.
+        """
+        return (
+            self.structure.slabs()[:, :4],
+            self.scale.value,
+            self.bkg.value,
+            float(self.dq),
+            float(self.q_offset),
         )
 
+    def _model_from_states(self, x, states, x_err=None):
+        """
+        Calculates the model for a sequence of snapshots obtained from
+        `_model_state`.
+        """
+        x = np.asarray(x)
+        use_constant = x_err is None or self.dq_type == "constant"
+
+        # snapshots can only share a kernel call if they have the same
+        # resolution and q_offset.
+        groups = {}
+        for i, (_, _, _, dq, q_offset) in enumerate(states):
+            key = (dq if use_constant else None, q_offset)
+            groups.setdefault(key, []).append(i)
+
+        R = np.empty((len(states),) + x.shape, dtype=np.float64)
+        for (dq, q_offset), idxs in groups.items():
+            stack = pad_slabs([states[i][0] for i in idxs])
+            R[idxs] = reflectivity_batch(
+                x,
+                stack,
+                scale=np.array([states[i][1] for i in idxs]),
+                bkg=np.array([states[i][2] for i in idxs]),
+                dq=dq if use_constant else x_err,
+                threads=self.threads,
+                quad_order=self._quadrature(),
+                q_offset=q_offset,
+                dq_engine=self._dq_engine(),
+            )
+        return R
+
+    def jacobian(self, x, x_err=None):
+        r"""
+        Exact derivatives of the model with respect to its varying
+        parameters.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            q values for the calculation.
+            Units = Angstrom**-1
+        x_err : {np.ndarray, float} optional
+            Specifies how the instrumental resolution smearing is carried out
+            for each of the points in `x`, see :meth:`model`.
+
+        Returns
+        -------
+        jac : np.ndarray
+            Derivatives of the reflectivity with respect to each of
+            ``self.parameters.varying_parameters()``, shape ``(x.size,
+            nvary)``.
+
+        Raises
+        ------
+        NotImplementedError
+            If the derivatives can't be calculated analytically for this
+            model.
+
+        Notes
+        -----
+        If the `Structure` is made from :class:`Slab` components (with
+        :class:`SLD` scatterers and default interfaces) and none of the
+        Parameters are constrained, the derivatives of the reflectivity with
+        respect to the slab representation are calculated by the C kernel,
+        :func:`refnx.reflect._creflect.abeles_grad`, smeared in the same way
+        as :meth:`model`, and then converted to derivatives with respect to
+        the Parameters.
+
+        Otherwise the derivatives are calculated by forward-mode automatic
+        differentiation of the model compiled by
+        :func:`refnx.reflect.extra.compile_model`. This requires jax, with
+        64-bit floats enabled, and a `Structure` made from components that
+        can be compiled. Resolution smearing must use a fixed Gaussian
+        quadrature order, and `q_offset` must be zero. Constant dQ/Q
+        smearing is approximated by pointwise smearing.
+        """
+        if type(self).model is not ReflectModel.model:
+            raise NotImplementedError(
+                f"{type(self).__name__} doesn't have an analytic Jacobian"
+            )
+        if self.q_offset.vary or self.dq.vary:
+            raise NotImplementedError(
+                "The analytic Jacobian requires a fixed q_offset and dq"
+            )
+
+        try:
+            return _slab_model_jacobian(self, x, x_err=x_err)
+        except NotImplementedError:
+            pass
+
+        if (
+            float(self.q_offset)
+            or not isinstance(self.quad_order, numbers.Integral)
+            or getattr(self.structure, "contract", 0) > 0
+        ):
+            raise NotImplementedError(
+                "The analytic Jacobian requires a zero q_offset, an integer"
+                " quad_order and an uncontracted Structure"
+            )
+
+        x = np.asarray(x, dtype=np.float64)
+        if x_err is None or self.dq_type == "constant":
+            dq = float(self.dq)
+            x_err = x * dq / 100.0 if dq > 0 else None
+        elif np.shape(x_err) != x.shape:
+            raise NotImplementedError(
+                "The analytic Jacobian only supports pointwise resolution"
+                " smearing"
+            )
+
+        compiled = _compiled_reflect_model(self)
+        # the compiled model captures the parameter graph, not the values
+        pvals = np.array(self.parameters.varying_parameters(), dtype=float)
+        if x_err is None:
+            jac = compiled.jacfwd(x.ravel(), pvals)
+        else:
+            x_err = np.asarray(x_err, dtype=np.float64)
+            jac = compiled.jacfwd(x.ravel(), pvals, x_err.ravel())
+        return np.asarray(jac, dtype=np.float64)
+
     def logp(self):
         r"""
         Additional log-probability terms for the reflectivity model. Do not
@@ -690,11 +1452,12 @@ class ReflectModelTL(ReflectModel):
         the order of the Gaussian quadrature polynomial for doing the
         resolution smearing. default = 17. Don't choose less than 13. If
         quad_order == 'ultimate' then adaptive quadrature is used. Adaptive
-        quadrature will always work, but takes a _long_ time (2 or 3 orders
-        of magnitude longer). Fixed quadrature will always take a lot less
-        time. BUT it won't necessarily work across all samples. For
-        example, 13 points may be fine for a thin layer, but will be
-        atrocious at describing a multilayer with bragg peaks.
+        quadrature will always work, but takes longer (it places extra
+        points where the reflectivity varies rapidly). Fixed quadrature
+        will always take less time. BUT it won't necessarily work
+        across all samples. For example, 13 points may be fine for a thin
+        layer, but will be atrocious at describing a multilayer with bragg
+        peaks.
     dq_type : {'pointwise', 'constant'}, optional
         Chooses whether pointwise or constant dQ/Q resolution smearing (see
         `dq` keyword) is used. To use pointwise smearing the `x_err` keyword
@@ -825,6 +1588,39 @@ class ReflectModelTL(ReflectModel):
         R += self.bkg.value
         return np.squeeze(R)
 
+    def model_batch(self, x, pvals, x_err=None):
+        r"""
+        Calculate the reflectivity of this model for many parameter vectors.
+
+        Parameters
+        ----------
+        x : (float, float) or np.ndarray
+            angle of incidence/wavelength values for the calculation. See
+            :meth:`ReflectModelTL.model`.
+        pvals : array-like
+            Has shape (M, P). Each of the M rows is a set of parameter values.
+        x_err : np.ndarray
+            dq resolution smearing values for the dataset being considered.
+
+        Returns
+        -------
+        reflectivity : np.ndarray
+            Calculated reflectivity, has shape `(M, N)`.
+
+        Notes
+        -----
+        Wavelength dependent slab representations can't be stacked, so each
+        parameter vector is calculated in turn.
+        """
+        pvals = np.atleast_2d(pvals)
+        saved_pvals = np.array(self.parameters)
+        try:
+            return np.array(
+                [self.model(x, p=p, x_err=x_err) for p in pvals], ndmin=2
+            )
+        finally:
+            self.parameters.pvals = saved_pvals
+
     @property
     def q_offset(self):
         pass
@@ -913,6 +1709,7 @@ def reflectivity(
     spin=None,
     Aguide=270,
     fkernel=None,
+    dq_engine="spline",
 ):
     r"""
     Abeles/Parratt formalism for calculating reflectivity from a stratified
@@ -993,11 +1790,17 @@ def reflectivity(
         the order of the Gaussian quadrature polynomial for doing the
         resolution smearing. default = 17. Don't choose less than 13. If
         quad_order == 'ultimate' then adaptive quadrature is used. Adaptive
-        quadrature will always work, but takes a _long_ time (2 or 3 orders
-        of magnitude longer). Fixed quadrature will always take a lot less
-        time. BUT it won't necessarily work across all samples. For
-        example, 13 points may be fine for a thin layer, but will be
-        atrocious at describing a multilayer with bragg peaks.
+        quadrature will always work, but takes longer (it places extra
+        points where the reflectivity varies rapidly). Fixed quadrature
+        will always take less time. BUT it won't necessarily work
+        across all samples. For example, 13 points may be fine for a thin
+        layer, but will be atrocious at describing a multilayer with bragg
+        peaks.
+        If quad_order == 'auto' the smallest order that agrees with an
+        adaptive quadrature calculation (to a relative tolerance of 1e-4) is
+        chosen for each region of the dataset. Regions that none of the
+        orders can describe to this tolerance (e.g. around a sharp critical
+        edge) use 101 points.
     threads : int, optional
         Specifies the number of threads for parallel calculation. This
         option is only applicable if you are using the ``_creflect``
@@ -1017,6 +1820,12 @@ def reflectivity(
         Angle of applied field. Ignored if `fkernel` is provided.
     fkernel : callable
         Direct specification of the reflectivity calculation kernel
+    dq_engine : {'spline', 'fft'}, optional
+        Method used for constant dQ/Q resolution smearing. 'spline'
+        interpolates a coarse reflectivity calculation with a B-spline before
+        convolving with the resolution kernel. 'fft' calculates the
+        reflectivity on a fine, uniform, grid in ln(Q) and convolves using
+        FFTs. Ignored unless `dq` is a float.
 
     Examples
     --------
@@ -1058,7 +1867,12 @@ def reflectivity(
         return (
             scale
             * _smeared_kernel_constant(
-                q + q_offset, slabs, dq, threads=threads, fkernel=fkernel
+                q + q_offset,
+                slabs,
+                dq,
+                threads=threads,
+                fkernel=fkernel,
+                dq_engine=dq_engine,
             )
         ) + bkg
 
@@ -1081,6 +1895,22 @@ def reflectivity(
                 + bkg
             )
             return smeared_rvals.reshape(q.shape)
+        # automatically chosen quadrature order
+        elif quad_order == "auto" or isinstance(quad_order, _AutoQuadrature):
+            if not isinstance(quad_order, _AutoQuadrature):
+                quad_order = _AutoQuadrature()
+            smeared_rvals = (
+                scale
+                * quad_order(
+                    qvals_flat + q_offset,
+                    slabs,
+                    dqvals_flat,
+                    threads=threads,
+                    fkernel=fkernel,
+                )
+                + bkg
+            )
+            return np.reshape(smeared_rvals, q.shape)
         # fixed order quadrature
         else:
             smeared_rvals = (
@@ -1118,6 +1948,250 @@ def reflectivity(
     return None
 
 
+def reflectivity_batch(
+    q,
+    slabs,
+    scale=1.0,
+    bkg=0.0,
+    dq=5.0,
+    quad_order=17,
+    threads=-1,
+    q_offset=0,
+    fkernel=None,
+    dq_engine="spline",
+):
+    r"""
+    Calculates reflectivity from a stack of slab representations,
+    evaluating all of them in a single kernel call.
+
+    Parameters
+    ----------
+    q : np.ndarray
+        The qvalues required for the calculation.
+        :math:`Q=\frac{4Pi}{\lambda}\sin(\Omega)`.
+        Units = Angstrom**-1
+    slabs : np.ndarray
+        Has shape (M, 2 + N, 4), where M is the number of slab
+        representations and N is the number of layers in each of them. See
+        :func:`reflectivity` for a description of each of the slab
+        representations. If your systems have different numbers of layers use
+        :func:`pad_slabs` to stack them.
+    scale : float or array-like, optional
+        scale factor. Either a single value, or an array of shape (M,) with
+        one value per slab representation.
+    bkg : float or array-like, optional
+        Q-independent constant background. Either a single value, or an array
+        of shape (M,) with one value per slab representation.
+    dq : float or np.ndarray, optional
+        resolution information, see :func:`reflectivity`. Shared by all of
+        the slab representations.
+    quad_order : int, optional
+        the order of the Gaussian quadrature polynomial for doing the
+        resolution smearing. See :func:`reflectivity`. For
+        ``quad_order="auto"`` the orders are chosen using the first of the
+        slab representations.
+    threads : int, optional
+        Specifies the number of threads for parallel calculation. If
+        `threads == -1` then all available processors are used.
+    q_offset : float or refnx.analysis.Parameter, optional
+        Compensates for uncertainties in the angle at which the measurement is
+        performed, see :func:`reflectivity`.
+    fkernel : callable, optional
+        Vectorised kernel with the same signature as
+        :func:`refnx.reflect._creflect.abeles_vectorised`. By default the
+        calculation uses `abeles_vectorised` if the current reflectivity
+        backend is the 'c' backend, otherwise the current backend is called
+        for each of the slab representations in turn.
+    dq_engine : {'spline', 'fft'}, optional
+        Method used for constant dQ/Q resolution smearing, see
+        :func:`reflectivity`.
+
+    Returns
+    -------
+    reflectivity : np.ndarray
+        The reflectivity from each of the slab representations, has shape
+        `(M,) + q.shape`.
+
+    Examples
+    --------
+
+    >>> from refnx.reflect import reflectivity_batch
+    >>> q = np.linspace(0.01, 0.5, 1000)
+    >>> slabs = np.array([[0, 2.07, 0, 0],
+    ...                   [100, 3.47, 0, 3],
+    ...                   [500, -0.5, 0.00001, 3],
+    ...                   [0, 6.36, 0, 3]])
+    >>> stack = np.stack([slabs, slabs])
+    >>> stack[1, 1, 0] = 120
+    >>> print(reflectivity_batch(q, stack).shape)
+    (2, 1000)
+    """
+    q = np.asarray(q)
+    slabs = np.asarray(slabs, dtype=np.float64)
+    if slabs.ndim != 3 or slabs.shape[2] != 4 or slabs.shape[1] < 2:
+        raise ValueError(
+            f"slabs must have shape (M, >=2, 4) for a batch calculation,"
+            f" {slabs.shape=}"
+        )
+    nbatch = len(slabs)
+
+    if fkernel is None:
+        fkernel = _vectorised_kernel(kernel)
+
+    q_offset = float(q_offset)
+
+    # scale and bkg are applied after smearing, broadcast against the output
+    broadcast_shape = (nbatch,) + (1,) * q.ndim
+    scale = np.broadcast_to(
+        np.asarray(scale, dtype=np.float64), (nbatch,)
+    ).reshape(broadcast_shape)
+    bkg = np.broadcast_to(np.asarray(bkg, dtype=np.float64), (nbatch,))
+    bkg = bkg.reshape(broadcast_shape)
+
+    # constant dq/q smearing
+    if isinstance(dq, numbers.Real) and float(dq) == 0:
+        rvals = fkernel(q + q_offset, slabs, threads=threads)
+        return scale * rvals + bkg
+    elif isinstance(dq, numbers.Real):
+        rvals = _smeared_kernel_constant_batch(
+            q + q_offset,
+            slabs,
+            float(dq),
+            threads=threads,
+            fkernel=fkernel,
+            dq_engine=dq_engine,
+        )
+        return scale * rvals + bkg
+
+    # point by point resolution smearing (each q point has different dq/q)
+    if isinstance(dq, np.ndarray) and dq.size == q.size:
+        dqvals_flat = dq.flatten()
+        qvals_flat = q.flatten()
+
+        if quad_order == "ultimate":
+            # each structure needs its own adaptive refinement, so the
+            # adaptive quadrature is done structure by structure
+            rvals = np.stack(
+                [
+                    _smeared_kernel_adaptive(
+                        qvals_flat + q_offset,
+                        w,
+                        dqvals_flat,
+                        threads=threads,
+                        fkernel=kernel,
+                    )
+                    for w in slabs
+                ]
+            )
+        elif quad_order == "auto" or isinstance(quad_order, _AutoQuadrature):
+            if not isinstance(quad_order, _AutoQuadrature):
+                quad_order = _AutoQuadrature()
+            rvals = quad_order(
+                qvals_flat + q_offset,
+                slabs,
+                dqvals_flat,
+                threads=threads,
+                fkernel=fkernel,
+            )
+        else:
+            rvals = _smeared_kernel_pointwise(
+                qvals_flat + q_offset,
+                slabs,
+                dqvals_flat,
+                quad_order=quad_order,
+                threads=threads,
+                fkernel=fkernel,
+            )
+        return scale * np.reshape(rvals, (nbatch,) + q.shape) + bkg
+
+    # resolution kernel smearing
+    elif (
+        isinstance(dq, np.ndarray)
+        and dq.ndim == q.ndim + 2
+        and dq.shape[0 : q.ndim] == q.shape
+    ):
+        qvals_for_res = dq[:, 0, :] + q_offset
+        smeared_rvals = fkernel(qvals_for_res, slabs, threads=threads)
+        smeared_rvals *= dq[:, 1, :]
+        rvals = scipy.integrate.simpson(
+            smeared_rvals,
+            x=np.broadcast_to(qvals_for_res, smeared_rvals.shape),
+        )
+        return scale * rvals + bkg
+
+    return None
+
+
+def pad_slabs(slabs):
+    """
+    Stacks slab representations that have different numbers of layers.
+
+    Parameters
+    ----------
+    slabs : sequence of np.ndarray
+        Slab representations, each with shape (2 + N_i, 4). See
+        :func:`reflectivity`.
+
+    Returns
+    -------
+    stack : np.ndarray
+        Has shape (M, 2 + max(N_i), 4). Representations with fewer layers
+        are padded with zero thickness layers that have the same SLD as the
+        fronting medium, and zero roughness. These layers are inserted
+        directly after the fronting medium, so they don't alter the
+        calculated reflectivity.
+    """
+    slabs = [np.asarray(w, dtype=np.float64)[:, :4] for w in slabs]
+    nrows = max(len(w) for w in slabs)
+
+    stack = np.empty((len(slabs), nrows, 4), dtype=np.float64)
+    for i, w in enumerate(slabs):
+        npad = nrows - len(w)
+        stack[i, 0] = w[0]
+        stack[i, 1 : npad + 1] = [0, w[0, 1], w[0, 2], 0]
+        stack[i, npad + 1 :] = w[1:]
+    return stack
+
+
+def _vectorised_kernel(fkernel):
+    """
+    A kernel that calculates reflectivity for a stack of slab
+    representations, with the same signature as `abeles_vectorised`.
+    """
+    try:
+        from refnx.reflect import _creflect
+
+        if fkernel is _creflect.abeles:
+            return _creflect.abeles_vectorised
+    except ImportError:
+        pass
+
+    try:
+        from refnx.reflect import _numba_reflect
+
+        if fkernel is _numba_reflect.numba_abeles:
+            return _numba_reflect.numba_abeles_vectorised
+        if fkernel is _numba_reflect.numba_parratt:
+            return _numba_reflect.numba_parratt_vectorised
+    except ImportError:
+        pass
+
+    def vectorised(q, w, scale=None, bkg=None, threads=-1):
+        nbatch = len(w)
+        if scale is None:
+            scale = np.ones(nbatch)
+        if bkg is None:
+            bkg = np.zeros(nbatch)
+        return np.stack(
+            [
+                fkernel(q, w[i], scale=scale[i], bkg=bkg[i], threads=threads)
+                for i in range(nbatch)
+            ]
+        )
+
+    return vectorised
+
+
 @lru_cache(maxsize=128)
 def gauss_legendre(n):
     """
@@ -1153,35 +2227,70 @@ def _gepore_wrapper(spin, Aguide):
     return wrapped_fun
 
 
-def _smear_kernel(x, w, q, dq, threads, fkernel=kernel):
+def _gauss_kronrod(qvals, sigma, lower, upper, w, threads=-1, fkernel=kernel):
     """
-    Adaptive Gaussian quadrature integration
+    Integrates the reflectivity, weighted by a normal distribution, over many
+    subintervals at once using a 7-point Gauss / 15-point Kronrod rule.
 
     Parameters
     ----------
-    x : float
-        Independent variable for integration.
+    qvals : np.ndarray
+        Nominal mean Q for each subinterval.
+    sigma : np.ndarray
+        Standard deviation of the normal distribution for each subinterval.
+    lower, upper : np.ndarray
+        Limits of each subinterval, in units of `sigma` away from the mean Q.
     w : array-like
         The uniform slab model parameters in 'layer' form.
-    q : float
-        Nominal mean Q of normal distribution
-    dq : float
-        FWHM of a normal distribution.
     threads : int
         number of threads for parallel calculation
+    fkernel : callable
+        Reflectivity calculator.
+
     Returns
     -------
-    reflectivity : float
-        Model reflectivity multiplied by the probability density function
-        evaluated at a given distance, x, away from the mean Q value.
+    integral, error : np.ndarray, np.ndarray
+        The Kronrod estimate of each subintegral and the magnitude of its
+        difference from the Gauss estimate.
     """
-    prefactor = 1 / np.sqrt(2 * np.pi)
-    gauss = prefactor * np.exp(-0.5 * x * x)
-    localq = q + x * dq / _FWHM
-    return fkernel(localq, w, threads=threads) * gauss
+    centre = 0.5 * (upper + lower)[:, np.newaxis]
+    half_width = 0.5 * (upper - lower)[:, np.newaxis]
+
+    x = centre + half_width * _GK15_NODES
+    localq = qvals[:, np.newaxis] + x * sigma[:, np.newaxis]
+
+    # a single kernel call for all the subintervals
+    rvals = fkernel(localq, w, threads=threads)
+    rvals = rvals * np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
 
+    half_width = half_width[:, 0]
+    kronrod = np.sum(rvals * _GK15_KRONROD_WEIGHTS, -1)
+    gauss = np.sum(rvals * _GK15_GAUSS_WEIGHTS, -1)
 
-def _smeared_kernel_adaptive(qvals, w, dqvals, threads=-1, fkernel=kernel):
+    # QUADPACK (QK15) style error estimate, the Kronrod estimate is
+    # generally far more accurate than |kronrod - gauss| would suggest.
+    mean = 0.5 * kronrod
+    asc = np.sum(
+        _GK15_KRONROD_WEIGHTS * np.abs(rvals - mean[:, np.newaxis]), -1
+    )
+    error = np.abs(kronrod - gauss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = asc * np.minimum(1.0, (200 * error / asc) ** 1.5)
+    error = np.where(asc > 0, scaled, error)
+
+    return kronrod * half_width, error * half_width
+
+
+def _smeared_kernel_adaptive(
+    qvals,
+    w,
+    dqvals,
+    threads=-1,
+    fkernel=kernel,
+    epsabs=0.0,
+    epsrel=1.49e-8,
+    maxiter=50,
+):
     """
     Resolution smearing that uses adaptive Gaussian quadrature integration
     for the convolution.
@@ -1199,6 +2308,13 @@ def _smeared_kernel_adaptive(qvals, w, dqvals, threads=-1, fkernel=kernel):
         Do you want to calculate in parallel? This option is only applicable if
         you are using the ``_creflect`` module. The option is ignored if using
         the pure python calculator, ``_reflect``.
+    fkernel : callable, optional
+        Reflectivity calculator.
+    epsabs, epsrel : float, optional
+        Absolute and relative error tolerances for each Q point.
+    maxiter : int, optional
+        Maximum number of refinement rounds. Subintervals that haven't
+        converged after this many rounds are accepted as they are.
 
     Returns
     -------
@@ -1207,21 +2323,81 @@ def _smeared_kernel_adaptive(qvals, w, dqvals, threads=-1, fkernel=kernel):
 
     Notes
     -----
-    The integration is adaptive meaning it keeps going until it reaches an
-    absolute tolerance.
+    The integration is adaptive meaning it keeps going until it reaches the
+    requested tolerance. All Q points are refined simultaneously. Each Q
+    point starts with a single interval spanning the integration range. In
+    each round every subinterval is integrated with a Gauss-Kronrod (G7, K15)
+    rule, and subintervals whose error estimate exceeds their share
+    (proportional to width) of the tolerance for that Q point are bisected
+    and refined in the next round. Each round requires a single call to
+    `fkernel`, so the cost is similar to fixed order quadrature when the
+    integrand is smooth, with extra points only placed where they're needed
+    (e.g. around Bragg peaks).
     """
-    smeared_rvals = np.zeros(qvals.size)
-    warnings.simplefilter("ignore", Warning)
-    for idx, val in enumerate(qvals):
-        smeared_rvals[idx], err = scipy.integrate.quad(
-            _smear_kernel,
-            -_INTLIMIT,
-            _INTLIMIT,
-            epsabs=0.0,
-            args=(w, qvals[idx], dqvals[idx], threads, fkernel),
+    qvals = np.asarray(qvals, dtype=np.float64).ravel()
+    sigma = np.asarray(dqvals, dtype=np.float64).ravel() / _FWHM
+    npnts = qvals.size
+    smeared_rvals = np.zeros(npnts)
+
+    # the subintervals of the Q points that haven't converged yet, the
+    # Q point they belong to, and their integral/error estimates.
+    owner = np.arange(npnts)
+    lower = np.full(npnts, -_INTLIMIT)
+    upper = np.full(npnts, _INTLIMIT)
+    integral = np.empty(npnts)
+    error = np.empty(npnts)
+    fresh = np.ones(npnts, dtype=bool)
+
+    for i in range(maxiter):
+        # only the subintervals created in the last round need evaluating
+        integral[fresh], error[fresh] = _gauss_kronrod(
+            qvals[owner[fresh]],
+            sigma[owner[fresh]],
+            lower[fresh],
+            upper[fresh],
+            w,
+            threads=threads,
+            fkernel=fkernel,
+        )
+
+        estimate = np.bincount(owner, integral, minlength=npnts)
+        total_error = np.bincount(owner, error, minlength=npnts)
+        count = np.bincount(owner, minlength=npnts)
+        tolerance = np.maximum(epsabs, epsrel * np.abs(estimate))
+
+        converged = total_error <= tolerance
+        if i == maxiter - 1:
+            converged[:] = True
+        active = count > 0
+        smeared_rvals[active & converged] = estimate[active & converged]
+
+        keep = ~converged[owner]
+        if not keep.any():
+            break
+
+        # bisect the subintervals whose error is larger than their share of
+        # the tolerance. At least one subinterval of each unconverged Q point
+        # satisfies this.
+        split = keep & (error > (tolerance / np.maximum(count, 1))[owner])
+        keep &= ~split
+
+        lo = lower[split]
+        hi = upper[split]
+        mid = 0.5 * (lo + hi)
+        nsplit = 2 * lo.size
+
+        owner = np.concatenate((owner[keep], np.repeat(owner[split], 2)))
+        lower = np.concatenate(
+            (lower[keep], np.column_stack((lo, mid)).ravel())
+        )
+        upper = np.concatenate(
+            (upper[keep], np.column_stack((mid, hi)).ravel())
         )
+        integral = np.concatenate((integral[keep], np.empty(nsplit)))
+        error = np.concatenate((error[keep], np.empty(nsplit)))
+        fresh = np.zeros(owner.size, dtype=bool)
+        fresh[-nsplit:] = True
 
-    warnings.resetwarnings()
     return smeared_rvals
 
 
@@ -1259,36 +2435,509 @@ def _smeared_kernel_pointwise(
 
     # The fixed order quadrature does not use scipy.integrate.fixed_quad.
     # That library function does one point at a time, whereas in this function
-    # the integration is vectorised
+    # the integration is vectorised. The Q values and weights for the
+    # quadrature are cached.
+    plan = _smearing_plan(qvals, dqvals, quad_order=quad_order)
+    return plan(w, threads=threads, fkernel=fkernel)
+
+
+class _AutoQuadrature:
+    """
+    Chooses the order of the Gaussian quadrature used for pointwise
+    resolution smearing (``quad_order="auto"``).
+
+    The smeared reflectivity is calculated at a set of candidate orders and
+    compared to a reference calculated by adaptive quadrature (see
+    `_smeared_kernel_adaptive`). The Q points are split into contiguous
+    regions, and each region uses the smallest candidate order that agrees
+    with the reference to within `rtol`.
+
+    Parameters
+    ----------
+    rtol : float, optional
+        Relative tolerance for the smeared reflectivity.
+    region_size : int, optional
+        Number of adjacent Q points that share the same quadrature order.
+    orders : sequence of int, optional
+        Candidate quadrature orders, in increasing order.
+    reference_order : int, optional
+        Quadrature order used for regions where none of the candidates are
+        accurate enough. Fixed order quadrature converges slowly where the
+        reflectivity has a kink (e.g. a sharp critical edge), so these
+        regions may not reach `rtol` either.
+    recheck : float, optional
+        The selection is remembered and re-used for subsequent calculations
+        with the same Q and dQ values. It's repeated if the number of layers
+        changes, or if the total thickness of the layers changes by more than
+        this fraction (thicker structures have more closely spaced fringes).
+
+    Notes
+    -----
+    Once the orders have been chosen the smearing for all the Q points is
+    done with a single kernel call.
+    """
+
+    def __init__(
+        self,
+        rtol=1e-4,
+        region_size=20,
+        orders=(13, 17, 21, 31, 41, 61),
+        reference_order=101,
+        recheck=0.1,
+    ):
+        self.rtol = rtol
+        self.region_size = region_size
+        self.orders = tuple(orders)
+        self.reference_order = reference_order
+        self.recheck = recheck
+
+        self.quad_orders = None
+        self._qvals = None
+        self._dqvals = None
+        self._signature = None
+        self._plan = None
+
+    def __call__(self, qvals, w, dqvals, threads=-1, fkernel=kernel):
+        """
+        Smeared reflectivity using the selected quadrature orders.
+
+        Parameters
+        ----------
+        qvals : array-like
+            The Q values for evaluation
+        w : array-like
+            The uniform slab model parameters in 'layer' form. May be a stack
+            of slab models, in which case the orders are selected on the
+            first of them.
+        dqvals : array-like
+            dQ values corresponding to each value in `qvals`. Each dqval is
+            the FWHM of a Gaussian approximation to the resolution kernel.
+        threads : int, optional
+            Specifies the number of threads for parallel calculation.
+        fkernel : callable, optional
+            Reflectivity calculator.
+
+        Returns
+        -------
+        reflectivity : np.ndarray
+            The smeared reflectivity
+        """
+        qvals = np.asarray(qvals, dtype=np.float64).ravel()
+        dqvals = np.asarray(dqvals, dtype=np.float64).ravel()
+        w = np.asarray(w)
+
+        if self._stale(qvals, dqvals, w.reshape((-1,) + w.shape[-2:])[0]):
+            # a batched kernel needs to be given a stack of slab models
+            first = w[:1] if w.ndim == 3 else w
+            self.select(qvals, first, dqvals, threads=threads, fkernel=fkernel)
+
+        localq, weights, offsets = self._plan
+        rvals = fkernel(localq, w, threads=threads) * weights
+        return np.add.reduceat(rvals, offsets, axis=-1)
+
+    def _stale(self, qvals, dqvals, w):
+        if (
+            self.quad_orders is None
+            or not np.array_equal(qvals, self._qvals)
+            or not np.array_equal(dqvals, self._dqvals)
+        ):
+            return True
+
+        nlayers, thickness = self._signature
+        new_thickness = np.sum(w[1:-1, 0])
+        return (
+            len(w) != nlayers
+            or abs(new_thickness - thickness) > self.recheck * thickness
+        )
+
+    def select(self, qvals, w, dqvals, threads=-1, fkernel=kernel):
+        """
+        Selects the quadrature order for each Q point.
+
+        Parameters
+        ----------
+        qvals : array-like
+            The Q values for evaluation
+        w : array-like
+            The uniform slab model parameters in 'layer' form.
+        dqvals : array-like
+            dQ values corresponding to each value in `qvals`.
+        threads : int, optional
+            Specifies the number of threads for parallel calculation.
+        fkernel : callable, optional
+            Reflectivity calculator.
+
+        Returns
+        -------
+        quad_orders : np.ndarray
+            The quadrature order used for each Q point.
+        """
+        qvals = np.asarray(qvals, dtype=np.float64).ravel()
+        dqvals = np.asarray(dqvals, dtype=np.float64).ravel()
+        w = np.asarray(w)
+
+        ref_kernel = fkernel
+        if w.ndim == 3:
+            # a batched kernel, adaptive quadrature works on one slab model
+            def ref_kernel(q, w, threads=-1):
+                return fkernel(q, w[np.newaxis], threads=threads)[0]
+
+        reference = _smeared_kernel_adaptive(
+            qvals,
+            w.reshape(w.shape[-2:]),
+            dqvals,
+            threads=threads,
+            fkernel=ref_kernel,
+            epsrel=0.1 * self.rtol,
+        )
 
-    # get the gauss-legendre weights and abscissae
-    abscissa, weights = gauss_legendre(quad_order)
+        # the region that each Q point belongs to
+        region = np.arange(qvals.size) // self.region_size
+        nregions = region[-1] + 1 if qvals.size else 0
+        region_orders = np.full(nregions, self.reference_order)
+        todo = np.ones(nregions, dtype=bool)
+
+        for order in self.orders:
+            pts = todo[region]
+            if not pts.any():
+                break
+            calc = _smeared_kernel_pointwise(
+                qvals[pts],
+                w,
+                dqvals[pts],
+                quad_order=order,
+                threads=threads,
+                fkernel=fkernel,
+            ).ravel()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rel_err = np.abs(calc - reference[pts]) / np.abs(
+                    reference[pts]
+                )
+            rel_err = np.nan_to_num(rel_err, nan=0, posinf=np.inf)
+
+            # largest error in each of the regions being considered
+            worst = np.zeros(nregions)
+            np.maximum.at(worst, region[pts], rel_err)
+            ok = todo & (worst <= self.rtol)
+            region_orders[ok] = order
+            todo &= ~ok
 
-    # get the normal distribution at that point
-    prefactor = 1.0 / np.sqrt(2 * np.pi)
+        self.quad_orders = region_orders[region]
+        self._qvals = qvals
+        self._dqvals = dqvals
+        w = w.reshape(w.shape[-2:])
+        self._signature = (len(w), np.sum(w[1:-1, 0]))
+        self._plan = _quadrature_plan(qvals, dqvals, self.quad_orders)
+        return self.quad_orders
 
-    def gauss(x):
-        return np.exp(-0.5 * x * x)
 
-    gaussvals = prefactor * gauss(abscissa * _INTLIMIT)
+def _quadrature_plan(qvals, dqvals, quad_orders):
+    """
+    Q values and weights for pointwise smearing where each Q point has its
+    own quadrature order.
+
+    Returns
+    -------
+    localq, weights, offsets : np.ndarray
+        Flattened Q values to evaluate the reflectivity at, the quadrature
+        weights for each of those, and the offset of the first value for each
+        of the Q points (for use with `np.add.reduceat`).
+    """
+    quad_orders = np.asarray(quad_orders, dtype=int)
+    offsets = np.concatenate(([0], np.cumsum(quad_orders)[:-1]))
+    # the quadrature node index for each of the flattened values
+    node = np.arange(np.sum(quad_orders)) - np.repeat(offsets, quad_orders)
+
+    abscissa = np.empty(node.size)
+    weights = np.empty(node.size)
+    owner = np.repeat(np.arange(quad_orders.size), quad_orders)
+    for order in np.unique(quad_orders):
+        x, wt = gauss_legendre(int(order))
+        msk = quad_orders[owner] == order
+        abscissa[msk] = x[node[msk]]
+        weights[msk] = wt[node[msk]]
 
     # integration between -3.5 and 3.5 sigma
-    va = qvals - _INTLIMIT * dqvals / _FWHM
-    vb = qvals + _INTLIMIT * dqvals / _FWHM
+    x = abscissa * _INTLIMIT
+    localq = qvals[owner] + x * dqvals[owner] / _FWHM
+    weights *= _INTLIMIT * np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+    return localq, weights, offsets
+
+
+class _PointwisePlan:
+    """
+    Precomputed Q values and weights for pointwise resolution smearing with
+    fixed order Gaussian quadrature.
+
+    Parameters
+    ----------
+    qvals : array-like
+        The Q values for evaluation
+    dqvals : array-like
+        dQ values corresponding to each value in `qvals`. Each dqval is the
+        FWHM of a Gaussian approximation to the resolution kernel.
+    quad_order : int
+        Order of the Gaussian quadrature.
+    """
+
+    def __init__(self, qvals, dqvals, quad_order=17):
+        qvals = np.asarray(qvals, dtype=np.float64)
+        dqvals = np.asarray(dqvals, dtype=np.float64)
+
+        # get the gauss-legendre weights and abscissae
+        abscissa, weights = gauss_legendre(quad_order)
+
+        # integration between -3.5 and 3.5 sigma, weighted by the normal
+        # distribution
+        x = abscissa * _INTLIMIT
+        self.localq = (
+            qvals[..., np.newaxis] + x * (dqvals / _FWHM)[..., np.newaxis]
+        )
+        self.weights = (
+            weights * _INTLIMIT * np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+        )
 
-    va = va[..., np.newaxis]
-    vb = vb[..., np.newaxis]
+    def __call__(self, w, threads=-1, fkernel=kernel):
+        rvals = fkernel(self.localq, w, threads=threads)
+        return rvals @ self.weights
 
-    qvals_for_res = (abscissa[np.newaxis, :] * (vb - va) + vb + va) / 2.0
-    smeared_rvals = fkernel(qvals_for_res, w, threads=threads)
 
-    # smeared_rvals = np.reshape(smeared_rvals, (qvals.size, abscissa.size))
+class _ConstantPlan:
+    """
+    Precomputed evaluation grid and smearing operators for constant dQ/Q
+    resolution smearing.
+
+    The reflectivity is calculated on a log-spaced grid, convolved with a
+    Gaussian and then interpolated onto the requested Q values with a cubic
+    spline (not-a-knot end conditions, the same as ``splrep(..., s=0)``).
+    The grid, the Gaussian, the factorised spline collocation matrix and the
+    B-spline basis at the requested Q values are all calculated once.
+
+    Parameters
+    ----------
+    q : np.ndarray
+        Q values to evaluate the reflectivity at
+    resolution : float
+        Percentage dq/q resolution. dq specified as FWHM of a resolution
+        kernel.
+    """
+
+    def __init__(self, q, resolution):
+        q = np.asarray(q, dtype=np.float64)
+        self.shape = q.shape
+
+        resolution /= 100
+        gaussnum = 51
+        gaussgpoint = (gaussnum - 1) / 2
+
+        def gauss(x, s):
+            return 1.0 / s / np.sqrt(2 * np.pi) * np.exp(-0.5 * x**2 / s / s)
+
+        lowq = np.min(q)
+        highq = np.max(q)
+        if lowq <= 0:
+            lowq = 1e-6
+
+        start = np.log10(lowq) - 6 * resolution / _FWHM
+        finish = np.log10(highq * (1 + 6 * resolution / _FWHM))
+        interpnum = np.round(
+            np.abs(
+                1
+                * (np.abs(start - finish))
+                / (1.7 * resolution / _FWHM / gaussgpoint)
+            )
+        )
+        xtemp = _cached_linspace(start, finish, int(interpnum))
+        self.xlin = xlin = np.power(10.0, xtemp)
 
-    smeared_rvals *= np.atleast_2d(gaussvals * weights)
-    return np.sum(smeared_rvals, -1) * _INTLIMIT
+        # resolution smear over [-4 sigma, 4 sigma]
+        gauss_x = _cached_linspace(
+            -1.7 * resolution, 1.7 * resolution, gaussnum
+        )
+        self.gauss_y = gauss(gauss_x, resolution / _FWHM)
+        self.gauss_y *= gauss_x[1] - gauss_x[0]
+
+        # not-a-knot cubic spline through the smeared values
+        k = 3
+        t = np.r_[(xlin[0],) * (k + 1), xlin[2:-2], (xlin[-1],) * (k + 1)]
+        collocation = scipy.interpolate.BSpline.design_matrix(xlin, t, k)
+        self.collocation = scipy.sparse.linalg.splu(collocation.tocsc())
+        self.basis = scipy.interpolate.BSpline.design_matrix(
+            q.ravel(), t, k, extrapolate=True
+        ).tocsr()
+
+    def __call__(self, w, threads=-1, fkernel=kernel):
+        rvals = fkernel(self.xlin, w, threads=threads)
+        # equivalent to np.convolve(..., mode="same") on each row
+        smeared = scipy.ndimage.convolve1d(
+            rvals, self.gauss_y, axis=-1, mode="constant"
+        )
+        coefficients = self.collocation.solve(np.ascontiguousarray(smeared.T))
+        smeared = (self.basis @ coefficients).T
+        return np.reshape(smeared, rvals.shape[:-1] + self.shape)
 
 
-def _smeared_kernel_constant(q, w, resolution, threads=-1, fkernel=kernel):
+class _FFTConstantPlan:
+    """
+    Precomputed grid, Gaussian transform and interpolation operator for
+    constant dQ/Q resolution smearing by FFT convolution.
+
+    With constant dQ/Q the resolution kernel has the same shape everywhere
+    in ln(Q), so the reflectivity is calculated on a uniform ln(Q) grid and
+    convolved with the kernel using FFTs. The smeared values are
+    interpolated onto the requested Q values (4 point Lagrange).
+
+    Parameters
+    ----------
+    q : np.ndarray
+        Q values to evaluate the reflectivity at
+    resolution : float
+        Percentage dq/q resolution. dq specified as FWHM of a resolution
+        kernel.
+    oversampling : int, optional
+        Number of grid points per standard deviation of the resolution
+        kernel.
+
+    Notes
+    -----
+    The kernel is the same Gaussian (truncated at +/- 3.5 standard
+    deviations) as used for pointwise smearing with ``dq = resolution * q``.
+    Each grid cell is weighted by the exact probability it contains.
+    """
+
+    def __init__(self, q, resolution, oversampling=6):
+        q = np.asarray(q, dtype=np.float64)
+        self.shape = q.shape
+        qflat = q.ravel()
+
+        sigma = resolution / 100 / _FWHM
+        h = sigma / oversampling
+
+        lowq = np.min(q)
+        highq = np.max(q)
+        if lowq <= 0:
+            lowq = 1e-6
+
+        # Q' = Q(1 + eps), eps ~ N(0, sigma). In terms of d = ln(Q'/Q) the
+        # probability contained by each grid cell is:
+        lo = np.log1p(-_INTLIMIT * sigma)
+        hi = np.log1p(_INTLIMIT * sigma)
+        k = np.arange(int(np.floor(lo / h + 0.5)), int(np.ceil(hi / h - 0.5)))
+        k = np.r_[k, k[-1] + 1]
+        edges = np.r_[k - 0.5, k[-1] + 0.5] * h
+        x = np.clip(np.expm1(edges) / sigma, -_INTLIMIT, _INTLIMIT)
+        weights = np.diff(scipy.special.ndtr(x))
+
+        # the smeared values are calculated on a grid that spans the Q
+        # values, the reflectivity is needed over a wider range.
+        u0 = np.log(lowq) - h
+        npnts = int(np.ceil(np.log(highq / lowq) / h)) + 3
+        self.xlin = np.exp(u0 + np.arange(k[0], npnts + k[-1]) * h)
+
+        # the convolution is evaluated as a product of transforms. Only the
+        # part of the (circular) convolution that isn't wrapped is used.
+        self._nfft = scipy.fft.next_fast_len(self.xlin.size, real=True)
+        self._kernel_fft = scipy.fft.rfft(weights[::-1], self._nfft)
+        self._valid = slice(k.size - 1, k.size - 1 + npnts)
+
+        # local cubic (4 point Lagrange) interpolation onto the Q values
+        pos = (np.log(np.maximum(qflat, lowq)) - u0) / h
+        idx = np.clip(np.floor(pos).astype(int), 1, npnts - 3)
+        t = pos - idx
+        coefs = np.stack(
+            [
+                -t * (t - 1) * (t - 2) / 6,
+                (t + 1) * (t - 1) * (t - 2) / 2,
+                -(t + 1) * t * (t - 2) / 2,
+                (t + 1) * t * (t - 1) / 6,
+            ],
+            axis=-1,
+        )
+        cols = idx[:, np.newaxis] + np.arange(-1, 3)
+        rows = np.repeat(np.arange(qflat.size), 4)
+        self.operator = scipy.sparse.csr_array(
+            (coefs.ravel(), (rows, cols.ravel())),
+            shape=(qflat.size, npnts),
+        )
+
+    def __call__(self, w, threads=-1, fkernel=kernel):
+        rvals = fkernel(self.xlin, w, threads=threads)
+        smeared = scipy.fft.irfft(
+            scipy.fft.rfft(rvals, self._nfft, axis=-1) * self._kernel_fft,
+            self._nfft,
+            axis=-1,
+        )[..., self._valid]
+        smeared = (self.operator @ smeared.T).T
+        return np.reshape(smeared, rvals.shape[:-1] + self.shape)
+
+
+_SMEARING_PLANS = OrderedDict()
+_SMEARING_PLANS_LOCK = threading.Lock()
+_MAX_SMEARING_PLANS = 32
+_CONSTANT_PLANS = {"spline": _ConstantPlan, "fft": _FFTConstantPlan}
+
+
+def _smearing_plan(q, dq, quad_order=17, dq_engine="spline"):
+    """
+    Cached plan for resolution smearing.
+
+    Parameters
+    ----------
+    q : array-like
+        Q values to evaluate the reflectivity at
+    dq : float or array-like
+        If a float, the percentage dQ/Q for constant resolution smearing.
+        Otherwise dQ values (FWHM) for each of the Q points.
+    quad_order : int, optional
+        Order of the Gaussian quadrature for pointwise smearing.
+    dq_engine : {'spline', 'fft'}, optional
+        Method used for constant dQ/Q smearing.
+
+    Returns
+    -------
+    plan : {_ConstantPlan, _FFTConstantPlan, _PointwisePlan}
+        Called with the slab representation to calculate the smeared
+        reflectivity.
+
+    Notes
+    -----
+    Plans are keyed on the values of `(q, dq, quad_order)`, so a dataset
+    that is repeatedly evaluated (e.g. during a fit) only has its plan
+    created once. The most recently used plans are kept.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    if isinstance(dq, numbers.Real):
+        if dq_engine not in _CONSTANT_PLANS:
+            raise ValueError(
+                f"dq_engine must be one of {list(_CONSTANT_PLANS)}, not"
+                f" {dq_engine!r}"
+            )
+        key = (q.shape, q.tobytes(), float(dq), dq_engine)
+    else:
+        dq = np.asarray(dq, dtype=np.float64)
+        key = (q.shape, q.tobytes(), dq.tobytes(), quad_order)
+
+    with _SMEARING_PLANS_LOCK:
+        plan = _SMEARING_PLANS.get(key)
+        if plan is not None:
+            _SMEARING_PLANS.move_to_end(key)
+            return plan
+
+    if isinstance(dq, numbers.Real):
+        plan = _CONSTANT_PLANS[dq_engine](q, float(dq))
+    else:
+        plan = _PointwisePlan(q, dq, quad_order=quad_order)
+
+    with _SMEARING_PLANS_LOCK:
+        _SMEARING_PLANS[key] = plan
+        while len(_SMEARING_PLANS) > _MAX_SMEARING_PLANS:
+            _SMEARING_PLANS.popitem(last=False)
+    return plan
+
+
+def _smeared_kernel_constant(
+    q, w, resolution, threads=-1, fkernel=kernel, dq_engine="spline"
+):
     """
     Fast resolution smearing for constant dQ/Q.
 
@@ -1305,6 +2954,12 @@ def _smeared_kernel_constant(q, w, resolution, threads=-1, fkernel=kernel):
         Do you want to calculate in parallel? This option is only applicable if
         you are using the ``_creflect`` module. The option is ignored if using
         the pure python calculator, ``_reflect``.
+    fkernel : callable, optional
+        The reflectivity calculation kernel.
+    dq_engine : {'spline', 'fft'}, optional
+        Whether the convolution uses a B-spline representation of the
+        reflectivity, or FFTs on a uniform ln(Q) grid.
+
     Returns
     -------
     reflectivity : np.ndarray
@@ -1314,46 +2969,43 @@ def _smeared_kernel_constant(q, w, resolution, threads=-1, fkernel=kernel):
     if resolution < 0.5:
         return fkernel(q, w, threads=threads)
 
-    resolution /= 100
-    gaussnum = 51
-    gaussgpoint = (gaussnum - 1) / 2
-
-    def gauss(x, s):
-        return 1.0 / s / np.sqrt(2 * np.pi) * np.exp(-0.5 * x**2 / s / s)
-
-    lowq = np.min(q)
-    highq = np.max(q)
-    if lowq <= 0:
-        lowq = 1e-6
-
-    start = np.log10(lowq) - 6 * resolution / _FWHM
-    finish = np.log10(highq * (1 + 6 * resolution / _FWHM))
-    interpnum = np.round(
-        np.abs(
-            1
-            * (np.abs(start - finish))
-            / (1.7 * resolution / _FWHM / gaussgpoint)
-        )
-    )
-    xtemp = _cached_linspace(start, finish, int(interpnum))
-    xlin = np.power(10.0, xtemp)
+    plan = _smearing_plan(q, float(resolution), dq_engine=dq_engine)
+    return plan(w, threads=threads, fkernel=fkernel)
 
-    # resolution smear over [-4 sigma, 4 sigma]
-    gauss_x = _cached_linspace(-1.7 * resolution, 1.7 * resolution, gaussnum)
-    gauss_y = gauss(gauss_x, resolution / _FWHM)
 
-    rvals = fkernel(xlin, w, threads=threads)
-    smeared_rvals = np.convolve(rvals, gauss_y, mode="same")
-    smeared_rvals *= gauss_x[1] - gauss_x[0]
+def _smeared_kernel_constant_batch(
+    q, w, resolution, threads=-1, fkernel=None, dq_engine="spline"
+):
+    """
+    Fast resolution smearing for constant dQ/Q, for a stack of slab
+    representations. See `_smeared_kernel_constant`.
 
-    # interpolator = InterpolatedUnivariateSpline(xlin, smeared_rvals)
-    #
-    # smeared_output = interpolator(q)
+    Parameters
+    ----------
+    q : np.ndarray
+        Q values to evaluate the reflectivity at
+    w : np.ndarray
+        Stack of slab representations, shape (M, 2 + N, 4)
+    resolution : float
+        Percentage dq/q resolution. dq specified as FWHM of a resolution
+        kernel.
+    threads : int, optional
+        Number of threads for the calculation.
+    fkernel : callable
+        Vectorised kernel, with the signature of `abeles_vectorised`.
+    dq_engine : {'spline', 'fft'}, optional
+        Method used for the convolution.
 
-    tck = splrep(xlin, smeared_rvals)
-    smeared_output = splev(q, tck)
+    Returns
+    -------
+    reflectivity : np.ndarray
+        The resolution smeared reflectivity, shape `(M,) + q.shape`
+    """
+    if resolution < 0.5:
+        return fkernel(q, w, threads=threads)
 
-    return smeared_output
+    plan = _smearing_plan(q, float(resolution), dq_engine=dq_engine)
+    return plan(w, threads=threads, fkernel=fkernel)
 
 
 @lru_cache(maxsize=128)
@@ -1408,11 +3060,17 @@ class MixedReflectModel:
         the order of the Gaussian quadrature polynomial for doing the
         resolution smearing. default = 17. Don't choose less than 13. If
         quad_order == 'ultimate' then adaptive quadrature is used. Adaptive
-        quadrature will always work, but takes a _long_ time (2 or 3 orders
-        of magnitude longer). Fixed quadrature will always take a lot less
-        time. BUT it won't necessarily work across all samples. For
-        example, 13 points may be fine for a thin layer, but will be
-        atrocious at describing a multilayer with bragg peaks.
+        quadrature will always work, but takes longer (it places extra
+        points where the reflectivity varies rapidly). Fixed quadrature
+        will always take less time. BUT it won't necessarily work
+        across all samples. For example, 13 points may be fine for a thin
+        layer, but will be atrocious at describing a multilayer with bragg
+        peaks.
+        If quad_order == 'auto' the smallest order that agrees with an
+        adaptive quadrature calculation (to a relative tolerance of 1e-4) is
+        chosen for each region of the dataset. Regions that none of the
+        orders can describe to this tolerance (e.g. around a sharp critical
+        edge) use 101 points.
     dq_type : {'pointwise', 'constant'}, optional
         Chooses whether pointwise or constant dQ/Q resolution smearing (see
         `dq` keyword) is used. To use pointwise smearing the `x_err` keyword
@@ -1587,18 +3245,37 @@ class MixedReflectModel:
 
         y = np.zeros_like(x)
 
-        for scale, structure in zip(scales, self.structures):
-            y += reflectivity(
-                x + self.q_offset.value,
+        for i, (scale, structure) in enumerate(zip(scales, self.structures)):
+            # the same Structure may feature several times, or in other
+            # models, see `kernel_memo`
+            y += scale * _shared_reflectivity(
+                structure,
                 structure.slabs()[..., :4],
-                scale=scale,
-                dq=x_err,
-                threads=self.threads,
-                quad_order=self.quad_order,
+                x,
+                x_err,
+                self._quadrature(i),
+                self.threads,
+                self.q_offset.value,
             )
 
         return y + self.bkg.value
 
+    def _quadrature(self, i):
+        """
+        The `quad_order` to use for pointwise smearing of the `i`th
+        structure. For ``quad_order="auto"`` each structure has its own
+        object remembering the selected orders, because the selection
+        depends on the structure.
+        """
+        if self.quad_order != "auto":
+            return self.quad_order
+
+        autos = getattr(self, "_auto_quadratures", None)
+        if autos is None or len(autos) != len(self.structures):
+            autos = [_AutoQuadrature() for _ in self.structures]
+            self._auto_quadratures = autos
+        return autos[i]
+
     def logp(self):
         r"""
         Additional log-probability terms for the reflectivity model. Do not
@@ -3,6 +3,7 @@ import numpy as np
 from scipy.interpolate import PchipInterpolator as Pchip
 
 from refnx.reflect import Structure, Component
+from refnx.reflect.structure import _bracketed_slabs_key
 from refnx.analysis import Parameter, Parameters, possibly_create_parameter
 
 EPS = np.finfo(float).eps
@@ -213,6 +214,9 @@ class Spline(Component):
     def logp(self):
         return 0
 
+    def _slabs_key(self, structure):
+        return _bracketed_slabs_key(self, structure)
+
     def slabs(self, structure=None):
         """
         Slab representation of the spline, as an array
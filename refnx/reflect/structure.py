@@ -38,7 +38,7 @@ except ImportError:
 
 from refnx._lib import flatten, possibly_open_file
 from refnx.analysis import Parameters, Parameter, possibly_create_parameter
-from refnx.analysis.parameter import BaseParameter
+from refnx.analysis.parameter import BaseParameter, _bump_value_revision
 from refnx.reflect.interface import Interface, Erf, Step
 from refnx.reflect.reflect_model import get_reflect_backend, SpinChannel
 
@@ -46,7 +46,119 @@ from refnx.reflect.reflect_model import get_reflect_backend, SpinChannel
 contract_by_area = refcalc._contract_by_area
 
 
-class Structure(UserList):
+class _Versioned:
+    """
+    Mixin that counts the changes made to the attributes of an object.
+
+    Changes to the attributes of a Structure, Component or Scatterer (e.g.
+    replacing a Parameter, or changing the interfaces) can alter the slab
+    representation without a Parameter value changing. They therefore
+    increment `_version`, and invalidate the cached slabs in
+    `Structure.slabs`.
+    """
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        d = self.__dict__
+        d["_version"] = d.get("_version", 0) + 1
+        _bump_value_revision()
+
+    def __getstate__(self):
+        # cached slabs are keyed on per-process counters
+        d = self.__dict__.copy()
+        d.pop("_slabs_cache", None)
+        return d
+
+
+def _slabs_key(structure, *objs, extra=()):
+    """
+    Key describing the state that the slabs of a cached Component depend on.
+
+    Parameters
+    ----------
+    structure : refnx.reflect.Structure
+        The Structure hosting the Component.
+    objs : sequence of {refnx.reflect.Component, refnx.reflect.Scatterer}
+        The objects whose parameters the slab representation depends on.
+    extra : sequence of float
+        Any other values that the slab representation depends on.
+
+    Returns
+    -------
+    key : tuple
+        `(meta, values)` where `meta` contains the identity and version of
+        `objs`, and `values` are the values of all their parameters.
+    """
+    meta = tuple((id(obj), obj.__dict__.get("_version", 0)) for obj in objs)
+    meta += (getattr(structure, "wavelength", None),)
+    values = np.array(Parameters([obj.parameters for obj in objs]))
+    values = np.concatenate([values, extra])
+    return meta, values
+
+
+def _bracketed_slabs_key(component, structure):
+    """
+    `_slabs_key` for a Component whose slabs depend on the Components either
+    side of it, and the solvent of the Structure (e.g. `Spline`).
+    """
+    try:
+        loc = structure.index(component)
+    except ValueError:
+        return None
+
+    left = structure[loc - 1]
+    right = structure[(loc + 1) % len(structure)]
+    solvent = getattr(structure, "solvent", None)
+    if solvent is None:
+        return None
+    solvent = complex(solvent)
+    return _slabs_key(
+        structure,
+        component,
+        left,
+        right,
+        extra=(solvent.real, solvent.imag),
+    )
+
+
+def _component_slabs(component, structure):
+    """
+    The slabs of a Component. If the Component supplies a key describing its
+    state (`Component._slabs_key`) the slabs are cached, and only
+    recalculated when the key changes.
+    """
+    key = component._slabs_key(structure)
+    if key is None:
+        return component.slabs(structure=structure)
+
+    cache = component.__dict__.get("_slabs_cache")
+    if (
+        cache is not None
+        and cache[0][0] == key[0]
+        and np.array_equal(cache[0][1], key[1])
+    ):
+        return cache[1]
+
+    slabs = component.slabs(structure=structure)
+    component.__dict__["_slabs_cache"] = (key, slabs)
+    return slabs
+
+
+def _versions(objs):
+    # identity and version of objects, of the Scatterers/Components they hold
+    # as attributes, and of the Components in a Structure or Stack
+    key = []
+    for obj in objs:
+        key.append((id(obj), obj.__dict__.get("_version", 0)))
+        for v in obj.__dict__.values():
+            if isinstance(v, _Versioned):
+                key.append((id(v), v.__dict__.get("_version", 0)))
+        if isinstance(obj, UserList):
+            key.append(_versions(obj.data))
+    return tuple(key)
+
+
+class Structure(_Versioned, UserList):
     """
     Represents the interfacial Structure of a reflectometry sample.
     Successive Components are added to the Structure to construct the
@@ -302,6 +414,33 @@ class Structure(UserList):
         if not len(self):
             return None
 
+        # over-ride the wavelength
+        if "wavelength" in kwds:
+            self.wavelength = float(kwds["wavelength"])
+
+        # return the cached slabs if no value of the Structure's parameters,
+        # or attribute of the Structure (and its Components), has changed
+        # since they were made. Parameters that aren't part of the Structure
+        # (e.g. the scale and background of a model) don't invalidate them.
+        cache = self.__dict__.get("_slabs_cache")
+        if cache is not None:
+            meta, params, values, slabs = cache
+            if meta == _versions([self]) and np.array_equal(
+                values, [p.value for p in params]
+            ):
+                return np.copy(slabs)
+
+        slabs = self._slabs()
+        # the key is made after the calculation because attributes may be
+        # set during it.
+        meta = _versions([self])
+        if cache is None or cache[0] != meta:
+            params = self.parameters.flattened()
+        values = np.array([p.value for p in params])
+        self.__dict__["_slabs_cache"] = (meta, params, values, slabs)
+        return np.copy(slabs)
+
+    def _slabs(self):
         if not (
             isinstance(self.data[-1], (Slab, MixedSlab, MagneticSlab))
             and isinstance(self.data[0], (Slab, MixedSlab, MagneticSlab))
@@ -311,10 +450,6 @@ class Structure(UserList):
                 " need to be Slabs"
             )
 
-        # over-ride the wavelength
-        if "wavelength" in kwds:
-            self.wavelength = float(kwds["wavelength"])
-
         # Each layer can be given a different type of roughness profile
         # that defines transition between successive layers.
         # The default interface is specified by None (= Gaussian roughness)
@@ -322,7 +457,7 @@ class Structure(UserList):
         if all([i is None for i in interfaces]):
             # if all the interfaces are Gaussian, then simply concatenate
             # the default slabs property of each component.
-            sl = [c.slabs(structure=self) for c in self.components]
+            sl = [_component_slabs(c, self) for c in self.components]
             slabs = _concatenate_slabs(sl)
         else:
             # there is a non-default interfacial roughness, create a microslab
@@ -374,7 +509,7 @@ class Structure(UserList):
             `Structure.slabs` method for a description of the array.
         """
         # solvate the slabs from each component
-        sl = [c.slabs(structure=self) for c in self.components]
+        sl = [_component_slabs(c, self) for c in self.components]
         total_slabs = _concatenate_slabs(sl)
         if self.is_magnetic:
             raise RuntimeError(
@@ -1037,7 +1172,7 @@ def _concatenate_slabs(sl):
         return np.concatenate([s for s in sl if s is not None])
 
 
-class Scatterer:
+class Scatterer(_Versioned):
     """
     Abstract base class for something that will have a scattering length
     density
@@ -1311,7 +1446,7 @@ def possibly_create_scatterer(obj):
         return SLD(obj)
 
 
-class Component:
+class Component(_Versioned):
     """
     A base class for describing the structure of a subset of an interface.
 
@@ -1485,6 +1620,25 @@ class Component:
         """
         return 0
 
+    def _slabs_key(self, structure):
+        """
+        A key describing everything that `Component.slabs` depends on, used
+        by `Structure.slabs` to cache the slab representation. Components
+        that are expensive to calculate can override this method, e.g. by
+        returning `_slabs_key(structure, self)`. If `None` is returned the
+        slabs aren't cached.
+
+        Parameters
+        ----------
+        structure : refnx.reflect.Structure
+            The Structure hosting the Component.
+
+        Returns
+        -------
+        key : {None, tuple}
+        """
+        return None
+
 
 class Slab(Component):
     """
@@ -1818,12 +1972,14 @@ class Stack(Component, UserList):
         if not len(self):
             return None
 
-        # a sub stack member may want to know what the solvent is.
+        # a sub stack member may want to know what the solvent is. This is
+        # derived from the hosting structure, so isn't counted as a change
+        # to the Stack.
         if structure is not None:
-            self.solvent = structure.solvent
+            self.__dict__["solvent"] = structure.solvent
 
         repeats = int(round(abs(self.repeats.value)))
-        sl = [c.slabs(structure=self) for c in self.components]
+        sl = [_component_slabs(c, self) for c in self.components]
 
         slabs = _concatenate_slabs(sl)
 
@@ -92,3 +92,18 @@ class Test__InteractiveModeller:
             self.app.do_fit(None)
         except ValueError:
             pass
+
+    def test_update_model(self):
+        # without a running event loop each change is drawn straight away
+        app = self.app
+        chisqr = app.chisqr.value
+        z = app.theoretical_plot_sld.get_xdata()
+
+        app.model_view.w_bkg.value = 4e-5
+        assert_(app.chisqr.value != chisqr)
+        # an instrumental parameter doesn't alter the SLD profile
+        assert_(app.theoretical_plot_sld.get_xdata() is z)
+
+        slab_view = app.model_view.structure_view.slab_views[2]
+        slab_view.w_thick.value = 150
+        assert_(app.theoretical_plot_sld.get_xdata() is not z)
@@ -93,6 +93,30 @@ class TestLipidLeaflet:
         )
         assert_allclose(slabs[1, 4], 0)
 
+    def test_slabs_cache(self):
+        # the slabs of a LipidLeaflet in a Structure are cached
+        si = SLD(2.07)
+        d2o = SLD(6.36)
+        s = si | self.leaflet | d2o(0, 3)
+        s.slabs()
+        slabs = self.leaflet._slabs_cache[1]
+        s[0].rough.value = 1
+        s.slabs()
+        assert self.leaflet._slabs_cache[1] is slabs
+
+        self.leaflet.thickness_heads.value = 10
+        assert_allclose(s.slabs()[1, 0], 10)
+        assert self.leaflet._slabs_cache[1] is not slabs
+
+        # attributes of the solvents are tracked
+        h2o = SLD(-0.56)
+        self.leaflet.head_solvent = h2o
+        s.slabs()
+        slabs = self.leaflet._slabs_cache[1]
+        h2o.real = Parameter(1.23)
+        assert_allclose(s.slabs()[1], self.leaflet.slabs()[0])
+        assert self.leaflet._slabs_cache[1] is not slabs
+
     def test_initialisation_with_SLD(self):
         # we should be able to initialise with SLD objects
         heads = SLD(6.01e-4 + 0j)
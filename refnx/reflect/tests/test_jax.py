@@ -86,6 +86,110 @@ class TestJAX:
         logl, grad = vg(np.array(self.objective.varying_parameters()))
         assert_allclose(-logl, self.objective.nll())
 
+    @pytest.mark.filterwarnings(
+        "ignore:The _abeles_jax_ffi extension:RuntimeWarning"
+    )
+    def test_batched_objective(self):
+        # logl/generative evaluated for a whole ensemble of walkers at once
+        obj = compile_objective(self.objective)
+        rng = np.random.default_rng(0)
+        p0 = np.array(self.objective.varying_parameters())
+        pvals = p0 * (1 + 1e-3 * rng.standard_normal((5, p0.size)))
+
+        logl = [self.objective.logl(p) for p in pvals]
+        assert_allclose(obj.logl_batch(pvals), logl)
+        generative = [self.objective.generative(p) for p in pvals]
+        assert_allclose(obj.generative_batch(pvals), generative)
+
+    @pytest.mark.filterwarnings(
+        "ignore:The _abeles_jax_ffi extension:RuntimeWarning"
+    )
+    def test_model_jacobian(self, monkeypatch):
+        # exact derivatives of the reflectivity, used by Objective.covar.
+        # A Structure made from Slabs would use the C derivative kernel,
+        # make sure the jax route is taken.
+        from refnx.reflect import reflect_model
+
+        def no_slab_jacobian(*args, **kwds):
+            raise NotImplementedError
+
+        data = self.objective.data
+        pvals = np.array(self.objective.varying_parameters())
+        jac_slab = self.model.jacobian(data.x, data.x_err)
+        monkeypatch.setattr(
+            reflect_model, "_slab_model_jacobian", no_slab_jacobian
+        )
+
+        jac = self.model.jacobian(data.x, data.x_err)
+        assert_allclose(jac, jac_slab, rtol=1e-7, atol=1e-12)
+        assert jac.shape == (len(data), len(pvals))
+        assert_allclose(
+            jac,
+            approx_derivative(
+                self.objective.generative, pvals, method="3-point"
+            ),
+            rtol=1e-5,
+            atol=1e-8 * np.max(np.abs(jac)),
+        )
+        self.objective.setp(pvals)
+
+        covar = self.objective.covar()
+        with monkeypatch.context() as m:
+            m.setattr(ReflectModel, "jacobian", None)
+            assert self.objective._jacobian() is None
+            covar_numerical = self.objective.covar()
+        assert_allclose(
+            np.sqrt(np.diag(covar)),
+            np.sqrt(np.diag(covar_numerical)),
+            rtol=1e-3,
+        )
+
+        # unsupported configurations fall back to numerical differentiation
+        self.model.q_offset.value = 0.001
+        with pytest.raises(NotImplementedError):
+            self.model.jacobian(data.x, data.x_err)
+        assert self.objective._jacobian() is None
+
+    @pytest.mark.filterwarnings(
+        "ignore:The _abeles_jax_ffi extension:RuntimeWarning"
+    )
+    def test_jax_fit(self):
+        co = compile_objective(self.objective)
+        x0 = np.array(self.objective.varying_parameters())
+        v = np.linspace(-1, 1, co.n_free)
+        hessian = approx_derivative(lambda x: np.asarray(co.grad_logl(x)), x0)
+        assert_allclose(co.hvp_logl(x0, v), hessian @ v, rtol=1e-6)
+
+        data = Data1D(
+            Path(refnx.__file__).parent / "analysis" / "tests" / "e361r.txt"
+        )
+        data.x_err = 0.05 * data.x
+        film = SLD(2.0)
+        s = SLD(2.07) | SLD(3.47)(15, 3) | film(250, 3) | SLD(6.36)(0, 3)
+        s[2].thick.setp(vary=True, bounds=(100, 300))
+        s[2].rough.setp(vary=True, bounds=(1, 10))
+        film.real.setp(vary=True, bounds=(0, 3))
+        objective = Objective(ReflectModel(s, bkg=3e-6), data)
+        x0 = np.array(objective.varying_parameters())
+
+        fitter = CurveFitter(objective)
+        with pytest.raises(ValueError):
+            fitter.fit("jax-lbfgs", target="nlpost")
+
+        res0 = fitter.fit("L-BFGS-B", verbose=False)
+
+        for method in ["jax-lbfgs", "jax-trust"]:
+            objective.setp(x0)
+            res = fitter.fit(method, verbose=False)
+            assert res.success
+            assert_allclose(res.x, res0.x, rtol=1e-4)
+            # parameters and uncertainties are written back
+            assert_allclose(objective.nll(), res.fun)
+            assert_allclose(
+                [p.stderr for p in objective.varying_parameters()],
+                res.stderr,
+            )
+
     @pytest.mark.filterwarnings(
         "ignore:Numba will use object mode:UserWarning"
     )
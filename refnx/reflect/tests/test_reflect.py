@@ -2,9 +2,13 @@ import sys
 from importlib import resources
 from pathlib import Path
 import pickle
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from numpy.testing import assert_almost_equal, assert_equal, assert_allclose
+import scipy.integrate
+import scipy.interpolate
 import scipy.stats as stats
 import pytest
 
@@ -19,6 +23,7 @@ from refnx.analysis import (
     Parameter,
     Interval,
     Parameters,
+    GlobalObjective,
 )
 from refnx.reflect import (
     SLD,
@@ -28,14 +33,17 @@ from refnx.reflect import (
     Footprint,
     PolarisedReflectModel,
     MagneticSlab,
+    MixedSlab,
     SpinChannel,
     MixedReflectModel,
     reflectivity,
+    reflectivity_batch,
     Structure,
     Slab,
     FresnelTransform,
     choose_dq_type,
     use_reflect_backend,
+    kernel_memo,
 )
 import refnx.reflect.tests
 import refnx.reflect.reflect_model as reflect_model
@@ -249,6 +257,55 @@ class TestReflect:
         assert_(0.7 * (sfinish - sstart) > (pfinish - pstart))
     """
 
+    def test_worker_pool(self):
+        # the C kernels use a persistent pool of worker threads
+        from refnx.reflect import _creflect
+
+        coefs = np.array(
+            [
+                [0, 0, 0, 0],
+                [300, 3, 1e-3, 3],
+                [10, 3.47, 1e-3, 3],
+                [0, 6.36, 0, 3],
+            ]
+        )
+        x = np.linspace(0.01, 0.2, 1001)
+        expected = _creflect.abeles(x, coefs, threads=1)
+
+        try:
+            _creflect.resize_pool(3)
+            assert _creflect.get_pool_size() == 3
+            for threads in [2, 4, 7]:
+                assert_allclose(
+                    _creflect.abeles(x, coefs, threads=threads), expected
+                )
+                assert_allclose(
+                    _creflect.parratt(x, coefs, threads=threads),
+                    _creflect.parratt(x, coefs, threads=1),
+                )
+            # more threads than points
+            assert_allclose(
+                _creflect.abeles(x[:3], coefs, threads=7), expected[:3]
+            )
+
+            # calculations still proceed if there are no workers
+            _creflect.shutdown_pool()
+            assert _creflect.get_pool_size() == 0
+            assert_allclose(_creflect.abeles(x, coefs, threads=4), expected)
+
+            # concurrent callers share the pool
+            _creflect.resize_pool(2)
+            with ThreadPoolExecutor(4) as executor:
+                res = executor.map(
+                    lambda th: _creflect.abeles(x, coefs, threads=th),
+                    [3] * 16,
+                )
+                for r in res:
+                    assert_allclose(r, expected)
+        finally:
+            # back to growing on demand
+            _creflect.resize_pool(-1)
+
     @pytest.mark.parametrize("backend", BACKENDS)
     @pytest.mark.filterwarnings("ignore:Using the SLOW")
     def test_compare_kernel0(self, backend):
@@ -391,6 +448,83 @@ class TestReflect:
         )
         assert_allclose(y, y_test)
 
+    def test_abeles_grad(self):
+        from scipy.optimize._numdiff import approx_derivative
+        from refnx.reflect import _creflect
+
+        w = np.array(
+            [
+                [0, 2.07, 0, 0],
+                [100, 3.45, 0.1, 3],
+                [-200, 5.0, -0.01, 1],
+                [0, 6.0, 0.02, 5],
+            ]
+        )
+        x = np.geomspace(0.005, 0.3, 41)
+        R, dR = _creflect.abeles_grad(x, w, scale=1.1, bkg=2e-6, threads=1)
+        assert_allclose(R, _creflect.abeles(x, w, scale=1.1, bkg=2e-6))
+        assert dR.shape == x.shape + w.shape
+
+        def f(coefs):
+            return _creflect.abeles(
+                x, coefs.reshape(w.shape), scale=1.1, bkg=2e-6, threads=1
+            )
+
+        expected = approx_derivative(
+            f, w.ravel(), method="3-point", abs_step=1e-4
+        )
+        norm = np.max(np.abs(expected), axis=0)
+        norm[norm == 0] = 1
+        assert_allclose(
+            dR.reshape(x.size, -1) / norm, expected / norm, atol=1e-5
+        )
+        # unused entries
+        assert_equal(dR[:, 0, [0, 2, 3]], 0)
+        assert_equal(dR[:, -1, 0], 0)
+
+        # multidimensional q and multithreaded calculation
+        R2, dR2 = _creflect.abeles_grad(
+            x.reshape(41, 1), w, scale=1.1, bkg=2e-6, threads=4
+        )
+        assert_allclose(R2.ravel(), R)
+        assert_allclose(dR2.reshape(dR.shape), dR)
+
+    @pytest.mark.skipif("numba" not in BACKENDS, reason="numba not available")
+    def test_numba_vectorised(self):
+        from refnx.reflect import _numba_reflect
+
+        w = np.array(
+            [
+                [0, 2.07, 0, 0],
+                [100, 3.45, 0.1, 3],
+                [200, 5.0, 0.01, 1],
+                [0, 6.0, 0, 5],
+            ]
+        )
+        N = 64
+        rng = np.random.default_rng(0)
+        w_noise = w * (1 + 0.05 * rng.standard_normal((N,) + w.shape))
+        x = np.geomspace(0.005, 0.5, 1001).reshape(7, 143)
+        scale = rng.normal(loc=1, scale=0.02, size=N)
+        bkg = rng.normal(loc=1e-6, scale=1e-7, size=N)
+
+        y_test = refnx.reflect._creflect.abeles_vectorised(
+            x, w_noise, bkg=bkg, scale=scale
+        )
+        for f in [
+            reflect_model.get_reflect_backend("numba_vectorised"),
+            _numba_reflect.numba_parratt_vectorised,
+        ]:
+            for threads in [1, -1]:
+                y = f(x, w_noise, bkg=bkg, scale=scale, threads=threads)
+                assert_equal(y.shape, (N,) + x.shape)
+                assert_allclose(y, y_test, rtol=1e-12)
+
+        # reflectivity_batch uses the vectorised numba kernels
+        with use_reflect_backend("numba"):
+            R = reflectivity_batch(x, w_noise, scale=scale, bkg=bkg, dq=0)
+        assert_allclose(R, y_test, rtol=1e-12)
+
     @pytest.mark.skipif("torch" not in BACKENDS, reason="torch not available")
     @pytest.mark.filterwarnings(
         # message text differs by Python version: "is not supported in
@@ -609,6 +743,209 @@ class TestReflect:
         r2 = rff3_modelc.model(_q[250:])
         assert_allclose(r, np.r_[r1, r2])
 
+    @pytest.mark.filterwarnings("ignore:Using the SLOW")
+    def test_reflectivity_batch(self):
+        # stacked slab representations give the same answer as individual
+        # calculations
+        w1 = np.array([[0, 2.07, 0, 0], [100, 3.47, 0, 3], [0, 6.36, 0, 4]])
+        w2 = np.array(
+            [
+                [0, 2.07, 0, 0],
+                [100, 3.47, 0, 3],
+                [30, 1, 0, 2],
+                [10, 4, 0.1, 5],
+                [0, 6.36, 0, 4],
+            ]
+        )
+        stack = reflect_model.pad_slabs([w1, w2])
+        assert_equal(stack.shape, (2, 5, 4))
+
+        q = self.qvals361
+        dq = 0.05 * q
+        scale = np.array([0.9, 1.1])
+        bkg = np.array([1e-7, 2e-6])
+
+        for _dq in [0, 5.0, dq]:
+            R = reflectivity_batch(q, stack, scale=scale, bkg=bkg, dq=_dq)
+            assert_equal(R.shape, (2,) + q.shape)
+            for i, w in enumerate([w1, w2]):
+                assert_allclose(
+                    R[i],
+                    reflectivity(q, w, scale=scale[i], bkg=bkg[i], dq=_dq),
+                    rtol=1e-12,
+                )
+
+        # multidimensional q
+        R = reflectivity_batch(q.reshape(-1, 1), stack, dq=dq.reshape(-1, 1))
+        assert_equal(R.shape, (2, len(q), 1))
+
+        # a non-vectorised backend gets looped over
+        with use_reflect_backend("python"):
+            R2 = reflectivity_batch(q, stack, dq=dq)
+        assert_allclose(R2, R[..., 0])
+
+        with pytest.raises(ValueError):
+            reflectivity_batch(q, w1)
+
+    def test_model_batch(self):
+        model = self.model361
+        objective = Objective(
+            model, (self.qvals361, self.rvals361, self.evals361)
+        )
+        p0 = np.array(objective.varying_parameters())
+        rng = np.random.default_rng(0)
+        pvals = p0 * (1 + 0.02 * rng.standard_normal((10, p0.size)))
+
+        x_err = 0.05 * self.qvals361
+        for dq_type in ["pointwise", "constant"]:
+            model.dq_type = dq_type
+            expected = []
+            for pv in pvals:
+                objective.setp(pv)
+                expected.append(model(self.qvals361, x_err=x_err))
+            objective.setp(p0)
+
+            R = model.model_batch(self.qvals361, pvals, x_err=x_err)
+            assert_allclose(R, np.array(expected), rtol=1e-12)
+            # parameters are restored
+            assert_equal(np.array(objective.varying_parameters()), p0)
+
+        # a varying resolution means different snapshots have to be
+        # calculated separately
+        model.dq.vary = True
+        p0 = np.array(objective.varying_parameters())
+        pvals = np.tile(p0, (3, 1))
+        pvals[:, -1] = [3.0, 5.0, 7.0]
+        R = model.model_batch(self.qvals361, pvals)
+        for i, pv in enumerate(pvals):
+            assert_allclose(R[i], model(self.qvals361, p=pv))
+
+    def test_batch_subclasses(self):
+        # subclasses that override `model` aren't calculated from slab
+        # snapshots
+        class DoubledModel(ReflectModel):
+            def model(self, x, p=None, x_err=None):
+                return 2 * super().model(x, p=p, x_err=x_err)
+
+        model = DoubledModel(self.structure361, bkg=2e-6)
+        assert not model._batch_states
+        assert self.model361._batch_states
+
+        objective = Objective(
+            model, (self.qvals361, self.rvals361, self.evals361)
+        )
+        p0 = np.array(objective.varying_parameters())
+        rng = np.random.default_rng(0)
+        pvals = p0 * (1 + 0.02 * rng.standard_normal((5, p0.size)))
+        logl = [objective.logl(pv) for pv in pvals]
+        generative = [objective.generative(pv) for pv in pvals]
+        objective.setp(p0)
+        assert_allclose(objective.logl_batch(pvals), logl)
+        assert_allclose(objective.generative_batch(pvals), generative)
+        assert_allclose(
+            model.model_batch(self.qvals361, pvals),
+            [model(self.qvals361, p=pv) for pv in pvals],
+        )
+
+        # PolarisedReflectModel
+        air = SLD(0.0)
+        l1 = MagneticSlab(200, 4, 0, 1, 180)
+        back = MagneticSlab(0, 4, 0, 0, 90)
+        s = air | l1 | back
+        l1.thick.setp(vary=True, bounds=(150, 250))
+        _q = np.geomspace(0.01, 0.2, 100)
+        q = np.full((200, 4), np.nan)
+        q[:100, 0] = _q
+        q[100:, 3] = _q
+        model = PolarisedReflectModel(s, dq_type="constant", dq=1.0)
+        assert not model._batch_states
+
+        y = model(q)
+        objective = Objective(model, (q, y, 0.1 * y))
+        pvals = np.array([[180.0], [200.0], [220.0]])
+        logl = [objective.logl(pv) for pv in pvals]
+        objective.setp([200.0])
+        assert_allclose(objective.logl_batch(pvals), logl)
+
+    def test_model_jacobian(self, monkeypatch):
+        from scipy.optimize._numdiff import approx_derivative
+
+        si = SLD(2.07, name="Si")
+        sio2 = SLD(3.47 + 0.01j, name="SiO2")
+        film = SLD(1.5 + 0.02j, name="film")
+        d2o = SLD(6.36 + 0.003j, name="D2O")
+        s = si | sio2(15, 3) | film(120, 4) | d2o(0, 5)
+        s[1].vfsolv.value = 0.1
+        s[2].vfsolv.setp(0.2, vary=True, bounds=(0, 1))
+        for p in [
+            s[1].thick,
+            s[2].thick,
+            s[2].rough,
+            s[3].rough,
+            sio2.imag,
+            film.real,
+            film.imag,
+            si.real,
+            d2o.real,
+        ]:
+            p.setp(vary=True, bounds=(-100, 1000))
+        # a Parameter used in two places
+        s[1].rough = s[3].rough
+
+        q = np.linspace(0.008, 0.25, 51)
+        for reverse, solvent, dq_type in [
+            (False, None, "constant"),
+            (True, None, "pointwise"),
+            (True, SLD(-0.56 + 0.001j), "constant"),
+        ]:
+            s.reverse_structure = reverse
+            s.solvent = solvent
+            model = ReflectModel(s, bkg=2e-6, dq=4.0, dq_type=dq_type)
+            model.scale.setp(vary=True, bounds=(0, 2))
+            model.bkg.setp(vary=True, bounds=(0, 1))
+            x_err = 0.03 * q
+
+            pvals = model.parameters.varying_parameters()
+            p0 = np.array(pvals)
+
+            def f(p):
+                pvals.pvals = p
+                return model(q, x_err=x_err)
+
+            expected = approx_derivative(
+                f, p0, method="3-point", rel_step=1e-6
+            )
+            pvals.pvals = p0
+            jac = model.jacobian(q, x_err=x_err)
+            norm = np.max(np.abs(expected), axis=0)
+            assert_allclose(jac / norm, expected / norm, atol=1e-5)
+
+        # the exact Jacobian is used for the covariance matrix
+        objective = Objective(
+            self.model361,
+            (self.qvals361, self.rvals361, self.evals361),
+            transform=Transform("logY"),
+        )
+        covar = objective.covar()
+        with monkeypatch.context() as m:
+            m.setattr(ReflectModel, "jacobian", None)
+            covar_numerical = objective.covar()
+        assert_allclose(
+            np.sqrt(np.diag(covar)),
+            np.sqrt(np.diag(covar_numerical)),
+            rtol=1e-3,
+        )
+
+        # only Slabs with unconstrained parameters are supported
+        model = ReflectModel(s)
+        s[2].thick.constraint = 2 * s[1].thick
+        with pytest.raises(NotImplementedError):
+            reflect_model._slab_model_jacobian(model, q)
+        s[2].thick.constraint = None
+        s.insert(2, MixedSlab(10, [si, sio2], [0.5, 0.5], 3))
+        with pytest.raises(NotImplementedError):
+            reflect_model._slab_model_jacobian(model, q)
+
     def test_mixed_reflectivity_model(self):
         # test that mixed area model works ok.
 
@@ -798,6 +1135,295 @@ class TestReflect:
 
         assert_allclose(calc, calc2, rtol=0.011)
 
+    def test_adaptive_smearing(self):
+        # the vectorised adaptive quadrature should agree with
+        # scipy.integrate.quad for a multilayer with Bragg peaks
+        unit_cell = np.array([[50, 6.36, 0, 3], [50, -0.56, 0, 3]])
+        w = np.vstack([[0, 0, 0, 0], *([unit_cell] * 20), [0, 2.07, 0, 3]])
+        q = np.linspace(0.005, 0.3, 26)
+        dq = 0.05 * q
+        _FWHM = reflect_model._FWHM
+        _INTLIMIT = reflect_model._INTLIMIT
+
+        def integrand(x, qval, dqval):
+            localq = np.array([qval + x * dqval / _FWHM])
+            return reflect_model.kernel(localq, w)[0] * stats.norm.pdf(x)
+
+        expected = [
+            scipy.integrate.quad(
+                integrand, -_INTLIMIT, _INTLIMIT, epsabs=0, args=(qv, dqv)
+            )[0]
+            for qv, dqv in zip(q, dq)
+        ]
+        calc = reflect_model._smeared_kernel_adaptive(q, w, dq)
+        assert_allclose(calc, expected, rtol=1e-7)
+
+        # fixed order quadrature is not good enough for this system
+        calc = reflect_model._smeared_kernel_pointwise(q, w, dq)
+        assert not np.allclose(calc, expected, rtol=1e-3)
+
+        calc = reflectivity(q, w, dq=dq, quad_order="ultimate")
+        assert_allclose(calc, expected, rtol=1e-7)
+
+    def test_smearing_plan(self):
+        q = np.linspace(0.005, 0.3, 301)
+        dq = 0.05 * q
+        w = self.structure361.slabs()[:, :4]
+
+        # plans are cached on the values of (q, dq, quad_order)
+        plan = reflect_model._smearing_plan(q, dq, quad_order=17)
+        assert reflect_model._smearing_plan(np.copy(q), 0.05 * q) is plan
+        assert reflect_model._smearing_plan(q, dq, quad_order=13) is not plan
+        assert reflect_model._smearing_plan(q, 5.0) is not plan
+
+        # pointwise plan reproduces the quadrature
+        abscissa, weights = reflect_model.gauss_legendre(17)
+        x = abscissa * reflect_model._INTLIMIT
+        localq = q[:, None] + x * dq[:, None] / reflect_model._FWHM
+        expected = (
+            reflect_model.kernel(localq, w)
+            * stats.norm.pdf(x)
+            * weights
+            * reflect_model._INTLIMIT
+        ).sum(-1)
+        assert_allclose(plan(w), expected, rtol=1e-13)
+
+        # constant plan is equivalent to convolving on the log-spaced grid
+        # followed by spline interpolation
+        plan = reflect_model._smearing_plan(q, 5.0)
+        xlin = plan.xlin
+        gauss_x = np.linspace(-0.085, 0.085, 51)
+        gauss_y = stats.norm.pdf(gauss_x, scale=0.05 / reflect_model._FWHM)
+        smeared = np.convolve(reflect_model.kernel(xlin, w), gauss_y, "same")
+        smeared *= gauss_x[1] - gauss_x[0]
+        tck = scipy.interpolate.splrep(xlin, smeared)
+        expected = scipy.interpolate.splev(q, tck)
+        assert_allclose(plan(w), expected, rtol=1e-12)
+        assert_allclose(reflectivity(q, w, dq=5.0), expected, rtol=1e-12)
+
+        stack = np.stack([w, w])
+        calc = reflectivity_batch(q, stack, dq=5.0)
+        assert_allclose(calc, np.stack([expected, expected]), rtol=1e-12)
+
+        # the least recently used plans are discarded
+        for i in range(reflect_model._MAX_SMEARING_PLANS + 1):
+            reflect_model._smearing_plan(q + i, 5.0)
+        assert reflect_model._smearing_plan(q, 5.0) is not plan
+
+    def test_fft_constant_smearing(self):
+        # a multilayer with Bragg peaks is difficult for constant smearing
+        q = np.linspace(0.005, 0.3, 501)
+        unit_cell = np.array([[50, 6.36, 0, 3], [50, -0.56, 0, 3]])
+        w = np.vstack([[0, 0, 0, 0], *([unit_cell] * 20), [0, 2.07, 0, 3]])
+
+        expected = reflectivity(q, w, dq=0.05 * q, quad_order="ultimate")
+        calc = reflectivity(q, w, dq=5.0, dq_engine="fft")
+        assert_allclose(calc, expected, rtol=0.01)
+
+        # and is more accurate than the spline engine
+        spline = reflectivity(q, w, dq=5.0, dq_engine="spline")
+        assert np.max(np.abs(calc / expected - 1)) < 0.1 * np.max(
+            np.abs(spline / expected - 1)
+        )
+
+        plan = reflect_model._smearing_plan(q, 5.0, dq_engine="fft")
+        assert isinstance(plan, reflect_model._FFTConstantPlan)
+        assert reflect_model._smearing_plan(q, 5.0) is not plan
+
+        # batch calculation and multidimensional q
+        stack = [w, self.structure361.slabs()[:, :4]]
+        calc = reflectivity_batch(
+            q, reflect_model.pad_slabs(stack), dq=5.0, dq_engine="fft"
+        )
+        assert_allclose(calc[0], expected, rtol=0.01)
+        assert_allclose(
+            calc[1],
+            reflectivity(q, stack[1], dq=5.0, dq_engine="fft"),
+            rtol=1e-12,
+        )
+        calc = reflectivity(
+            q[:500].reshape(25, 20), w, dq=5.0, dq_engine="fft"
+        )
+        assert_allclose(calc.ravel(), expected[:500], rtol=0.01)
+
+        with pytest.raises(ValueError):
+            reflectivity(q, w, dq=5.0, dq_engine="fourier")
+
+        # through ReflectModel
+        model = ReflectModel(self.structure361, dq_engine="fft")
+        assert model.dq_engine == "fft"
+        assert_allclose(
+            model(q),
+            reflectivity(
+                q,
+                self.structure361.slabs()[:, :4],
+                bkg=model.bkg.value,
+                dq=5.0,
+                dq_engine="fft",
+            ),
+        )
+        model2 = eval(repr(model))
+        assert model2.dq_engine == "fft"
+        model3 = pickle.loads(pickle.dumps(model))
+        assert_allclose(model3(q), model(q))
+
+    def test_kernel_memo(self):
+        structure = self.structure361
+        other = SLD(0) | SLD(1)(50, 3) | SLD(2.07)(0, 3)
+        q = self.qvals361
+        dq = 0.05 * q
+        data = (q, self.rvals361, self.evals361, dq)
+
+        # objectives sharing a Structure with different scale/bkg
+        models = [
+            ReflectModel(structure, bkg=1e-6),
+            ReflectModel(structure, scale=0.9, bkg=2e-6),
+            MixedReflectModel([structure, other], scales=[0.5, 0.5]),
+        ]
+        objective = GlobalObjective([Objective(m, data) for m in models])
+        expected = [objective.logl(), objective.residuals()]
+
+        with kernel_memo() as memo:
+            assert_equal(objective.logl(), expected[0])
+            assert_equal(objective.residuals(), expected[1])
+            # the calculations for `structure` are shared
+            assert memo.misses == 2
+            assert memo.hits == 6
+
+            structure[1].thick.value += 1
+            logl = objective.logl()
+            assert memo.misses == 4
+
+            # the Q values are compared as well as the key
+            models[0](q + 0.001, x_err=dq)
+            assert memo.misses == 5
+
+            # a different resolution isn't shared
+            models[0](q, x_err=0.06 * q)
+            assert memo.misses == 6
+
+            memo.clear()
+            assert memo.hits == memo.misses == 0
+
+        assert_equal(objective.logl(), logl)
+        assert reflect_model._active_kernel_memo() is None
+
+        # each thread has its own memo, which can be nested
+        def evaluate(results):
+            with kernel_memo() as outer:
+                models[0](q, x_err=dq)
+                with kernel_memo() as inner:
+                    models[0](q, x_err=dq)
+                    models[1](q, x_err=dq)
+                assert reflect_model._active_kernel_memo() is outer
+                results.append((outer.misses, inner.misses, inner.hits))
+
+        results = []
+        with kernel_memo() as memo:
+            thread = threading.Thread(target=evaluate, args=(results,))
+            thread.start()
+            thread.join()
+            assert reflect_model._active_kernel_memo() is memo
+            assert memo.hits == memo.misses == 0
+        assert results == [(1, 1, 1)]
+
+    def test_auto_quad_order(self):
+        air = SLD(0)
+        a = SLD(6.36)
+        b = SLD(-0.56)
+        si = SLD(2.07)
+        layer_a = a(50, 3)
+        s = air | layer_a | b(50, 3)
+        for i in range(19):
+            s |= a(50, 3) | b(50, 3)
+        s |= si(0, 3)
+
+        q = np.linspace(0.005, 0.3, 200)
+        dq = 0.05 * q
+        w = s.slabs()[:, :4]
+        expected = reflect_model._smeared_kernel_adaptive(q, w, dq)
+
+        calc = reflectivity(q, w, dq=dq, quad_order="auto")
+        assert_allclose(calc, expected, rtol=2e-4)
+
+        model = ReflectModel(s, bkg=0, quad_order="auto")
+        calc = model(q, x_err=dq)
+        assert_allclose(calc, expected, rtol=2e-4)
+
+        # the orders are remembered and vary across the dataset
+        auto = model._auto_quadrature
+        quad_orders = auto.quad_orders
+        assert len(np.unique(quad_orders)) > 1
+        model(q, x_err=dq)
+        assert auto.quad_orders is quad_orders
+
+        # small changes in the structure don't require a new selection
+        layer_a.thick.value = 52
+        model(q, x_err=dq)
+        assert auto.quad_orders is quad_orders
+
+        # but large changes do
+        layer_a.thick.value = 500
+        calc = model(q, x_err=dq)
+        assert auto.quad_orders is not quad_orders
+        w = s.slabs()[:, :4]
+        expected = reflect_model._smeared_kernel_adaptive(q, w, dq)
+        assert_allclose(calc, expected, rtol=2e-4)
+
+        # as do different Q values
+        quad_orders = auto.quad_orders
+        model(q[::2], x_err=dq[::2])
+        assert auto.quad_orders is not quad_orders
+
+        # batched calculation
+        stack = np.stack([w, w])
+        calc = reflectivity_batch(q, stack, dq=dq, quad_order="auto")
+        assert_allclose(calc, np.stack([expected, expected]), rtol=2e-4)
+
+        pickle.loads(pickle.dumps(model))
+
+        # MixedReflectModel remembers the orders for each structure
+        s2 = air | a(100, 3) | si(0, 3)
+        mixed = MixedReflectModel((s, s2), scales=[0.5, 0.5], bkg=0)
+        mixed.quad_order = "auto"
+        calc = mixed(q, x_err=dq)
+        w2 = s2.slabs()[:, :4]
+        expected2 = reflect_model._smeared_kernel_adaptive(q, w2, dq)
+        assert_allclose(calc, 0.5 * (expected + expected2), rtol=2e-4)
+
+        autos = mixed._auto_quadratures
+        assert len(autos) == 2
+        assert autos[0] is not autos[1]
+        assert not np.array_equal(autos[0].quad_orders, autos[1].quad_orders)
+        quad_orders = [auto.quad_orders for auto in autos]
+        mixed(q, x_err=dq)
+        assert mixed._auto_quadratures is autos
+        for auto, orders in zip(autos, quad_orders):
+            assert auto.quad_orders is orders
+
+    def test_auto_quad_order_reference(self):
+        # the orders are checked against adaptive quadrature, which is
+        # accurate at the critical edge.
+        s = SLD(2.07) | SLD(3.47)(15, 3) | SLD(1)(210, 3) | SLD(6.36)(0, 3)
+        w = s.slabs()[:, :4]
+        q = np.linspace(0.005, 0.3, 400)
+        dq = 0.05 * q
+        expected = reflect_model._smeared_kernel_adaptive(q, w, dq)
+
+        auto = reflect_model._AutoQuadrature()
+        quad_orders = auto.select(q, w, dq)
+        calc = auto(q, w, dq)
+        checked = quad_orders < auto.reference_order
+        assert checked.any()
+        assert_allclose(calc[checked], expected[checked], rtol=auto.rtol)
+
+        # a fixed order can't describe the kink at the critical edge
+        fixed = reflect_model._smeared_kernel_pointwise(
+            q, w, dq, quad_order=auto.reference_order
+        )
+        rel_err = np.abs(fixed - expected) / expected
+        assert np.all(quad_orders[rel_err > auto.rtol] == auto.reference_order)
+
     def test_resolution_kernel(self):
         # check that resolution kernel works, use constant dq/q of 5% as
         # comparison
@@ -53,6 +53,33 @@ class TestSpline:
         # calculate an SLD profile
         s.sld_profile()
 
+    def test_slabs_cache(self):
+        # the slabs of a Spline are cached by the Structure, and are only
+        # recalculated if the state of the Spline or its neighbours change.
+        a = Spline(100, [2.0, 3.0], [0.3, 0.3], microslab_max_thickness=1)
+        s = self.left | a | self.right | self.solvent
+        slabs = s.slabs()
+        spline_slabs = a._slabs_cache[1]
+        assert_equal(slabs[1:-2], spline_slabs)
+
+        # changing the backing medium doesn't affect the Spline
+        s[-1].rough.value = 5
+        s.slabs()
+        assert a._slabs_cache[1] is spline_slabs
+
+        # but changing the Spline, or the neighbouring Components does.
+        for change in [
+            lambda: setattr(a.vs[0], "value", 2.5),
+            lambda: setattr(self.left.sld.real, "value", 1.0),
+            lambda: setattr(a, "microslab_max_thickness", 2),
+            lambda: setattr(s[-1].sld.real, "value", 9.0),
+        ]:
+            change()
+            slabs = s.slabs()
+            assert a._slabs_cache[1] is not spline_slabs
+            spline_slabs = a._slabs_cache[1]
+            assert_equal(slabs[1:-2], a.slabs(s))
+
     def test_spline_no_knots(self):
         # try and make Spline with no knots
         a = Spline(100, [], [], zgrad=False, microslab_max_thickness=1)
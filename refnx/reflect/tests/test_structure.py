@@ -23,6 +23,7 @@ from refnx.reflect import (
     MaterialSLD,
     MixedSlab,
     SpinChannel,
+    ReflectModel,
 )
 import refnx.reflect.tests
 from refnx.reflect.structure import _profile_slicer, MagneticSlab
@@ -592,6 +593,55 @@ class TestStructure:
         with pytest.raises(ValueError):
             s.slabs()
 
+    def test_slabs_cache(self):
+        s = self.s
+        slabs = s.slabs()
+        assert_equal(slabs[1, :4], [100, 3.47, 0, 5])
+
+        # a copy of the cached slabs is returned
+        slabs[1, 0] = 50
+        assert_equal(s.slabs()[1, 0], 100)
+
+        # Parameter values, and attributes of the Structure, Components and
+        # Scatterers invalidate the cache
+        s[1].thick.value = 50
+        assert_equal(s.slabs()[1, 0], 50)
+        s.reverse_structure = True
+        assert_equal(s.slabs()[:, 1], [6.36, 3.47, 0])
+        s.reverse_structure = False
+        self.sio2.real = Parameter(2.0)
+        assert_equal(s.slabs()[1, 1], 2.0)
+        s[1].vfsolv.value = 0.5
+        assert_allclose(s.slabs()[1, 1], 0.5 * 2 + 0.5 * 6.36)
+        s.solvent = self.h2o
+        assert_allclose(s.slabs()[1, 1], 0.5 * 2 - 0.5 * 0.56)
+
+        # as does a change in the Components in the Structure (or Stack)
+        stk = Stack([self.sio2(10, 3)])
+        s.insert(2, stk)
+        assert_equal(len(s.slabs()), 4)
+        stk.append(self.d2o(20, 3))
+        assert_equal(len(s.slabs()), 5)
+
+        # Parameters that aren't part of the Structure (e.g. the scale and
+        # background of a model) don't invalidate the cache
+        model = ReflectModel(s)
+        cached = s.slabs()
+        slabs = s._slabs_cache[-1]
+        model.bkg.value = 1e-6
+        model.scale.value = 0.9
+        assert s.slabs() is not slabs
+        assert s._slabs_cache[-1] is slabs
+        assert_equal(s.slabs(), cached)
+        s[1].thick.value = 40
+        assert_equal(s.slabs()[1, 0], 40)
+        assert s._slabs_cache[-1] is not slabs
+
+        # the cache isn't pickled
+        s2 = pickle.loads(pickle.dumps(s))
+        assert "_slabs_cache" not in s2.__dict__
+        assert_equal(s2.slabs(), s.slabs())
+
     def test_attribute_setting(self):
         # perhaps people replace the attributes in Components themselves
         o = SLD(2.07 + 1 * 1j)
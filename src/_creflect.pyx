@@ -24,6 +24,7 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THIS SOFTWARE.
 
 """
+import atexit
 from multiprocessing import cpu_count
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 import numpy as np
@@ -50,6 +51,23 @@ cdef extern from "refcaller.h" nogil:
         const double *xP,
         int threads
     )
+    void abeles_grad_wrapper(
+        int numcoefs,
+        const double *coefP,
+        int npoints,
+        double *yP,
+        double *dyP,
+        const double *xP
+    )
+    void abeles_grad_wrapper_MT(
+        int numcoefs,
+        const double *coefP,
+        int npoints,
+        double *yP,
+        double *dyP,
+        const double *xP,
+        int threads
+    )
     void parratt_wrapper(
         int numcoefs,
         const double *coefP,
@@ -101,6 +119,9 @@ cdef extern from "refcaller.h" nogil:
         double *Rc,
         double *Rd,
     )
+    unsigned int pool_size()
+    void pool_resize(int workers)
+    void pool_shutdown()
 
 ctypedef np.float64_t float64_t
 
@@ -109,6 +130,58 @@ ctypedef np.float64_t float64_t
 cdef int NCPU = cpu_count()
 
 
+def get_pool_size():
+    """
+    Number of worker threads in the persistent pool used for parallel
+    reflectivity calculations.
+
+    Returns
+    -------
+    size : int
+        The number of worker threads currently running.
+
+    Notes
+    -----
+    Calculations with `threads > 1` are split into `threads` chunks. The
+    calling thread computes one of the chunks and the rest are handed to the
+    pool, so the pool does not have to be recreated for every calculation.
+    """
+    return pool_size()
+
+
+def resize_pool(int workers=-1):
+    """
+    Set the number of worker threads in the persistent pool.
+
+    Parameters
+    ----------
+    workers : int, optional
+        The number of worker threads. The calling thread also does work, so
+        `workers = threads - 1` gives full concurrency for a calculation
+        performed with `threads`. If `workers == -1` the pool grows on demand
+        to suit the `threads` requested by each calculation (the default
+        behaviour).
+    """
+    with nogil:
+        pool_resize(workers)
+
+
+def shutdown_pool():
+    """
+    Stop all the worker threads in the persistent pool.
+
+    Notes
+    -----
+    If the pool is growing on demand (the default) subsequent parallel
+    calculations restart the worker threads.
+    """
+    with nogil:
+        pool_shutdown()
+
+
+atexit.register(shutdown_pool)
+
+
 @cython.boundscheck(False)
 @cython.cdivision(True)
 cpdef np.ndarray abeles(
@@ -232,6 +305,127 @@ cpdef np.ndarray abeles(
     return y
 
 
+@cython.boundscheck(False)
+@cython.cdivision(True)
+cpdef tuple abeles_grad(
+    np.ndarray x,
+    double[:, :] w,
+    double scale=1.0,
+    double bkg=0.,
+    int threads=-1
+):
+    """
+    Abeles matrix reflectivity and its derivatives with respect to the
+    layer parameters.
+
+    Parameters
+    ----------
+    q: array_like
+        the q values required for the calculation.
+        Q = 4 * Pi / lambda * sin(omega).
+        Units = Angstrom**-1
+    layers: np.ndarray
+        coefficients required for the calculation, has shape (2 + N, 4),
+        where N is the number of layers. See :func:`abeles`.
+    scale: float
+        Multiply all reflectivities by this value.
+    bkg: float
+        Linear background to be added to all reflectivities
+    threads: int, optional
+        How many threads you would like to use in the reflectivity calculation.
+        If `threads == -1` then the calculation is automatically spread over
+        `multiprocessing.cpu_count()` threads.
+
+    Returns
+    -------
+    reflectivity, derivatives: np.ndarray, np.ndarray
+        Calculated reflectivity values for each q value, and the derivatives
+        of the reflectivity with respect to each entry of `layers`. The
+        derivatives have shape ``q.shape + layers.shape``. Entries of `layers`
+        that are not used by the calculation (e.g. ``layers[0, 0]``) have zero
+        derivative.
+
+    Notes
+    -----
+    The derivatives are exact, they are propagated through the matrix
+    recursion alongside the reflectivity. They are with respect to the
+    layer parameters as given, i.e. the sign of negative thicknesses and
+    imaginary SLDs is taken into account.
+    """
+    if w.shape[1] != 4 or w.shape[0] < 2:
+        raise ValueError("Layer parameters for _creflect must be an array of"
+                         " shape (>2, 4)")
+    if x.dtype != np.float64:
+        raise ValueError("Q values for _creflect must be np.float64")
+
+    cdef:
+        int nlayers = w.shape[0] - 2
+        int npoints = x.size
+        np.ndarray y = np.empty_like(x, np.float64)
+        np.ndarray dy = np.empty(
+            np.shape(x) + (nlayers + 2, 4), np.float64
+        )
+        double *x_data
+        double *y_data
+        double *dy_data
+    if not x.flags['C_CONTIGUOUS']:
+        x = np.ascontiguousarray(x, dtype=np.float64)
+
+    x_data = <float64_t *>np.PyArray_DATA(x)
+    y_data = <float64_t *>np.PyArray_DATA(y)
+    dy_data = <float64_t *>np.PyArray_DATA(dy)
+
+    coefs = <double*> PyMem_Malloc((4*nlayers + 8) * sizeof(double))
+    if not coefs:
+        raise MemoryError()
+
+    cdef double [:] coefs_view = <double[:4*nlayers + 8]>coefs
+
+    try:
+        with nogil:
+            if threads == -1:
+                threads = NCPU
+            elif threads == 0:
+                threads = 1
+
+            coefs_view[0] = nlayers
+            coefs_view[1] = scale
+            coefs_view[2:4] = w[0, 1: 3]
+            coefs_view[4: 6] = w[-1, 1: 3]
+            coefs_view[6] = bkg
+            coefs_view[7] = w[-1, 3]
+
+            if nlayers:
+                coefs_view[8::4] = w[1:-1, 0]
+                coefs_view[9::4] = w[1:-1, 1]
+                coefs_view[10::4] = w[1:-1, 2]
+                coefs_view[11::4] = w[1:-1, 3]
+
+            if threads > 1:
+                abeles_grad_wrapper_MT(
+                    4*nlayers + 8,
+                    coefs,
+                    npoints,
+                    y_data,
+                    dy_data,
+                    x_data,
+                    threads
+                )
+            else:
+                abeles_grad_wrapper(
+                    4*nlayers + 8,
+                    coefs,
+                    npoints,
+                    y_data,
+                    dy_data,
+                    x_data
+                )
+    finally:
+        PyMem_Free(coefs)
+
+    return y, dy
+
+
 @cython.boundscheck(False)
 @cython.cdivision(True)
 cpdef np.ndarray parratt(
@@ -487,12 +681,14 @@ cpdef np.ndarray abeles_vectorised(
     if scale is not None:
         if not isinstance(scale, np.ndarray) or scale.shape[0] != w.shape[0]:
             raise ValueError("scale must be an array of shape (M,)")
+        scale = np.ascontiguousarray(scale, dtype=np.float64)
     else:
         scale = np.ones(w.shape[0], dtype=np.float64)
 
     if bkg is not None:
         if not isinstance(bkg, np.ndarray) or bkg.shape[0] != w.shape[0]:
             raise ValueError("bkg must be an array of shape (M,)")
+        bkg = np.ascontiguousarray(bkg, dtype=np.float64)
     else:
         bkg = np.zeros(w.shape[0])
 
@@ -508,9 +704,7 @@ cpdef np.ndarray abeles_vectorised(
         int offset
         unsigned int batch = w.shape[0]
         int npoints = x.size
-        np.ndarray yout = np.repeat(
-            np.empty_like(x, np.float64)[np.newaxis, ...], batch, axis=0
-        )
+        np.ndarray yout = np.empty((batch,) + np.shape(x), np.float64)
         double *x_data
         double *bkg_data
         double *scale_data
@@ -550,15 +744,16 @@ cpdef np.ndarray abeles_vectorised(
                     coefs[10 + 4*j] = w[i, j + 1, 2]
                     coefs[11 + 4*j] = w[i, j + 1, 3]
 
-        abeles_wrapper_MT(
-            batch,
-            4*nlayers + 8,
-            coefs_arr,
-            npoints,
-            y_out_data,
-            x_data,
-            threads
-        )
+        with nogil:
+            abeles_wrapper_MT(
+                batch,
+                4*nlayers + 8,
+                coefs_arr,
+                npoints,
+                y_out_data,
+                x_data,
+                threads
+            )
     finally:
         PyMem_Free(coefs_arr)
 
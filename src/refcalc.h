@@ -86,6 +86,26 @@ DEALINGS IN THIS SOFTWARE.
     coefP[4 * M + 11] - roughness between layer M - 1 / M (Å)
 */
 
+/*
+    abeles_grad calculates the Abeles reflectivity together with its
+    derivatives with respect to the parameters of each layer.
+
+    dyP - this user supplied array is filled with the derivatives. It must
+    be `npoints * numcoefs` long. The derivatives for each point are laid out
+    in the same way as the (2 + N, 4) layer array passed to
+    `_creflect.abeles`, not in the order of coefP:
+
+    dyP[numcoefs * j + 4 * M + 0] - d(yP[j]) / d(thickness of layer M)
+    dyP[numcoefs * j + 4 * M + 1] - d(yP[j]) / d(SLD of layer M, real part)
+    dyP[numcoefs * j + 4 * M + 2] - d(yP[j]) / d(SLD of layer M, imag part)
+    dyP[numcoefs * j + 4 * M + 3] - d(yP[j]) / d(roughness between layer
+                                    M - 1 / M)
+
+    with M = 0 the fronting medium and M = N + 1 the backing medium. Entries
+    that don't affect the reflectivity (e.g. the thickness of the fronting
+    medium) are zero. The derivatives include the scale factor.
+*/
+
 #ifndef REFCALC_H
 #define REFCALC_H
 
@@ -95,4 +115,7 @@ void abeles(int numcoefs, const double *coefP, int npoints, double *yP,
 void parratt(int numcoefs, const double *coefP, int npoints, double *yP,
              const double *xP);
 
+void abeles_grad(int numcoefs, const double *coefP, int npoints, double *yP,
+                 double *dyP, const double *xP);
+
 #endif
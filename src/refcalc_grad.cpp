@@ -0,0 +1,272 @@
+/*
+    refcalc_grad.cpp
+
+    *Calculates the specular (Neutron or X-ray) reflectivity from a stratified
+    series of layers, together with its derivatives with respect to the
+    parameters of each layer.
+
+The refnx code is distributed under the following license:
+
+Copyright (c) 2015 A. R. J. Nelson, Australian Nuclear Science and Technology
+Organisation
+
+Permission to use and redistribute the source code or binary forms of this
+software and its documentation, with or without modification is hereby
+granted provided that the above notice of copyright, these terms of use,
+and the disclaimer of warranty below appear in the source code and
+documentation, and that none of the names of above institutions or
+authors appear in advertising or endorsement of works derived from this
+software without specific prior written permission from all parties.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THIS SOFTWARE.
+
+*/
+
+/*
+The Abeles reflectivity is R = |M[1][0]|**2 / |M[0][0]|**2, with
+M = M_0 M_1 ... M_N the product of the characteristic matrices of the N + 1
+interfaces (see `abeles` in refcalc.cpp). M_j only depends on the wavevectors
+either side of interface j (k_j, k_j+1), the roughness of interface j and,
+for j > 0, the thickness of layer j. The derivative of the product with
+respect to any of those is
+
+    dM = P_j-1 dM_j S_j+1
+
+where P and S are the prefix and suffix products of the M_j. The local
+derivatives dM_j are propagated forward from those of the interface
+reflectance, r_j, and the phase factor, beta_j. Using the prefix and suffix
+products keeps the cost of all the derivatives linear in the number of
+layers, carrying the derivative of the running product for every parameter
+would make it quadratic.
+
+The derivatives are holomorphic in the wavevectors, so dR/dk_j is
+accumulated as a complex number and converted to derivatives with respect to
+the real and imaginary parts of the SLD at the end.
+*/
+
+#include <cmath>
+#include <complex>
+#include <vector>
+
+extern "C" {
+#include "refcalc.h"
+}
+
+#define PI 3.14159265358979323846
+// TINY is required to make sure a complex sqrt takes the correct branch
+#define TINY 1e-30
+
+using namespace std;
+
+namespace {
+
+typedef complex<double> cdouble;
+
+struct Mat2 {
+  cdouble m00, m01, m10, m11;
+};
+
+inline Mat2 matmul(const Mat2 &a, const Mat2 &b) {
+  Mat2 c;
+  c.m00 = a.m00 * b.m00 + a.m01 * b.m10;
+  c.m01 = a.m00 * b.m01 + a.m01 * b.m11;
+  c.m10 = a.m10 * b.m00 + a.m11 * b.m10;
+  c.m11 = a.m10 * b.m01 + a.m11 * b.m11;
+  return c;
+}
+
+inline Mat2 scaled(const Mat2 &a, cdouble s) {
+  Mat2 c = {a.m00 * s, a.m01 * s, a.m10 * s, a.m11 * s};
+  return c;
+}
+
+inline Mat2 added(const Mat2 &a, const Mat2 &b) {
+  Mat2 c = {a.m00 + b.m00, a.m01 + b.m01, a.m10 + b.m10, a.m11 + b.m11};
+  return c;
+}
+
+/*
+First column of left * X * right, i.e. the derivatives of (M[0][0], M[1][0])
+when X is the derivative of one of the interface matrices.
+*/
+inline void first_column(const Mat2 &left, const Mat2 &X, const Mat2 &right,
+                         cdouble &t0, cdouble &t1) {
+  cdouble u0 = X.m00 * right.m00 + X.m01 * right.m10;
+  cdouble u1 = X.m10 * right.m00 + X.m11 * right.m10;
+  t0 = left.m00 * u0 + left.m01 * u1;
+  t1 = left.m10 * u0 + left.m11 * u1;
+}
+
+inline double sign(double x) { return x < 0 ? -1. : 1.; }
+
+} // namespace
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+void abeles_grad(int numcoefs, const double *coefP, int npoints, double *yP,
+                 double *dyP, const double *xP) {
+  int nlayers = (int)coefP[0];
+  int ninterfaces = nlayers + 1;
+  double scale = coefP[1];
+  double bkg = coefP[6];
+  const double sld_scale = 4e-6 * PI;
+  const Mat2 identity = {1., 0., 0., 1.};
+
+  try {
+    vector<cdouble> SLD(nlayers + 2);
+    vector<double> thick(nlayers + 1), rough(nlayers + 1);
+    vector<double> isld_sign(nlayers + 2);
+
+    // interface matrices, their local derivatives with respect to the
+    // wavevector above (dk_above) and below (dk_below), the roughness and
+    // the thickness of the layer above the interface.
+    vector<Mat2> M(ninterfaces), dk_above(ninterfaces), dk_below(ninterfaces);
+    vector<Mat2> drough(ninterfaces), dthick(ninterfaces);
+    vector<Mat2> prefix(ninterfaces + 1), suffix(ninterfaces + 1);
+    vector<cdouble> kn(nlayers + 2);
+    // complex derivatives of (M[0][0], M[1][0]) w.r.t. each wavevector
+    vector<cdouble> dB_dk(nlayers + 2), dA_dk(nlayers + 2);
+
+    cdouble super = cdouble(coefP[2], 0);
+
+    SLD[0] = cdouble(0, 0);
+    for (int ii = 1; ii < nlayers + 1; ii++) {
+      SLD[ii] = sld_scale * (cdouble(coefP[4 * ii + 5],
+                                     fabs(coefP[4 * ii + 6]) + TINY) -
+                             super);
+      isld_sign[ii] = sign(coefP[4 * ii + 6]);
+      thick[ii] = coefP[4 * ii + 4];
+      rough[ii - 1] = coefP[4 * ii + 7];
+    }
+    SLD[nlayers + 1] =
+        sld_scale * (cdouble(coefP[4], fabs(coefP[5]) + TINY) - super);
+    isld_sign[nlayers + 1] = sign(coefP[5]);
+    rough[nlayers] = coefP[7];
+
+    for (int j = 0; j < npoints; j++) {
+      cdouble qq2 = cdouble(xP[j] * xP[j] / 4, 0);
+      double *dy = dyP + (size_t)j * numcoefs;
+
+      kn[0] = xP[j] / 2.;
+      for (int ii = 1; ii < nlayers + 2; ii++)
+        kn[ii] = std::sqrt(qq2 - SLD[ii]);
+
+      for (int ii = 0; ii < ninterfaces; ii++) {
+        cdouble a = kn[ii];
+        cdouble b = kn[ii + 1];
+        cdouble s = -2 * rough[ii] * rough[ii];
+        cdouble apb = a + b;
+        cdouble f = (a - b) / apb;
+        cdouble e = std::exp(a * b * s);
+        cdouble rj = f * e;
+
+        cdouble dr_da = (2. * b / (apb * apb) + f * s * b) * e;
+        cdouble dr_db = (-2. * a / (apb * apb) + f * s * a) * e;
+        cdouble dr_drough = rj * a * b * (-4 * rough[ii]);
+
+        if (!ii) {
+          Mat2 dM_dr = {0., 1., 1., 0.};
+          Mat2 m = {1., rj, rj, 1.};
+          M[ii] = m;
+          // the fronting wavevector doesn't depend on any parameter
+          dk_above[ii] = scaled(dM_dr, 0.);
+          dk_below[ii] = scaled(dM_dr, dr_db);
+          drough[ii] = scaled(dM_dr, dr_drough);
+          dthick[ii] = scaled(dM_dr, 0.);
+        } else {
+          cdouble d = cdouble(0, fabs(thick[ii]));
+          cdouble beta = std::exp(a * d);
+          cdouble ibeta = 1. / beta;
+          Mat2 m = {beta, rj * beta, rj * ibeta, ibeta};
+          Mat2 dM_dbeta = {1., rj, -rj * ibeta * ibeta, -ibeta * ibeta};
+          Mat2 dM_dr = {0., beta, ibeta, 0.};
+
+          M[ii] = m;
+          dk_above[ii] =
+              added(scaled(dM_dbeta, d * beta), scaled(dM_dr, dr_da));
+          dk_below[ii] = scaled(dM_dr, dr_db);
+          drough[ii] = scaled(dM_dr, dr_drough);
+          dthick[ii] =
+              scaled(dM_dbeta, cdouble(0, sign(thick[ii])) * a * beta);
+        }
+      }
+
+      // prefix[i] = M_0 ... M_i-1, suffix[i] = M_i ... M_N
+      prefix[0] = identity;
+      for (int ii = 0; ii < ninterfaces; ii++)
+        prefix[ii + 1] = matmul(prefix[ii], M[ii]);
+      suffix[ninterfaces] = identity;
+      for (int ii = ninterfaces - 1; ii > -1; ii--)
+        suffix[ii] = matmul(M[ii], suffix[ii + 1]);
+
+      cdouble A = prefix[ninterfaces].m10;
+      cdouble B = prefix[ninterfaces].m00;
+      double den = std::norm(B);
+      double refl = std::norm(A) / den;
+
+      // dR in terms of the derivatives of (M[0][0], M[1][0])
+      auto dR = [&](cdouble dB, cdouble dA) {
+        double dnum = 2. * (std::conj(A) * dA).real();
+        double dden = 2. * (std::conj(B) * dB).real();
+        return scale * (dnum - refl * dden) / den;
+      };
+
+      for (int ii = 0; ii < numcoefs; ii++)
+        dy[ii] = 0;
+      for (int ii = 0; ii < nlayers + 2; ii++) {
+        dB_dk[ii] = 0;
+        dA_dk[ii] = 0;
+      }
+
+      for (int ii = 0; ii < ninterfaces; ii++) {
+        cdouble t0, t1;
+        const Mat2 &left = prefix[ii];
+        const Mat2 &right = suffix[ii + 1];
+
+        first_column(left, dk_above[ii], right, t0, t1);
+        dB_dk[ii] += t0;
+        dA_dk[ii] += t1;
+        first_column(left, dk_below[ii], right, t0, t1);
+        dB_dk[ii + 1] += t0;
+        dA_dk[ii + 1] += t1;
+
+        // roughness of interface ii is held by the layer below it, the
+        // backing roughness is in coefP[7]
+        first_column(left, drough[ii], right, t0, t1);
+        dy[4 * (ii + 1) + 3] = dR(t0, t1);
+
+        if (ii) {
+          first_column(left, dthick[ii], right, t0, t1);
+          dy[4 * ii] = dR(t0, t1);
+        }
+      }
+
+      // k = sqrt(q**2 / 4 - SLD), dk/dSLD = -1 / 2k
+      for (int ii = 1; ii < nlayers + 2; ii++) {
+        cdouble dk_dsld = -sld_scale / (2. * kn[ii]);
+        cdouble dk_disld = cdouble(0, isld_sign[ii]) * dk_dsld;
+        dy[4 * ii + 1] = dR(dB_dk[ii] * dk_dsld, dA_dk[ii] * dk_dsld);
+        dy[4 * ii + 2] = dR(dB_dk[ii] * dk_disld, dA_dk[ii] * dk_disld);
+
+        // all the SLDs are relative to the fronting medium
+        dy[1] -= dy[4 * ii + 1];
+      }
+
+      yP[j] = refl * scale + bkg;
+    }
+  } catch (...) {
+    return;
+  }
+}
+
+#ifdef __cplusplus
+}
+#endif
@@ -36,10 +36,21 @@ extern "C" {
 
 #include "pnr/reflcalc.h"
 #include <cmath>
+#include <condition_variable>
 #include <cstring>
+#include <deque>
+#include <functional>
 #include <iostream>
+#include <mutex>
 #include <thread>
 #include <vector>
+#ifdef _WIN32
+#include <process.h>
+#define refnx_getpid _getpid
+#else
+#include <unistd.h>
+#define refnx_getpid getpid
+#endif
 #ifndef M_PI
 #define M_PI 3.141592653589793
 #endif
@@ -51,6 +62,189 @@ using namespace std;
 typedef void (*ref_calculator)(int, const double *, int, double *,
                                const double *xP);
 
+/*
+Persistent worker pool.
+
+Creating and joining a std::thread for every chunk of every calculation is
+expensive compared to the calculation itself when there are only a few
+hundred Q points (as is typical during MCMC sampling). Instead a set of
+long-lived workers wait on a shared task queue. A caller submits its chunks to
+the queue and then helps to drain the queue until all of its own chunks are
+finished, so a calculation always makes progress, even if the pool has been
+shut down or is busy with another caller's work.
+
+By default the pool grows on demand to `threads - 1` workers (the calling
+thread does the remaining share of the work). If a size is set explicitly
+with `pool_resize` the pool stays at that size.
+*/
+class Latch {
+public:
+  explicit Latch(int count) : remaining(count) {}
+
+  void count_down() {
+    std::lock_guard<std::mutex> lock(mtx);
+    remaining--;
+    if (remaining == 0)
+      cv.notify_all();
+  }
+
+  bool done() {
+    std::lock_guard<std::mutex> lock(mtx);
+    return remaining == 0;
+  }
+
+  void wait() {
+    std::unique_lock<std::mutex> lock(mtx);
+    cv.wait(lock, [this] { return remaining == 0; });
+  }
+
+private:
+  int remaining;
+  std::mutex mtx;
+  std::condition_variable cv;
+};
+
+class WorkerPool {
+public:
+  WorkerPool() : stopping(false), fixed_size(false), pid(refnx_getpid()) {}
+
+  /*
+  Execute all the tasks, blocking until they have finished.
+  */
+  void run(std::vector<std::function<void()>> &tasks) {
+    if (tasks.empty())
+      return;
+
+    Latch latch((int)tasks.size());
+    {
+      std::unique_lock<std::mutex> lock(mtx);
+      if (!fixed_size)
+        grow(tasks.size() - 1);
+      for (auto &task : tasks) {
+        queue.emplace_back([&latch, task]() {
+          task();
+          latch.count_down();
+        });
+      }
+    }
+    cv.notify_all();
+
+    // the calling thread participates until its own tasks are complete.
+    while (!latch.done()) {
+      std::function<void()> task;
+      {
+        std::lock_guard<std::mutex> lock(mtx);
+        if (!queue.empty()) {
+          task = std::move(queue.front());
+          queue.pop_front();
+        }
+      }
+      if (task) {
+        task();
+      } else {
+        // everything remaining is being executed by workers
+        latch.wait();
+      }
+    }
+  }
+
+  unsigned int size() {
+    std::lock_guard<std::mutex> lock(mtx);
+    return (unsigned int)workers.size();
+  }
+
+  /*
+  Set the number of workers. If `n < 0` the pool reverts to growing on demand.
+  */
+  void resize(int n) {
+    stop_workers();
+    std::lock_guard<std::mutex> lock(mtx);
+    if (n < 0) {
+      fixed_size = false;
+    } else {
+      fixed_size = true;
+      grow((size_t)n);
+    }
+  }
+
+  /*
+  Stop and join all the workers. If the pool is growing on demand then the
+  workers are restarted by the next parallel calculation.
+  */
+  void shutdown() { stop_workers(); }
+
+  bool forked() { return pid != refnx_getpid(); }
+
+private:
+  // must be called with mtx held
+  void grow(size_t n) {
+    if (stopping)
+      return;
+    while (workers.size() < n)
+      workers.emplace_back(&WorkerPool::worker_loop, this);
+  }
+
+  void stop_workers() {
+    std::vector<std::thread> old;
+    {
+      std::lock_guard<std::mutex> lock(mtx);
+      stopping = true;
+      old.swap(workers);
+    }
+    cv.notify_all();
+    for (auto &th : old)
+      th.join();
+
+    std::lock_guard<std::mutex> lock(mtx);
+    stopping = false;
+  }
+
+  void worker_loop() {
+    while (true) {
+      std::function<void()> task;
+      {
+        std::unique_lock<std::mutex> lock(mtx);
+        cv.wait(lock, [this] { return stopping || !queue.empty(); });
+        if (stopping)
+          return;
+        task = std::move(queue.front());
+        queue.pop_front();
+      }
+      task();
+    }
+  }
+
+  std::mutex mtx;
+  std::condition_variable cv;
+  std::deque<std::function<void()>> queue;
+  std::vector<std::thread> workers;
+  bool stopping;
+  bool fixed_size;
+  int pid;
+};
+
+static std::mutex pool_mtx;
+static WorkerPool *worker_pool = NULL;
+
+static WorkerPool *get_pool() {
+  std::lock_guard<std::mutex> lock(pool_mtx);
+  if (worker_pool != NULL && worker_pool->forked()) {
+    // The threads of a pool don't survive a fork, the child process needs
+    // its own. The parent's pool can't be joined or destroyed from here, so
+    // it's deliberately leaked.
+    worker_pool = NULL;
+  }
+  if (worker_pool == NULL)
+    worker_pool = new WorkerPool();
+  return worker_pool;
+}
+
+unsigned int pool_size() { return get_pool()->size(); }
+
+void pool_resize(int workers) { get_pool()->resize(workers); }
+
+void pool_shutdown() { get_pool()->shutdown(); }
+
 /*
 batch worker
 */
@@ -67,7 +261,7 @@ void MT_wrapper(ref_calculator fn, unsigned int batch, int numcoefs,
                 const double *coefP, int npoints, double *yP, const double *xP,
                 int workers) {
 
-  std::vector<std::thread> threads;
+  std::vector<std::function<void()>> tasks;
 
   if (batch < 2) {
     int pointsEachThread, pointsRemaining, pointsConsumed;
@@ -83,19 +277,14 @@ void MT_wrapper(ref_calculator fn, unsigned int batch, int numcoefs,
     pointsConsumed = 0;
 
     for (int ii = 0; ii < workers; ii++) {
-      if (ii < workers - 1) {
-        threads.emplace_back(std::thread(fn, numcoefs, coefP, pointsEachThread,
-                                         yP + pointsConsumed,
-                                         xP + pointsConsumed));
-        pointsRemaining -= pointsEachThread;
-        pointsConsumed += pointsEachThread;
-      } else {
-        threads.emplace_back(std::thread(fn, numcoefs, coefP, pointsRemaining,
-                                         yP + pointsConsumed,
-                                         xP + pointsConsumed));
-        pointsRemaining -= pointsRemaining;
-        pointsConsumed += pointsRemaining;
+      int n = (ii < workers - 1) ? pointsEachThread : pointsRemaining;
+      if (n > 0) {
+        tasks.emplace_back([=]() {
+          fn(numcoefs, coefP, n, yP + pointsConsumed, xP + pointsConsumed);
+        });
       }
+      pointsRemaining -= n;
+      pointsConsumed += n;
     }
   } else {
     unsigned int batchesEachThread, batchesRemaining, batchesConsumed;
@@ -109,27 +298,25 @@ void MT_wrapper(ref_calculator fn, unsigned int batch, int numcoefs,
     batchesConsumed = 0;
 
     for (int ii = 0; ii < workers; ii++) {
-      if (ii < workers - 1) {
-        threads.emplace_back(
-            std::thread(batch_worker, fn, batchesEachThread, numcoefs,
-                        coefP + (batchesConsumed * numcoefs), npoints,
-                        yP + (batchesConsumed * npoints), xP));
-        batchesRemaining -= batchesEachThread;
-        batchesConsumed += batchesEachThread;
-      } else {
-        threads.emplace_back(
-            std::thread(batch_worker, fn, batchesRemaining, numcoefs,
-                        coefP + (batchesConsumed * numcoefs), npoints,
-                        yP + (batchesConsumed * npoints), xP));
-        batchesRemaining -= batchesRemaining;
-        batchesConsumed += batchesRemaining;
+      unsigned int n =
+          (ii < workers - 1) ? batchesEachThread : batchesRemaining;
+      if (n > 0) {
+        tasks.emplace_back([=]() {
+          batch_worker(fn, n, numcoefs, coefP + (batchesConsumed * numcoefs),
+                       npoints, yP + (batchesConsumed * npoints), xP);
+        });
       }
+      batchesRemaining -= n;
+      batchesConsumed += n;
     }
   }
 
-  // synchronise threads
-  for (auto &th : threads)
-    th.join();
+  if (tasks.size() == 1) {
+    // no point in involving the pool
+    tasks[0]();
+  } else {
+    get_pool()->run(tasks);
+  }
 }
 
 /*
@@ -146,6 +333,44 @@ void parratt_wrapper_MT(unsigned int batch, int numcoefs, const double *coefP,
   MT_wrapper(parratt, batch, numcoefs, coefP, npoints, yP, xP, threads);
 }
 
+/*
+Parallelised version of the reflectivity and its derivatives
+*/
+void abeles_grad_wrapper_MT(int numcoefs, const double *coefP, int npoints,
+                            double *yP, double *dyP, const double *xP,
+                            int threads) {
+  std::vector<std::function<void()>> tasks;
+  int pointsEachThread, pointsRemaining, pointsConsumed;
+
+  if (threads > 0) {
+    pointsEachThread = floorl(npoints / threads);
+  } else {
+    pointsEachThread = npoints;
+  }
+
+  pointsRemaining = npoints;
+  pointsConsumed = 0;
+
+  for (int ii = 0; ii < threads; ii++) {
+    int n = (ii < threads - 1) ? pointsEachThread : pointsRemaining;
+    if (n > 0) {
+      tasks.emplace_back([=]() {
+        abeles_grad(numcoefs, coefP, n, yP + pointsConsumed,
+                    dyP + (size_t)pointsConsumed * numcoefs,
+                    xP + pointsConsumed);
+      });
+    }
+    pointsRemaining -= n;
+    pointsConsumed += n;
+  }
+
+  if (tasks.size() == 1) {
+    tasks[0]();
+  } else {
+    get_pool()->run(tasks);
+  }
+}
+
 /*
 Non parallelised version
 */
@@ -159,6 +384,11 @@ void parratt_wrapper(int numcoefs, const double *coefP, int npoints, double *yP,
   parratt(numcoefs, coefP, npoints, yP, xP);
 }
 
+void abeles_grad_wrapper(int numcoefs, const double *coefP, int npoints,
+                         double *yP, double *dyP, const double *xP) {
+  abeles_grad(numcoefs, coefP, npoints, yP, dyP, xP);
+}
+
 void pnr(int layers, const double *d, const double *sigma, const double *rho,
          const double *irho, const double *rhoM, const double *thetaM, double H,
          double Aguide, int points, const double *xP, double *Ra, double *Rb,
@@ -194,7 +424,7 @@ void pnr_MT(int workers, int layers, const double *d, const double *sigma,
             const double *rho, const double *irho, const double *rhoM,
             const double *thetaM, double H, double Aguide, int points,
             const double *xP, double *Ra, double *Rb, double *Rc, double *Rd) {
-  std::vector<std::thread> threads;
+  std::vector<std::function<void()>> tasks;
   int pointsEachThread, pointsRemaining, pointsConsumed;
 
   // need to calculate how many points are given to each thread.
@@ -208,24 +438,21 @@ void pnr_MT(int workers, int layers, const double *d, const double *sigma,
   pointsConsumed = 0;
 
   for (int ii = 0; ii < workers; ii++) {
-    if (ii < workers - 1) {
-      threads.emplace_back(std::thread(
-          pnr, layers, d, sigma, rho, irho, rhoM, thetaM, H, Aguide,
-          pointsEachThread, xP + pointsConsumed, Ra + pointsConsumed,
-          Rb + pointsConsumed, Rc + pointsConsumed, Rd + pointsConsumed));
-      pointsRemaining -= pointsEachThread;
-      pointsConsumed += pointsEachThread;
-    } else {
-      threads.emplace_back(std::thread(
-          pnr, layers, d, sigma, rho, irho, rhoM, thetaM, H, Aguide,
-          pointsRemaining, xP + pointsConsumed, Ra + pointsConsumed,
-          Rb + pointsConsumed, Rc + pointsConsumed, Rd + pointsConsumed));
-      pointsRemaining -= pointsRemaining;
-      pointsConsumed += pointsRemaining;
+    int n = (ii < workers - 1) ? pointsEachThread : pointsRemaining;
+    if (n > 0) {
+      tasks.emplace_back([=]() {
+        pnr(layers, d, sigma, rho, irho, rhoM, thetaM, H, Aguide, n,
+            xP + pointsConsumed, Ra + pointsConsumed, Rb + pointsConsumed,
+            Rc + pointsConsumed, Rd + pointsConsumed);
+      });
     }
+    pointsRemaining -= n;
+    pointsConsumed += n;
   }
 
-  // synchronise threads
-  for (auto &th : threads)
-    th.join();
+  if (tasks.size() == 1) {
+    tasks[0]();
+  } else {
+    get_pool()->run(tasks);
+  }
 }
@@ -99,6 +99,31 @@ void abeles_wrapper_MT(unsigned int batch, int numcoefs, const double *coefP,
 void parratt_wrapper_MT(unsigned int batch, int numcoefs, const double *coefP,
                         int npoints, double *yP, const double *xP, int threads);
 
+/*
+Reflectivity and its derivatives with respect to the parameters of each
+layer. dyP must be `npoints * numcoefs` long, see `abeles_grad` in refcalc.h
+for its layout.
+*/
+void abeles_grad_wrapper_MT(int numcoefs, const double *coefP, int npoints,
+                            double *yP, double *dyP, const double *xP,
+                            int threads);
+
+/*
+Control of the persistent worker pool used by the parallelised calculations.
+
+pool_size - the number of worker threads currently in the pool.
+
+pool_resize - set the number of worker threads. If `workers < 0` the pool
+grows on demand to `threads - 1` workers (the default).
+
+pool_shutdown - stop and join all worker threads.
+*/
+unsigned int pool_size();
+
+void pool_resize(int workers);
+
+void pool_shutdown();
+
 /*
 Non parallelised
 */
@@ -108,6 +133,9 @@ void abeles_wrapper(int numcoefs, const double *coefP, int npoints, double *yP,
 void parratt_wrapper(int numcoefs, const double *coefP, int npoints, double *yP,
                      const double *xP);
 
+void abeles_grad_wrapper(int numcoefs, const double *coefP, int npoints,
+                         double *yP, double *dyP, const double *xP);
+
 /*
 Polarised neutron reflection measurement
 */